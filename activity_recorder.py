@@ -0,0 +1,100 @@
+"""
+Foydalanuvchi faolligini yozib borish
+Oxirgi faollik vaqtlari xotirada to'planadi va bitta tranzaksiyada yoziladi
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from config import DATABASE_FILE, ACTIVITY_CONFIG
+from db_pool import transaction
+
+logger = logging.getLogger(__name__)
+
+class ActivityRecorder:
+    """last_activity qiymatlarini fon oqimida to'plab yozuvchi"""
+    
+    def __init__(self, flush_interval: float = 5.0, max_pending: int = 500,
+                 db_path: str = DATABASE_FILE):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.db_path = db_path
+        
+        self._pending: Dict[int, str] = {}  # user_id -> ISO vaqt
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+    
+    def record(self, user_id: int, when: Optional[datetime] = None):
+        """Foydalanuvchi faolligini xotiraga yozish"""
+        timestamp = (when or datetime.now()).isoformat()
+        
+        with self._lock:
+            self._pending[user_id] = timestamp
+            pending_count = len(self._pending)
+        
+        self.start()
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+    
+    def flush(self) -> int:
+        """To'plangan qiymatlarni bitta executemany tranzaksiyasida yozish"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = {}
+        
+        rows = [(timestamp, user_id) for user_id, timestamp in batch.items()]
+        try:
+            with transaction(self.db_path) as cursor:
+                cursor.executemany("UPDATE users SET last_activity = ? WHERE user_id = ?", rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Foydalanuvchi faolligini yozishda xatolik: {e}")
+            # Yozilmagan qiymatlarni qaytarish (yangiroq qiymatlar ustun)
+            with self._lock:
+                for user_id, timestamp in batch.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < timestamp:
+                        self._pending[user_id] = timestamp
+            return 0
+    
+    def start(self):
+        """Fon oqimini ishga tushirish (agar ishlamayotgan bo'lsa)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-recorder", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Fon oqimini to'xtatish va qolgan qiymatlarni yozish"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+    
+    def _run(self):
+        """Har flush_interval soniyada yoki max_pending ga yetganda yozish"""
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+activity_recorder = ActivityRecorder(
+    flush_interval=ACTIVITY_CONFIG["flush_interval"],
+    max_pending=ACTIVITY_CONFIG["max_pending"]
+)
+
+# Jarayon to'xtaganda hech qanday faollik yo'qolmasligi uchun
+atexit.register(activity_recorder.stop)
@@ -2,22 +2,34 @@
 Admin Panel - MarketBot boshqaruvi uchun
 """
 
-import sqlite3
+import asyncio
 import logging
+import contextvars
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from telebot import TeleBot
+from telebot.async_telebot import AsyncTeleBot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
+from config import DATABASE_FILE, BROADCAST_CONFIG
+from db_pool import transaction, read_cursor
+from database import (
+    invalidate_user_cache, get_user_stats, save_broadcast_history, create_broadcast_job,
+    get_broadcast_job, get_unfinished_broadcast_jobs, start_broadcast_job,
+    claim_broadcast_recipients, get_broadcast_job_counts, finish_broadcast_job
+)
+from broadcast import BroadcastStats, RecipientRecorder, run_broadcast, format_broadcast_progress
 
 # Logging sozlamalari
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AdminPanel:
-    def __init__(self, bot: TeleBot, db_path: str = "users.db"):
+    def __init__(self, bot: AsyncTeleBot, db_path: str = DATABASE_FILE):
         self.bot = bot
         self.db_path = db_path
         self.admin_users = set()  # Admin foydalanuvchilar ID lari
+        self.pending_broadcasts = set()  # Xabar matnini kiritayotgan adminlar
+        self.broadcast_tasks = set()  # Fonda ishlayotgan yuborishlar
+        self.active_jobs = set()  # Shu jarayonda bajarilayotgan vazifalar ID lari
         
         # Admin foydalanuvchilarni yuklash
         self.load_admin_users()
@@ -33,30 +45,17 @@ class AdminPanel:
     def load_admin_users(self):
         """Admin foydalanuvchilarni ma'lumotlar bazasidan yuklash"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Admin foydalanuvchilar jadvalini yaratish (agar mavjud bo'lmasa)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS admin_users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT,
-                    added_date TEXT,
-                    permissions TEXT
-                )
-            ''')
-            
-            # Admin foydalanuvchilarni olish
-            cursor.execute('SELECT user_id FROM admin_users')
-            admin_ids = cursor.fetchall()
+            # admin_users jadvali migratsiyalar orqali yaratiladi (database.init_database)
+            with read_cursor(self.db_path) as cursor:
+                # Admin foydalanuvchilarni olish
+                cursor.execute('SELECT user_id FROM admin_users')
+                admin_ids = cursor.fetchall()
             
             for (user_id,) in admin_ids:
                 self.admin_users.add(user_id)
             
-            conn.close()
             logger.info(f"Admin foydalanuvchilar yuklandi: {len(self.admin_users)} ta")
-            
+        
         except Exception as e:
             logger.error(f"Admin foydalanuvchilarni yuklashda xatolik: {e}")
     
@@ -77,7 +76,7 @@ class AdminPanel:
                     logger.info(f"Default admin qo'shildi: {default_admin_id}")
                 else:
                     logger.error(f"Default admin qo'shishda xatolik: {default_admin_id}")
-                    
+        
         except ImportError:
             logger.warning("ADMIN_CONFIG topilmadi, default admin qo'shilmaydi")
         except Exception as e:
@@ -90,21 +89,16 @@ class AdminPanel:
     def add_admin(self, user_id: int, username: str = None, full_name: str = None) -> bool:
         """Yangi admin qo'shish"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO admin_users (user_id, username, full_name, added_date, permissions)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, username, full_name, datetime.now().isoformat(), "ALL"))
-            
-            conn.commit()
-            conn.close()
+            with transaction(self.db_path) as cursor:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO admin_users (user_id, username, full_name, added_date, permissions)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, username, full_name, datetime.now().isoformat(), "ALL"))
             
             self.admin_users.add(user_id)
             logger.info(f"Yangi admin qo'shildi: {user_id}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Admin qo'shishda xatolik: {e}")
             return False
@@ -112,88 +106,37 @@ class AdminPanel:
     def remove_admin(self, user_id: int) -> bool:
         """Admin huquqini olib tashlash"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM admin_users WHERE user_id = ?', (user_id,))
-            
-            conn.commit()
-            conn.close()
+            with transaction(self.db_path) as cursor:
+                cursor.execute('DELETE FROM admin_users WHERE user_id = ?', (user_id,))
             
             self.admin_users.discard(user_id)
             logger.info(f"Admin huquqi olib tashlandi: {user_id}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Admin huquqini olib tashlashda xatolik: {e}")
             return False
     
     def get_user_stats(self) -> Dict:
         """Foydalanuvchilar statistikasini olish"""
-        try:
-            logger.info("Getting user stats...")
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Umumiy foydalanuvchilar soni
-            logger.info("Counting total users...")
-            cursor.execute('SELECT COUNT(*) FROM users')
-            total_users = cursor.fetchone()[0]
-            logger.info(f"Total users: {total_users}")
-            
-            # Faol foydalanuvchilar (son 7 kunda)
-            try:
-                logger.info("Counting active users...")
-                week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-                cursor.execute('SELECT COUNT(*) FROM users WHERE last_activity > ?', (week_ago,))
-                active_users = cursor.fetchone()[0]
-                logger.info(f"Active users: {active_users}")
-            except Exception as active_error:
-                logger.warning(f"Active users error: {active_error}")
-                active_users = 0
-            
-            # Bloklangan foydalanuvchilar
-            logger.info("Counting blocked users...")
-            cursor.execute('SELECT COUNT(*) FROM users WHERE is_blocked = 1')
-            blocked_users = cursor.fetchone()[0]
-            logger.info(f"Blocked users: {blocked_users}")
-            
-            # API kalitlari soni
-            logger.info("Counting API users...")
-            cursor.execute('SELECT COUNT(*) FROM users WHERE api_key IS NOT NULL AND api_key != ""')
-            api_users = cursor.fetchone()[0]
-            logger.info(f"API users: {api_users}")
-            
-            conn.close()
-            
-            stats = {
-                'total_users': total_users,
-                'active_users': active_users,
-                'blocked_users': blocked_users,
-                'api_users': api_users
-            }
-            logger.info(f"Final stats: {stats}")
-            return stats
-            
-        except Exception as e:
-            logger.error(f"Statistikani olishda xatolik: {e}")
-            return {}
+        stats = get_user_stats(self.db_path)
+        logger.debug(f"Final stats: {stats}")
+        return stats
     
     def get_all_users(self, limit: int = 100) -> List[Dict]:
         """Barcha foydalanuvchilarni olish"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT user_id, username, first_name, last_name, api_key, is_blocked, created_at
-                FROM users 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (limit,))
+            with read_cursor(self.db_path) as cursor:
+                cursor.execute('''
+                    SELECT user_id, username, first_name, last_name, api_key, is_blocked, created_at
+                    FROM users 
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                ''', (limit,))
+                rows = cursor.fetchall()
             
             users = []
-            for row in cursor.fetchall():
+            for row in rows:
                 users.append({
                     'user_id': row[0],
                     'username': row[1],
@@ -203,9 +146,8 @@ class AdminPanel:
                     'registration_date': row[6]
                 })
             
-            conn.close()
             return users
-            
+        
         except Exception as e:
             logger.error(f"Foydalanuvchilarni olishda xatolik: {e}")
             return []
@@ -213,19 +155,18 @@ class AdminPanel:
     def get_all_users_with_api_keys(self, limit: int = 100) -> List[Dict]:
         """Barcha foydalanuvchilarni API kalitlari bilan olish"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT user_id, username, first_name, last_name, api_key, is_blocked, created_at
-                FROM users 
-                WHERE api_key IS NOT NULL AND api_key != ''
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (limit,))
+            with read_cursor(self.db_path) as cursor:
+                cursor.execute('''
+                    SELECT user_id, username, first_name, last_name, api_key, is_blocked, created_at
+                    FROM users 
+                    WHERE api_key IS NOT NULL AND api_key != ''
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                ''', (limit,))
+                rows = cursor.fetchall()
             
             users = []
-            for row in cursor.fetchall():
+            for row in rows:
                 users.append({
                     'user_id': row[0],
                     'username': row[1],
@@ -235,9 +176,8 @@ class AdminPanel:
                     'registration_date': row[6]
                 })
             
-            conn.close()
             return users
-            
+        
         except Exception as e:
             logger.error(f"Foydalanuvchilarni API kalitlari bilan olishda xatolik: {e}")
             return []
@@ -245,17 +185,13 @@ class AdminPanel:
     def block_user(self, user_id: int) -> bool:
         """Foydalanuvchini bloklash"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('UPDATE users SET is_blocked = 1 WHERE user_id = ?', (user_id,))
-            
-            conn.commit()
-            conn.close()
+            with transaction(self.db_path) as cursor:
+                cursor.execute('UPDATE users SET is_blocked = 1 WHERE user_id = ?', (user_id,))
             
+            invalidate_user_cache(user_id)
             logger.info(f"Foydalanuvchi bloklandi: {user_id}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Foydalanuvchini bloklashda xatolik: {e}")
             return False
@@ -263,61 +199,120 @@ class AdminPanel:
     def unblock_user(self, user_id: int) -> bool:
         """Foydalanuvchining blokini olib tashlash"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('UPDATE users SET is_blocked = 0 WHERE user_id = ?', (user_id,))
-            
-            conn.commit()
-            conn.close()
+            with transaction(self.db_path) as cursor:
+                cursor.execute('UPDATE users SET is_blocked = 0 WHERE user_id = ?', (user_id,))
             
+            invalidate_user_cache(user_id)
             logger.info(f"Foydalanuvchining bloki olib tashlandi: {user_id}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Foydalanuvchining blokini olib tashlashda xatolik: {e}")
             return False
     
-    def send_message_to_all(self, message_text: str, admin_id: int) -> Dict:
+    async def send_message_to_all(self, message_text: str, admin_id: int) -> Dict:
         """Barcha foydalanuvchilarga xabar yuborish"""
+        job_id = await asyncio.to_thread(create_broadcast_job, admin_id, message_text)
+        if job_id is None:
+            await self.bot.send_message(admin_id, "❌ Xabar yuborishni boshlab bo'lmadi!")
+            return {}
+        
+        return await self.run_broadcast_job(job_id)
+    
+    async def run_broadcast_job(self, job_id: int) -> Dict:
+        """Saqlangan vazifani bajarish yoki to'xtagan joyidan davom ettirish"""
+        if job_id in self.active_jobs:
+            return {}
+        
+        self.active_jobs.add(job_id)
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Faqat bloklanmagan foydalanuvchilarni olish
-            cursor.execute('SELECT user_id FROM users WHERE is_blocked = 0')
-            user_ids = [row[0] for row in cursor.fetchall()]
-            
-            conn.close()
+            job = await asyncio.to_thread(get_broadcast_job, job_id)
+            if not job:
+                return {}
+            
+            admin_id = job['admin_id']
+            message_id = job['status_message_id']
+            if message_id is None:
+                status_message = await self.bot.send_message(
+                    admin_id, "📢 <b>Xabar yuborilmoqda...</b> 0%", parse_mode="HTML"
+                )
+                message_id = status_message.message_id
+            await asyncio.to_thread(start_broadcast_job, job_id, message_id)
+            
+            # Oldingi ishga tushirishlarda yuborilganlar hisobga olinadi
+            counts = await asyncio.to_thread(get_broadcast_job_counts, job_id)
+            stats = BroadcastStats(job['total_count'])
+            stats.success = counts.get('sent', 0)
+            stats.blocked = counts.get('blocked', 0)
+            stats.failed = counts.get('failed', 0) + stats.blocked
+            
+            async def update_progress(stats):
+                await self.bot.edit_message_text(
+                    format_broadcast_progress(stats),
+                    admin_id,
+                    message_id,
+                    parse_mode="HTML"
+                )
             
-            success_count = 0
-            failed_count = 0
+            recorder = RecipientRecorder(job_id)
+            try:
+                stats = await run_broadcast(
+                    self.bot,
+                    claim_broadcast_recipients(job_id, BROADCAST_CONFIG["claim_size"]),
+                    job['message_text'],
+                    stats.total,
+                    update_progress,
+                    on_result=recorder.add,
+                    stats=stats
+                )
+            finally:
+                await recorder.flush()
             
-            for user_id in user_ids:
-                try:
-                    self.bot.send_message(user_id, message_text, parse_mode="HTML")
-                    success_count += 1
-                except Exception as e:
-                    failed_count += 1
-                    logger.error(f"Xabar yuborishda xatolik {user_id}: {e}")
+            await asyncio.to_thread(finish_broadcast_job, job_id)
+            await asyncio.to_thread(save_broadcast_history, admin_id, job['message_text'],
+                                    stats.success, stats.failed, stats.total)
             
             # Natijani admin ga yuborish
-            result_text = f"📢 <b>Xabar yuborish natijasi:</b>\n\n"
-            result_text += f"✅ Muvaffaqiyatli: {success_count} ta\n"
-            result_text += f"❌ Xatolik: {failed_count} ta\n"
-            result_text += f"📊 Jami: {len(user_ids)} ta"
-            
-            self.bot.send_message(admin_id, result_text, parse_mode="HTML")
-            
-            return {
-                'success': success_count,
-                'failed': failed_count,
-                'total': len(user_ids)
-            }
+            try:
+                await self.bot.edit_message_text(
+                    format_broadcast_progress(stats, finished=True),
+                    admin_id,
+                    message_id,
+                    parse_mode="HTML"
+                )
+            except Exception:
+                await self.bot.send_message(
+                    admin_id, format_broadcast_progress(stats, finished=True), parse_mode="HTML"
+                )
             
+            return stats.to_dict()
+        
         except Exception as e:
             logger.error(f"Xabar yuborishda xatolik: {e}")
             return {}
+        finally:
+            self.active_jobs.discard(job_id)
+    
+    def _spawn_broadcast(self, coro) -> asyncio.Task:
+        """Yuborishni fonda ishga tushirish - handler darhol bo'shaydi"""
+        # Handler konteksti (vaqt byudjeti va h.k.) fon vazifasiga o'tmaydi
+        task = asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+        self.broadcast_tasks.add(task)
+        task.add_done_callback(self.broadcast_tasks.discard)
+        return task
+    
+    def start_broadcast(self, message_text: str, admin_id: int) -> asyncio.Task:
+        """Yangi yuborishni fonda boshlash"""
+        return self._spawn_broadcast(self.send_message_to_all(message_text, admin_id))
+    
+    def resume_broadcasts(self) -> int:
+        """Bot qayta ishga tushganda tugallanmagan vazifalarni davom ettirish"""
+        job_ids = [job_id for job_id in get_unfinished_broadcast_jobs()
+                   if job_id not in self.active_jobs]
+        for job_id in job_ids:
+            logger.info(f"Xabar yuborish vazifasi davom ettirilmoqda: {job_id}")
+            self._spawn_broadcast(self.run_broadcast_job(job_id))
+        return len(job_ids)
     
     def get_admin_keyboard(self) -> InlineKeyboardMarkup:
         """Admin panel klaviaturasi"""
@@ -354,19 +349,19 @@ class AdminPanel:
         """Admin handlerlarni ro'yxatdan o'tkazish"""
         
         @self.bot.message_handler(commands=['admin'])
-        def admin_command(message: Message):
+        async def admin_command(message: Message):
             """Admin panel buyrug'i"""
             logger.info(f"Admin command from user {message.from_user.id}")
             
             if not self.is_admin(message.from_user.id):
                 logger.warning(f"Non-admin user {message.from_user.id} tried to access admin panel")
-                self.bot.reply_to(message, "❌ Sizda admin huquqi yo'q!")
+                await self.bot.reply_to(message, "❌ Sizda admin huquqi yo'q!")
                 return
             
             admin_text = "🔐 <b>Admin Panel</b>\n\nKerakli amalni tanlang:"
             
             try:
-                self.bot.send_message(
+                await self.bot.send_message(
                     message.chat.id,
                     admin_text,
                     parse_mode="HTML",
@@ -376,17 +371,34 @@ class AdminPanel:
             except Exception as e:
                 logger.error(f"Admin panel yuborishda xatolik: {e}")
         
+        @self.bot.message_handler(
+            func=lambda message: message.from_user and message.from_user.id in self.pending_broadcasts
+        )
+        async def broadcast_text_input(message: Message):
+            """Admin yuborgan xabar matnini qabul qilish"""
+            admin_id = message.from_user.id
+            self.pending_broadcasts.discard(admin_id)
+            
+            if message.text == "/cancel":
+                await self.bot.reply_to(message, "❌ Xabar yuborish bekor qilindi.")
+                return
+            
+            if not self.is_admin(admin_id) or not message.text:
+                return
+            
+            self.start_broadcast(message.html_text or message.text, admin_id)
+        
         # Callback handlerlarni bot_handlers.py da ro'yxatdan o'tkazamiz
-        pass
     
-    def handle_admin_back(self, call: CallbackQuery):
+    async def handle_admin_back(self, call: CallbackQuery):
         """Admin panelga qaytish"""
         try:
             logger.info("Handling admin_back")
+            self.pending_broadcasts.discard(call.from_user.id)
             admin_text = "🔐 <b>Admin Panel</b>\n\nKerakli amalni tanlang:"
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     admin_text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -397,19 +409,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     admin_text,
                     parse_mode="HTML",
                     reply_markup=self.get_admin_keyboard()
                 )
                 logger.info("New admin panel message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin panelga qaytishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Orqaga qaytishda xatolik!")
+            await self.bot.answer_callback_query(call.id, "❌ Orqaga qaytishda xatolik!")
     
-    def handle_admin_stats(self, call: CallbackQuery):
+    async def handle_admin_stats(self, call: CallbackQuery):
         """Admin statistika"""
         try:
             logger.info("Handling admin_stats")
@@ -428,7 +440,7 @@ class AdminPanel:
             
             logger.info("Attempting to edit message...")
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -440,19 +452,19 @@ class AdminPanel:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
                 logger.info("Sending new message instead...")
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New stats message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin statistikani ko'rsatishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Statistika olinmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Statistika olinmadi!")
     
-    def handle_admin_users(self, call: CallbackQuery):
+    async def handle_admin_users(self, call: CallbackQuery):
         """Admin foydalanuvchilar ro'yxati"""
         try:
             logger.info("Handling admin_users")
@@ -481,7 +493,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -492,19 +504,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New users message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin foydalanuvchilarni ko'rsatishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Foydalanuvchilar olinmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Foydalanuvchilar olinmadi!")
     
-    def handle_admin_broadcast(self, call: CallbackQuery):
+    async def handle_admin_broadcast(self, call: CallbackQuery):
         """Admin xabar yuborish"""
         try:
             logger.info("Handling admin_broadcast")
@@ -513,11 +525,14 @@ class AdminPanel:
             text += "💡 Xabar HTML formatda bo'lishi mumkin.\n"
             text += "❌ Bekor qilish uchun /cancel yozing."
             
+            # Keyingi matnli xabar yuboriladigan xabar sifatida qabul qilinadi
+            self.pending_broadcasts.add(call.from_user.id)
+            
             keyboard = InlineKeyboardMarkup()
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -528,19 +543,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New broadcast message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin xabar yuborishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Xabar yuborish ochilmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Xabar yuborish ochilmadi!")
     
-    def handle_admin_block(self, call: CallbackQuery):
+    async def handle_admin_block(self, call: CallbackQuery):
         """Admin bloklash"""
         try:
             logger.info("Handling admin_block")
@@ -550,13 +565,13 @@ class AdminPanel:
             text += "❌ Bekor qilish uchun /cancel yozing."
             
             # Foydalanuvchi ID ni kutish holatini saqlash
-            self.bot.set_state(call.from_user.id, "waiting_for_block_user_id", call.message.chat.id)
+            await self.bot.set_state(call.from_user.id, "waiting_for_block_user_id", call.message.chat.id)
             
             keyboard = InlineKeyboardMarkup()
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -567,19 +582,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New block message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin bloklashda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Bloklash ochilmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Bloklash ochilmadi!")
     
-    def handle_admin_unblock(self, call: CallbackQuery):
+    async def handle_admin_unblock(self, call: CallbackQuery):
         """Admin blokni olib tashlash"""
         try:
             logger.info("Handling admin_unblock")
@@ -589,13 +604,13 @@ class AdminPanel:
             text += "❌ Bekor qilish uchun /cancel yozing."
             
             # Foydalanuvchi ID ni kutish holatini saqlash
-            self.bot.set_state(call.from_user.id, "waiting_for_unblock_user_id", call.message.chat.id)
+            await self.bot.set_state(call.from_user.id, "waiting_for_unblock_user_id", call.message.chat.id)
             
             keyboard = InlineKeyboardMarkup()
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -606,19 +621,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New unblock message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin blokni olib tashlashda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Blokni olib tashlash ochilmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Blokni olib tashlash ochilmadi!")
     
-    def handle_admin_add_admin(self, call: CallbackQuery):
+    async def handle_admin_add_admin(self, call: CallbackQuery):
         """Admin qo'shish"""
         try:
             logger.info("Handling admin_add_admin")
@@ -631,7 +646,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -642,35 +657,32 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New add admin message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin qo'shishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Admin qo'shish ochilmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Admin qo'shish ochilmadi!")
     
-    def handle_admin_api_keys(self, call: CallbackQuery):
+    async def handle_admin_api_keys(self, call: CallbackQuery):
         """Admin API kalitlar"""
         try:
             logger.info("Handling admin_api_keys")
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT user_id, username, api_key, created_at 
-                FROM users 
-                WHERE api_key IS NOT NULL AND api_key != ""
-                ORDER BY created_at DESC
-                LIMIT 10
-            ''')
-            
-            api_users = cursor.fetchall()
-            conn.close()
+            with read_cursor(self.db_path) as cursor:
+                cursor.execute('''
+                    SELECT user_id, username, api_key, created_at 
+                    FROM users 
+                    WHERE api_key IS NOT NULL AND api_key != ''
+                    ORDER BY created_at DESC
+                    LIMIT 10
+                ''')
+                
+                api_users = cursor.fetchall()
             
             text = "🔑 <b>API kalitlar</b>\n\n"
             
@@ -689,7 +701,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -700,19 +712,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New API keys message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin API kalitlarni ko'rsatishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ API kalitlar olinmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ API kalitlar olinmadi!")
     
-    def handle_admin_all_api_keys(self, call: CallbackQuery):
+    async def handle_admin_all_api_keys(self, call: CallbackQuery):
         """Admin barcha API kalitlar"""
         try:
             logger.info("Handling admin_all_api_keys")
@@ -744,7 +756,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -752,63 +764,59 @@ class AdminPanel:
                     reply_markup=keyboard
                 )
                 logger.info("All API keys message edited successfully")
-                self.bot.answer_callback_query(call.id, "✅ Barcha API kalitlar ko'rsatildi!")
+                await self.bot.answer_callback_query(call.id, "✅ Barcha API kalitlar ko'rsatildi!")
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New all API keys message sent")
-                self.bot.answer_callback_query(call.id, "✅ Barcha API kalitlar yuborildi!")
-            
+                await self.bot.answer_callback_query(call.id, "✅ Barcha API kalitlar yuborildi!")
+        
         except Exception as e:
             logger.error(f"Admin barcha API kalitlarda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Barcha API kalitlar olinmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Barcha API kalitlar olinmadi!")
     
-    def handle_admin_activity(self, call: CallbackQuery):
+    async def handle_admin_activity(self, call: CallbackQuery):
         """Admin faollik"""
         try:
             logger.info("Handling admin_activity")
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Bugungi faol foydalanuvchilar
-            today = datetime.now().date().isoformat()
-            try:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM users 
-                    WHERE DATE(created_at) = ?
-                ''', (today,))
-                today_active = cursor.fetchone()[0]
-            except:
-                today_active = 0
-            
-            # Haftalik faol foydalanuvchilar
-            week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-            try:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM users 
-                    WHERE created_at > ?
-                ''', (week_ago,))
-                week_active = cursor.fetchone()[0]
-            except:
-                week_active = 0
-            
-            # Oylik faol foydalanuvchilar
-            month_ago = (datetime.now() - timedelta(days=30)).isoformat()
-            try:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM users 
-                    WHERE created_at > ?
-                ''', (month_ago,))
-                month_active = cursor.fetchone()[0]
-            except:
-                month_active = 0
-            
-            conn.close()
+            with read_cursor(self.db_path) as cursor:
+                # Bugungi faol foydalanuvchilar
+                today = datetime.now().date().isoformat()
+                try:
+                    cursor.execute('''
+                        SELECT COUNT(*) FROM users 
+                        WHERE DATE(created_at) = ?
+                    ''', (today,))
+                    today_active = cursor.fetchone()[0]
+                except:
+                    today_active = 0
+                
+                # Haftalik faol foydalanuvchilar
+                week_ago = (datetime.now() - timedelta(days=7)).isoformat()
+                try:
+                    cursor.execute('''
+                        SELECT COUNT(*) FROM users 
+                        WHERE created_at > ?
+                    ''', (week_ago,))
+                    week_active = cursor.fetchone()[0]
+                except:
+                    week_active = 0
+                
+                # Oylik faol foydalanuvchilar
+                month_ago = (datetime.now() - timedelta(days=30)).isoformat()
+                try:
+                    cursor.execute('''
+                        SELECT COUNT(*) FROM users 
+                        WHERE created_at > ?
+                    ''', (month_ago,))
+                    month_active = cursor.fetchone()[0]
+                except:
+                    month_active = 0
             
             text = "📈 <b>Faollik statistikasi</b>\n\n"
             text += f"📅 Bugun: {today_active} ta\n"
@@ -820,7 +828,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -831,19 +839,19 @@ class AdminPanel:
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
                 # Xabarni tahrirlashda xatolik bo'lsa, yangi xabar yuborish
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New activity message sent")
-            
+        
         except Exception as e:
             logger.error(f"Admin faollikni ko'rsatishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Faollik olinmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Faollik olinmadi!")
     
-    def handle_admin_user_management(self, call: CallbackQuery):
+    async def handle_admin_user_management(self, call: CallbackQuery):
         """Admin foydalanuvchilarni boshqarish"""
         try:
             logger.info("Handling admin_user_management")
@@ -862,7 +870,7 @@ class AdminPanel:
             keyboard.add(InlineKeyboardButton("🔙 Orqaga", callback_data="admin_back"))
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -870,23 +878,23 @@ class AdminPanel:
                     reply_markup=keyboard
                 )
                 logger.info("User management message edited successfully")
-                self.bot.answer_callback_query(call.id, "✅ Foydalanuvchilarni boshqarish ochildi!")
+                await self.bot.answer_callback_query(call.id, "✅ Foydalanuvchilarni boshqarish ochildi!")
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=keyboard
                 )
                 logger.info("New user management message sent")
-                self.bot.answer_callback_query(call.id, "✅ Foydalanuvchilarni boshqarish yuborildi!")
-            
+                await self.bot.answer_callback_query(call.id, "✅ Foydalanuvchilarni boshqarish yuborildi!")
+        
         except Exception as e:
             logger.error(f"Admin foydalanuvchilarni boshqarishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Foydalanuvchilarni boshqarish ochilmadi!")
+            await self.bot.answer_callback_query(call.id, "❌ Foydalanuvchilarni boshqarish ochilmadi!")
     
-    def handle_admin_main_menu(self, call: CallbackQuery):
+    async def handle_admin_main_menu(self, call: CallbackQuery):
         """Admin panelga asosiy menyuga qaytish"""
         try:
             logger.info("Handling admin_main_menu")
@@ -898,7 +906,7 @@ class AdminPanel:
             text = "🏠 <b>Asosiy menyu</b>\n\nKerakli bo'limni tanlang:"
             
             try:
-                self.bot.edit_message_text(
+                await self.bot.edit_message_text(
                     text,
                     call.message.chat.id,
                     call.message.message_id,
@@ -906,23 +914,32 @@ class AdminPanel:
                     reply_markup=main_keyboard
                 )
                 logger.info("Main menu message edited successfully")
-                self.bot.answer_callback_query(call.id, "✅ Asosiy menyuga qaytildi!")
+                await self.bot.answer_callback_query(call.id, "✅ Asosiy menyuga qaytildi!")
             except Exception as edit_error:
                 logger.error(f"Xabarni tahrirlashda xatolik: {edit_error}")
-                self.bot.send_message(
+                await self.bot.send_message(
                     call.message.chat.id,
                     text,
                     parse_mode="HTML",
                     reply_markup=main_keyboard
                 )
                 logger.info("New main menu message sent")
-                self.bot.answer_callback_query(call.id, "✅ Asosiy menyu yuborildi!")
-            
+                await self.bot.answer_callback_query(call.id, "✅ Asosiy menyu yuborildi!")
+        
         except Exception as e:
             logger.error(f"Admin asosiy menyuga qaytishda xatolik: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Asosiy menyuga qaytishda xatolik!")
+            await self.bot.answer_callback_query(call.id, "❌ Asosiy menyuga qaytishda xatolik!")
+
+# Jarayon bo'yicha yagona admin panel (handlerlar bir marta ro'yxatdan o'tadi)
+_admin_panel: Optional[AdminPanel] = None
 
-# Admin panel yaratish
-def create_admin_panel(bot: TeleBot) -> AdminPanel:
+def create_admin_panel(bot: AsyncTeleBot) -> AdminPanel:
     """Admin panel yaratish"""
-    return AdminPanel(bot)
+    global _admin_panel
+    if _admin_panel is None:
+        _admin_panel = AdminPanel(bot)
+    return _admin_panel
+
+def get_admin_panel(bot: AsyncTeleBot) -> AdminPanel:
+    """Mavjud admin panelni olish (hali yaratilmagan bo'lsa yaratiladi)"""
+    return create_admin_panel(bot)
@@ -3,10 +3,21 @@ Marketplace API bilan ishlash moduli
 UZUM MARKET API integration
 """
 
+import time
 import requests
 import logging
-from typing import Dict, List, Optional, Any
-from config import API_BASE_URL, API_HEADERS
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any
+from cache import TTLCache, MISSING
+from shop_cache import get_shops_entry, store_shops
+from pagination import PAGED_ENDPOINTS, iter_pages, page_size_for
+from response_cache import response_cache, refresh_executor, cache_key, cache_ttl, invalidated_paths
+from config import API_BASE_URL, HTTP_CONFIG
+from http_transport import (
+    get_session, request_timeout, current_budget, call_within_budget,
+    retry_delay, retry_allowed, RETRY_STATUSES, RETRY_METHODS
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +27,129 @@ class MarketplaceAPIClient:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = API_BASE_URL
+        # Umumiy sarlavhalar sessiyada, API kalit esa har bir so'rovda yuboriladi
         self.headers = {
-            **API_HEADERS,
             "Authorization": api_key
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = get_session()
+    
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """So'rov yuborish - timeout bir joyda, handler byudjetiga mos ravishda belgilanadi"""
+        budget = current_budget()
+        if budget is None:
+            return self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=self.headers,
+                timeout=request_timeout(),
+                **kwargs
+            )
+        
+        # Byudjet bilan: urllib3 Retry backoff'i vaqtni hisobga olmaydi, shuning uchun
+        # qayta urinishlar shu yerda, har bir urinish esa qolgan vaqtdan ortiq kutilmaydi
+        session = get_session(retries=False)
+        max_retries = HTTP_CONFIG["max_retries"] if method in RETRY_METHODS else 0
+        attempt = 0
+        while True:
+            try:
+                timeout = request_timeout()
+                response = call_within_budget(
+                    lambda: session.request(
+                        method,
+                        f"{self.base_url}{path}",
+                        headers=self.headers,
+                        timeout=timeout,
+                        **kwargs
+                    ),
+                    budget
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if budget.remaining() <= 0:
+                    budget.exhausted = True
+                    raise
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                delay = retry_delay(attempt)
+                if not retry_allowed(delay):
+                    raise
+                time.sleep(delay)
+                continue
+            
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            
+            attempt += 1
+            delay = retry_delay(attempt, response.headers.get("Retry-After"))
+            if not retry_allowed(delay):
+                return response
+            time.sleep(delay)
+    
+    def _get(self, path: str, **kwargs) -> requests.Response:
+        """GET so'rov (umumiy ulanishlar hovuzi orqali, keshlanadigan endpointlar keshdan)"""
+        ttl = cache_ttl(path)
+        if ttl is None:
+            return self._request("GET", path, **kwargs)
+        
+        key = cache_key(self.api_key, path, kwargs.get('params'))
+        response, stale = response_cache.lookup(key)
+        if response is None:
+            return self._fetch_cached(key, ttl, path, kwargs)
+        
+        if stale and response_cache.begin_refresh(key):
+            # Eskirgan javob darhol qaytariladi, yangisi fon oqimida olinadi (handler byudjetisiz)
+            refresh_executor.submit(self._refresh_cached, key, ttl, path, kwargs)
+        return response
+    
+    def _fetch_cached(self, key, ttl: int, path: str, kwargs: Dict) -> requests.Response:
+        """API dan olish va muvaffaqiyatli javobni keshlash"""
+        version = response_cache.version
+        response = self._request("GET", path, **kwargs)
+        if response.status_code == 200:
+            response_cache.store(key, ttl, response, version)
+        return response
+    
+    def _refresh_cached(self, key, ttl: int, path: str, kwargs: Dict):
+        """Keshdagi javobni fonda yangilash"""
+        try:
+            self._fetch_cached(key, ttl, path, kwargs)
+        except Exception as e:
+            logger.error(f"Keshni yangilashda xatolik: {e}")
+        finally:
+            response_cache.end_refresh(key)
+    
+    def _post(self, path: str, **kwargs) -> requests.Response:
+        """POST so'rov (umumiy ulanishlar hovuzi orqali) - bog'liq kesh yozuvlari o'chiriladi"""
+        try:
+            return self._request("POST", path, **kwargs)
+        finally:
+            response_cache.invalidate(self.api_key, invalidated_paths(path))
+    
+    def fan_out(self, calls: Iterable[Callable[[], Any]], limit: Optional[int] = None) -> List[Any]:
+        """Mustaqil so'rovlarni oqimlar hovuzida parallel bajarish - natijalar berilgan tartibda qaytadi"""
+        calls = list(calls)
+        if not calls:
+            return []
+        
+        workers = min(limit or HTTP_CONFIG["fan_out_limit"], len(calls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Har bir oqim joriy kontekstni (latency budget) oladi
+            futures = [executor.submit(contextvars.copy_context().run, call) for call in calls]
+            
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Parallel so'rovda xatolik: {e}")
+                    results.append(None)
+            return results
     
     def test_connection(self) -> bool:
         """API ulanishini tekshirish"""
         try:
-            # API ulanishini tekshirish uchun FBS stocks endpoint (rasmda ko'rsatilgan)
-            response = self.session.get(f"{self.base_url}/v2/fbs/sku/stocks", timeout=10)
+            # API ulanishini tekshirish uchun FBS stocks endpoint (rasmda ko'rsatilgan), keshsiz
+            response = self._request("GET", "/v2/fbs/sku/stocks")
             logger.info(f"API test response status: {response.status_code}")
             if response.status_code != 200:
                 logger.error(f"API test failed with response: {response.text}")
@@ -47,7 +169,7 @@ class MarketplaceAPIClient:
             if status:
                 params['status'] = status
             
-            response = self.session.get(f"{self.base_url}/v1/fbs/orders", params=params)
+            response = self._get("/v1/fbs/orders", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -58,7 +180,7 @@ class MarketplaceAPIClient:
     def get_fbs_order_details(self, order_id: str) -> Optional[Dict]:
         """FBS buyurtma tafsilotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/fbs/order/{order_id}")
+            response = self._get(f"/v1/fbs/order/{order_id}")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -69,7 +191,7 @@ class MarketplaceAPIClient:
     def cancel_fbs_order(self, order_id: str) -> bool:
         """FBS buyurtmani bekor qilish"""
         try:
-            response = self.session.post(f"{self.base_url}/v1/fbs/order/{order_id}/cancel")
+            response = self._post(f"/v1/fbs/order/{order_id}/cancel")
             return response.status_code == 200
         except Exception as e:
             logger.error(f"FBS buyurtmani bekor qilishda xatolik: {e}")
@@ -78,7 +200,7 @@ class MarketplaceAPIClient:
     def confirm_fbs_order(self, order_id: str) -> bool:
         """FBS buyurtmani tasdiqlash"""
         try:
-            response = self.session.post(f"{self.base_url}/v1/fbs/order/{order_id}/confirm")
+            response = self._post(f"/v1/fbs/order/{order_id}/confirm")
             return response.status_code == 200
         except Exception as e:
             logger.error(f"FBS buyurtmani tasdiqlashda xatolik: {e}")
@@ -87,7 +209,7 @@ class MarketplaceAPIClient:
     def get_fbs_return_reasons(self) -> Optional[List]:
         """FBS qaytarish sabablarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/fbs/order/return-reasons")
+            response = self._get("/v1/fbs/order/return-reasons")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -110,7 +232,7 @@ class MarketplaceAPIClient:
             if date_to:
                 params['dateTo'] = date_to
             
-            response = self.session.get(f"{self.base_url}/v2/fbs/orders/count", params=params)
+            response = self._get("/v2/fbs/orders/count", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -121,7 +243,7 @@ class MarketplaceAPIClient:
     def get_fbs_stocks(self) -> Optional[List]:
         """FBS SKU qoldiqlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v2/fbs/sku/stocks")
+            response = self._get("/v2/fbs/sku/stocks")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -132,8 +254,8 @@ class MarketplaceAPIClient:
     def update_fbs_stocks(self, stocks_data: List[Dict]) -> bool:
         """FBS SKU qoldiqlarini yangilash"""
         try:
-            response = self.session.post(
-                f"{self.base_url}/v2/fbs/sku/stocks",
+            response = self._post(
+                "/v2/fbs/sku/stocks",
                 json=stocks_data
             )
             return response.status_code == 200
@@ -163,7 +285,7 @@ class MarketplaceAPIClient:
             if sources:
                 params['sources'] = sources
             
-            response = self.session.get(f"{self.base_url}/v1/finance/expenses", params=params)
+            response = self._get("/v1/finance/expenses", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -191,7 +313,7 @@ class MarketplaceAPIClient:
             if shop_ids:
                 params['shopIds'] = shop_ids
             
-            response = self.session.get(f"{self.base_url}/v1/finance/orders", params=params)
+            response = self._get("/v1/finance/orders", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -208,7 +330,7 @@ class MarketplaceAPIClient:
                 'page': page
             }
             
-            response = self.session.get(f"{self.base_url}/v1/invoice", params=params)
+            response = self._get("/v1/invoice", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -227,7 +349,7 @@ class MarketplaceAPIClient:
             if return_id:
                 params['returnId'] = return_id
             
-            response = self.session.get(f"{self.base_url}/v1/return", params=params)
+            response = self._get("/v1/return", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -238,7 +360,7 @@ class MarketplaceAPIClient:
     def get_shop_invoice(self, shop_id: str) -> Optional[Dict]:
         """Do'kon hisob-fakturasini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/invoice")
+            response = self._get(f"/v1/shop/{shop_id}/invoice")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -249,7 +371,7 @@ class MarketplaceAPIClient:
     def get_shop_invoice_products(self, shop_id: str) -> Optional[List]:
         """Do'kon hisob-faktura mahsulotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/invoice/products")
+            response = self._get(f"/v1/shop/{shop_id}/invoice/products")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -260,7 +382,7 @@ class MarketplaceAPIClient:
     def get_shop_invoice_return(self, shop_id: str) -> Optional[Dict]:
         """Do'kon hisob-faktura qaytarishini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/return")
+            response = self._get(f"/v1/shop/{shop_id}/return")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -271,7 +393,7 @@ class MarketplaceAPIClient:
     def get_shop_return_details(self, shop_id: str, return_id: str) -> Optional[Dict]:
         """Do'kon qaytarish tafsilotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/return/{return_id}")
+            response = self._get(f"/v1/shop/{shop_id}/return/{return_id}")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -283,8 +405,8 @@ class MarketplaceAPIClient:
     def update_product_price(self, shop_id: int, data: Dict) -> bool:
         """Mahsulot narxini yangilash - OpenAPI spetsifikatsiyasiga asoslanib"""
         try:
-            response = self.session.post(
-                f"{self.base_url}/v1/product/{shop_id}/sendPriceData",
+            response = self._post(
+                f"/v1/product/{shop_id}/sendPriceData",
                 json=data
             )
             return response.status_code == 200
@@ -300,7 +422,7 @@ class MarketplaceAPIClient:
                 'size': 20,
                 'filter': 'ALL'
             }
-            response = self.session.get(f"{self.base_url}/v1/product/shop/{shop_id}", params=params)
+            response = self._get(f"/v1/product/shop/{shop_id}", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -326,8 +448,8 @@ class MarketplaceAPIClient:
             if product_rank:
                 params['productRank'] = product_rank
             
-            response = self.session.get(
-                f"{self.base_url}/v1/product/shop/{shop_id}", 
+            response = self._get(
+                f"/v1/product/shop/{shop_id}", 
                 params=params
             )
             
@@ -344,7 +466,7 @@ class MarketplaceAPIClient:
     def get_shops(self) -> Optional[List]:
         """Do'konlar ro'yxatini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/shops")
+            response = self._get("/v1/shops")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -352,11 +474,52 @@ class MarketplaceAPIClient:
             logger.error(f"Do'konlar ro'yxatini olishda xatolik: {e}")
             return None
     
+    def get_shops_cached(self, refresh: bool = False) -> Optional[List]:
+        """Do'konlar ro'yxatini keshdan olish (refresh=True - API dan qayta yuklash)"""
+        if not refresh:
+            entry = get_shops_entry(self.api_key)
+            if entry is not None:
+                return entry.shops
+        
+        else:
+            response_cache.invalidate(self.api_key, ['/v1/shops'])
+        
+        shops = self.get_shops()
+        # Xatolik natijasi keshlanmaydi
+        if shops and isinstance(shops, list):
+            store_shops(self.api_key, shops)
+        return shops
+    
+    def get_shop_ids(self, refresh: bool = False) -> List[int]:
+        """Do'kon ID lari (do'konlar keshidan bir marta hisoblangan)"""
+        entry = None if refresh else get_shops_entry(self.api_key)
+        if entry is None:
+            self.get_shops_cached(refresh=refresh)
+            entry = get_shops_entry(self.api_key)
+        return list(entry.shop_ids) if entry else []
+    
+    def get_shop_products_by_shop_id(self, shop_id: int, page: int = 0, size: int = 20,
+                                    filter: str = "ALL") -> Optional[Dict]:
+        """Do'kon mahsulotlarini sahifalab olish (productList, totalProductsAmount)"""
+        try:
+            params = {
+                'page': page,
+                'size': size,
+                'filter': filter
+            }
+            response = self._get(f"/v1/product/shop/{shop_id}", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon mahsulotlarini olishda xatolik: {e}")
+            return None
+    
     def get_shop_invoice_by_id(self, shop_id: int, page: int = 0, size: int = 20) -> Optional[Dict]:
         """Do'kon bo'yicha hisob-fakturalarni olish"""
         try:
             params = {'page': page, 'size': size}
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/invoice", params=params)
+            response = self._get(f"/v1/shop/{shop_id}/invoice", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -368,7 +531,7 @@ class MarketplaceAPIClient:
         """Hisob-faktura mahsulotlarini olish"""
         try:
             params = {'invoiceId': invoice_id}
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/invoice/products", params=params)
+            response = self._get(f"/v1/shop/{shop_id}/invoice/products", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -380,7 +543,7 @@ class MarketplaceAPIClient:
         """Do'kon qaytarishlarini olish"""
         try:
             params = {'page': page, 'size': size}
-            response = self.session.get(f"{self.base_url}/v1/shop/{shop_id}/return", params=params)
+            response = self._get(f"/v1/shop/{shop_id}/return", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -392,7 +555,7 @@ class MarketplaceAPIClient:
     def get_finance_seller_payment_info(self) -> Optional[Dict]:
         """Moliyaviy to'lov ma'lumotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/finance/seller-payment-info")
+            response = self._get("/v1/finance/seller-payment-info")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -403,7 +566,7 @@ class MarketplaceAPIClient:
     def get_finance_commission_info(self) -> Optional[Dict]:
         """Komissiya ma'lumotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/finance/commission-info")
+            response = self._get("/v1/finance/commission-info")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -429,7 +592,7 @@ class MarketplaceAPIClient:
             if date_to:
                 params['dateTo'] = date_to
             
-            response = self.session.get(f"{self.base_url}/v2/fbs/orders", params=params)
+            response = self._get("/v2/fbs/orders", params=params)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -440,7 +603,7 @@ class MarketplaceAPIClient:
     def get_fbs_order_by_id(self, order_id: str) -> Optional[Dict]:
         """FBS buyurtma tafsilotlarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/fbs/order/{order_id}")
+            response = self._get(f"/v1/fbs/order/{order_id}")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -451,7 +614,7 @@ class MarketplaceAPIClient:
     def confirm_fbs_order_v2(self, order_id: str) -> bool:
         """FBS buyurtmani tasdiqlash"""
         try:
-            response = self.session.post(f"{self.base_url}/v1/fbs/order/{order_id}/confirm")
+            response = self._post(f"/v1/fbs/order/{order_id}/confirm")
             return response.status_code == 200
         except Exception as e:
             logger.error(f"FBS buyurtmani tasdiqlashda xatolik: {e}")
@@ -461,7 +624,7 @@ class MarketplaceAPIClient:
         """FBS buyurtmani bekor qilish"""
         try:
             data = {"reasonId": reason_id}
-            response = self.session.post(f"{self.base_url}/v1/fbs/order/{order_id}/cancel", json=data)
+            response = self._post(f"/v1/fbs/order/{order_id}/cancel", json=data)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"FBS buyurtmani bekor qilishda xatolik: {e}")
@@ -470,7 +633,7 @@ class MarketplaceAPIClient:
     def get_fbs_return_reasons(self) -> Optional[Dict]:
         """FBS qaytarish sabablarini olish"""
         try:
-            response = self.session.get(f"{self.base_url}/v1/fbs/order/return-reasons")
+            response = self._get("/v1/fbs/order/return-reasons")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -481,7 +644,7 @@ class MarketplaceAPIClient:
     def get_fbs_sku_stocks_v2(self) -> Optional[Dict]:
         """FBS SKU qoldiqlarini olish (v2)"""
         try:
-            response = self.session.get(f"{self.base_url}/v2/fbs/sku/stocks")
+            response = self._get("/v2/fbs/sku/stocks")
             if response.status_code == 200:
                 return response.json()
             return None
@@ -492,8 +655,64 @@ class MarketplaceAPIClient:
     def update_fbs_sku_stocks(self, stock_data: Dict) -> bool:
         """FBS SKU qoldiqlarini yangilash"""
         try:
-            response = self.session.post(f"{self.base_url}/v2/fbs/sku/stocks", json=stock_data)
+            response = self._post("/v2/fbs/sku/stocks", json=stock_data)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"FBS SKU qoldiqlarini yangilashda xatolik: {e}")
             return False
+    
+    # Sahifalash iteratorlari
+    def iter_items(self, method_name: str, limit: Optional[int] = None, page_size: int = 50,
+                   **filters) -> Iterator[Any]:
+        """Sahifalangan metod elementlarini birma-bir qaytarish (limit ga yetganda to'xtaydi)"""
+        method = getattr(self, method_name)
+        size = page_size_for(method_name, min(page_size, limit) if limit else page_size)
+        return iter_pages(
+            lambda page, size: method(page=page, size=size, **filters),
+            PAGED_ENDPOINTS[method_name],
+            size,
+            limit
+        )
+    
+    def iter_fbs_orders_v2(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """FBS buyurtmalari (v2) - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_fbs_orders_v2", limit, page_size, **filters)
+    
+    def iter_finance_expenses(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Moliyaviy xarajatlar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_finance_expenses", limit, page_size, **filters)
+    
+    def iter_finance_orders(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Moliyaviy buyurtmalar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_finance_orders", limit, page_size, **filters)
+    
+    def iter_invoices(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Hisob-fakturalar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_invoices", limit, page_size, **filters)
+    
+    def iter_invoice_returns(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Hisob-faktura qaytarishlari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_invoice_returns", limit, page_size, **filters)
+    
+    def iter_shop_invoices(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Do'kon hisob-fakturalari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_shop_invoice_by_id", limit, page_size, **filters)
+    
+    def iter_shop_returns(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> Iterator[Any]:
+        """Do'kon qaytarishlari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_shop_returns", limit, page_size, **filters)
+
+
+# API kalit bo'yicha mijozlar keshi
+_clients = TTLCache(
+    max_size=HTTP_CONFIG["client_cache_size"],
+    ttl=HTTP_CONFIG["client_cache_ttl"]
+)
+
+def get_api_client(api_key: str) -> MarketplaceAPIClient:
+    """API kalit uchun keshlangan mijozni olish (har safar yangisini yaratmaslik uchun)"""
+    client = _clients.get(api_key)
+    if client is MISSING:
+        client = MarketplaceAPIClient(api_key)
+        _clients.set(api_key, client)
+    return client
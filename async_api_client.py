@@ -0,0 +1,710 @@
+"""
+Marketplace API bilan ishlash moduli (asyncio)
+MarketplaceAPIClient ning asinxron egizagi - metodlar va javoblar bir xil
+"""
+
+import json
+import asyncio
+import logging
+import contextvars
+from typing import AsyncIterator, Awaitable, Dict, Iterable, List, Optional, Any
+import aiohttp
+from cache import TTLCache, MISSING
+from shop_cache import get_shops_entry, store_shops
+from pagination import PAGED_ENDPOINTS, aiter_pages, page_size_for
+from response_cache import response_cache, cache_key, cache_ttl, invalidated_paths
+from config import API_BASE_URL, HTTP_CONFIG
+from http_transport import (
+    get_async_session, request_timeout, current_budget, encode_params,
+    retry_delay, retry_allowed, RETRY_STATUSES, RETRY_METHODS
+)
+
+logger = logging.getLogger(__name__)
+
+class AsyncResponse:
+    """O'qib bo'lingan javob (requests.Response ning kerakli qismi)"""
+    
+    def __init__(self, status_code: int, content: bytes, encoding: Optional[str] = None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding or "utf-8"
+    
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+    
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+class AsyncMarketplaceAPIClient:
+    """Marketplace API asinxron mijozi"""
+    
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.base_url = API_BASE_URL
+        # Umumiy sarlavhalar sessiyada, API kalit esa har bir so'rovda yuboriladi
+        self.headers = {
+            "Authorization": api_key
+        }
+    
+    async def _request(self, method: str, path: str, params: Optional[Dict] = None,
+                       json: Any = None) -> AsyncResponse:
+        """So'rov yuborish - timeout va qayta urinishlar sinxron mijoz bilan bir xil"""
+        session = await get_async_session()
+        max_retries = HTTP_CONFIG["max_retries"] if method in RETRY_METHODS else 0
+        attempt = 0
+        
+        while True:
+            connect_timeout, read_timeout = request_timeout()
+            # total va wait_for - sekin kelayotgan javob ham byudjetdan oshmaydi
+            budget = current_budget()
+            total = budget.remaining() if budget is not None else None
+            timeout = aiohttp.ClientTimeout(total=total, sock_connect=connect_timeout, sock_read=read_timeout)
+            
+            try:
+                result, retry_after = await asyncio.wait_for(
+                    self._send(session, method, path, params, json, timeout), total
+                )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if budget is not None and budget.remaining() <= 0:
+                    budget.exhausted = True
+                    raise
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                delay = retry_delay(attempt)
+                if not retry_allowed(delay):
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            
+            if result.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return result
+            
+            attempt += 1
+            delay = retry_delay(attempt, retry_after)
+            if not retry_allowed(delay):
+                # Kutish byudjetga sig'maydi - oxirgi javob qaytariladi
+                return result
+            await asyncio.sleep(delay)
+    
+    async def _send(self, session: aiohttp.ClientSession, method: str, path: str, params: Optional[Dict],
+                    json: Any, timeout: aiohttp.ClientTimeout):
+        """Bitta urinish: (javob, Retry-After)"""
+        async with session.request(
+            method,
+            f"{self.base_url}{path}",
+            params=encode_params(params),
+            json=json,
+            headers=self.headers,
+            timeout=timeout
+        ) as response:
+            content = await response.read()
+            return AsyncResponse(response.status, content, response.charset), response.headers.get("Retry-After")
+    
+    async def _get(self, path: str, **kwargs) -> AsyncResponse:
+        """GET so'rov (umumiy ulanishlar hovuzi orqali, keshlanadigan endpointlar keshdan)"""
+        ttl = cache_ttl(path)
+        if ttl is None:
+            return await self._request("GET", path, **kwargs)
+        
+        key = cache_key(self.api_key, path, kwargs.get('params'))
+        response, stale = response_cache.lookup(key)
+        if response is None:
+            return await self._fetch_cached(key, ttl, path, kwargs)
+        
+        if stale and response_cache.begin_refresh(key):
+            # Eskirgan javob darhol qaytariladi, yangisi fonda olinadi (handler byudjetisiz)
+            asyncio.get_running_loop().create_task(
+                self._refresh_cached(key, ttl, path, kwargs),
+                context=contextvars.Context()
+            )
+        return response
+    
+    async def _fetch_cached(self, key, ttl: int, path: str, kwargs: Dict) -> AsyncResponse:
+        """API dan olish va muvaffaqiyatli javobni keshlash"""
+        version = response_cache.version
+        response = await self._request("GET", path, **kwargs)
+        if response.status_code == 200:
+            response_cache.store(key, ttl, response, version)
+        return response
+    
+    async def _refresh_cached(self, key, ttl: int, path: str, kwargs: Dict):
+        """Keshdagi javobni fonda yangilash"""
+        try:
+            await self._fetch_cached(key, ttl, path, kwargs)
+        except Exception as e:
+            logger.error(f"Keshni yangilashda xatolik: {e}")
+        finally:
+            response_cache.end_refresh(key)
+    
+    async def _post(self, path: str, **kwargs) -> AsyncResponse:
+        """POST so'rov (umumiy ulanishlar hovuzi orqali) - bog'liq kesh yozuvlari o'chiriladi"""
+        try:
+            return await self._request("POST", path, **kwargs)
+        finally:
+            response_cache.invalidate(self.api_key, invalidated_paths(path))
+    
+    async def fan_out(self, calls: Iterable[Awaitable], limit: Optional[int] = None) -> List[Any]:
+        """Mustaqil so'rovlarni parallel bajarish - natijalar berilgan tartibda qaytadi"""
+        semaphore = asyncio.Semaphore(limit or HTTP_CONFIG["fan_out_limit"])
+        
+        async def run(call: Awaitable) -> Any:
+            async with semaphore:
+                try:
+                    return await call
+                except Exception as e:
+                    logger.error(f"Parallel so'rovda xatolik: {e}")
+                    return None
+        
+        return await asyncio.gather(*(run(call) for call in calls))
+    
+    async def test_connection(self) -> bool:
+        """API ulanishini tekshirish"""
+        try:
+            # Kalitni tekshirish uchun kesh ishlatilmaydi
+            response = await self._request("GET", "/v2/fbs/sku/stocks")
+            logger.info(f"API test response status: {response.status_code}")
+            if response.status_code != 200:
+                logger.error(f"API test failed with response: {response.text}")
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"API ulanishini tekshirishda xatolik: {e}")
+            return False
+    
+    # FBS (Fulfillment by Seller) metodlari
+    async def get_fbs_orders(self, shop_ids: List[int] = None, status: str = "CREATED") -> Optional[Dict]:
+        """FBS buyurtmalarini olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {}
+            
+            if shop_ids:
+                params['shopIds'] = shop_ids
+            if status:
+                params['status'] = status
+            
+            response = await self._get("/v1/fbs/orders", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS buyurtmalarini olishda xatolik: {e}")
+            return None
+    
+    async def get_fbs_order_details(self, order_id: str) -> Optional[Dict]:
+        """FBS buyurtma tafsilotlarini olish"""
+        try:
+            response = await self._get(f"/v1/fbs/order/{order_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS buyurtma tafsilotlarini olishda xatolik: {e}")
+            return None
+    
+    async def cancel_fbs_order(self, order_id: str) -> bool:
+        """FBS buyurtmani bekor qilish"""
+        try:
+            response = await self._post(f"/v1/fbs/order/{order_id}/cancel")
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS buyurtmani bekor qilishda xatolik: {e}")
+            return False
+    
+    async def confirm_fbs_order(self, order_id: str) -> bool:
+        """FBS buyurtmani tasdiqlash"""
+        try:
+            response = await self._post(f"/v1/fbs/order/{order_id}/confirm")
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS buyurtmani tasdiqlashda xatolik: {e}")
+            return False
+    
+    async def get_fbs_orders_count(self, shop_ids: List[int] = None, status: str = "CREATED", 
+                           date_from: int = None, date_to: int = None) -> Optional[Dict]:
+        """FBS buyurtmalar sonini olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {}
+            
+            if shop_ids:
+                params['shopIds'] = shop_ids
+            if status:
+                params['status'] = status
+            if date_from:
+                params['dateFrom'] = date_from
+            if date_to:
+                params['dateTo'] = date_to
+            
+            response = await self._get("/v2/fbs/orders/count", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS buyurtmalar sonini olishda xatolik: {e}")
+            return None
+    
+    async def get_fbs_stocks(self) -> Optional[List]:
+        """FBS SKU qoldiqlarini olish"""
+        try:
+            response = await self._get("/v2/fbs/sku/stocks")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS qoldiqlarini olishda xatolik: {e}")
+            return None
+    
+    async def update_fbs_stocks(self, stocks_data: List[Dict]) -> bool:
+        """FBS SKU qoldiqlarini yangilash"""
+        try:
+            response = await self._post(
+                "/v2/fbs/sku/stocks",
+                json=stocks_data
+            )
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS qoldiqlarini yangilashda xatolik: {e}")
+            return False
+    
+    # Finance metodlari
+    async def get_finance_expenses(self, page: int = 0, size: int = 20, shop_id: int = None, 
+                           shop_ids: List[int] = None, date_from: int = None, date_to: int = None,
+                           sources: List[str] = None) -> Optional[Dict]:
+        """Moliyaviy xarajatlarni olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {
+                'page': page,
+                'size': size
+            }
+            
+            if shop_id:
+                params['shopId'] = shop_id
+            if shop_ids:
+                params['shopIds'] = shop_ids
+            if date_from:
+                params['dateFrom'] = date_from
+            if date_to:
+                params['dateTo'] = date_to
+            if sources:
+                params['sources'] = sources
+            
+            response = await self._get("/v1/finance/expenses", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Moliyaviy xarajatlarni olishda xatolik: {e}")
+            return None
+    
+    async def get_finance_orders(self, page: int = 0, size: int = 20, group: bool = False, 
+                          date_from: int = None, date_to: int = None, statuses: List[str] = None,
+                          shop_ids: List[int] = None) -> Optional[Dict]:
+        """Moliyaviy buyurtmalar ro'yxatini olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {
+                'page': page,
+                'size': size,
+                'group': group
+            }
+            
+            if date_from:
+                params['dateFrom'] = date_from
+            if date_to:
+                params['dateTo'] = date_to
+            if statuses:
+                params['statuses'] = statuses
+            if shop_ids:
+                params['shopIds'] = shop_ids
+            
+            response = await self._get("/v1/finance/orders", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Moliyaviy buyurtmalarni olishda xatolik: {e}")
+            return None
+    
+    # Invoice metodlari
+    async def get_invoices(self, size: int = 50, page: int = 0) -> Optional[List]:
+        """Hisob-fakturalar ro'yxatini olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {
+                'size': min(size, 50),  # Maksimum 50
+                'page': page
+            }
+            
+            response = await self._get("/v1/invoice", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Hisob-fakturalarni olishda xatolik: {e}")
+            return None
+    
+    async def get_invoice_returns(self, return_id: int = None, page: int = 0, size: int = 50) -> Optional[List]:
+        """Hisob-faktura qaytarishlarini olish - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {
+                'page': page,
+                'size': min(size, 50)  # Maksimum 50
+            }
+            
+            if return_id:
+                params['returnId'] = return_id
+            
+            response = await self._get("/v1/return", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Hisob-faktura qaytarishlarini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_invoice(self, shop_id: str) -> Optional[Dict]:
+        """Do'kon hisob-fakturasini olish"""
+        try:
+            response = await self._get(f"/v1/shop/{shop_id}/invoice")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon hisob-fakturasini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_invoice_return(self, shop_id: str) -> Optional[Dict]:
+        """Do'kon hisob-faktura qaytarishini olish"""
+        try:
+            response = await self._get(f"/v1/shop/{shop_id}/return")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon hisob-faktura qaytarishini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_return_details(self, shop_id: str, return_id: str) -> Optional[Dict]:
+        """Do'kon qaytarish tafsilotlarini olish"""
+        try:
+            response = await self._get(f"/v1/shop/{shop_id}/return/{return_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon qaytarish tafsilotlarini olishda xatolik: {e}")
+            return None
+    
+    # Product metodlari
+    async def update_product_price(self, shop_id: int, data: Dict) -> bool:
+        """Mahsulot narxini yangilash - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            response = await self._post(
+                f"/v1/product/{shop_id}/sendPriceData",
+                json=data
+            )
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Mahsulot narxini yangilashda xatolik: {e}")
+            return False
+    
+    async def get_product_by_sku(self, shop_id: str) -> Optional[Dict]:
+        """SKU bo'yicha mahsulotni olish"""
+        try:
+            params = {
+                'page': 0,
+                'size': 20,
+                'filter': 'ALL'
+            }
+            response = await self._get(f"/v1/product/shop/{shop_id}", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Mahsulotni olishda xatolik: {e}")
+            return None
+    
+    async def search_products(self, shop_id: int, search_query: str = "", page: int = 0, size: int = 20, 
+                       sort_by: str = "DEFAULT", order: str = "ASC", filter_type: str = "ALL", 
+                       product_rank: str = None) -> Optional[Dict]:
+        """Mahsulotlarni qidirish (OpenAPI spetsifikatsiyasiga asoslanib)"""
+        try:
+            params = {
+                'page': page,
+                'size': size,
+                'sortBy': sort_by,
+                'order': order,
+                'filter': filter_type
+            }
+            
+            if search_query:
+                params['searchQuery'] = search_query
+            if product_rank:
+                params['productRank'] = product_rank
+            
+            response = await self._get(
+                f"/v1/product/shop/{shop_id}", 
+                params=params
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Mahsulot qidirishda xatolik: {response.status_code} - {response.text}")
+            return None
+        except Exception as e:
+            logger.error(f"Mahsulot qidirishda xatolik: {e}")
+            return None
+    
+    # Shop metodlari  
+    async def get_shops(self) -> Optional[List]:
+        """Do'konlar ro'yxatini olish"""
+        try:
+            response = await self._get("/v1/shops")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'konlar ro'yxatini olishda xatolik: {e}")
+            return None
+    
+    async def get_shops_cached(self, refresh: bool = False) -> Optional[List]:
+        """Do'konlar ro'yxatini keshdan olish (refresh=True - API dan qayta yuklash)"""
+        if not refresh:
+            entry = get_shops_entry(self.api_key)
+            if entry is not None:
+                return entry.shops
+        
+        else:
+            response_cache.invalidate(self.api_key, ['/v1/shops'])
+        
+        shops = await self.get_shops()
+        # Xatolik natijasi keshlanmaydi
+        if shops and isinstance(shops, list):
+            store_shops(self.api_key, shops)
+        return shops
+    
+    async def get_shop_ids(self, refresh: bool = False) -> List[int]:
+        """Do'kon ID lari (do'konlar keshidan bir marta hisoblangan)"""
+        entry = None if refresh else get_shops_entry(self.api_key)
+        if entry is None:
+            await self.get_shops_cached(refresh=refresh)
+            entry = get_shops_entry(self.api_key)
+        return list(entry.shop_ids) if entry else []
+    
+    async def get_shop_products_by_shop_id(self, shop_id: int, page: int = 0, size: int = 20,
+                                    filter: str = "ALL") -> Optional[Dict]:
+        """Do'kon mahsulotlarini sahifalab olish (productList, totalProductsAmount)"""
+        try:
+            params = {
+                'page': page,
+                'size': size,
+                'filter': filter
+            }
+            response = await self._get(f"/v1/product/shop/{shop_id}", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon mahsulotlarini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_invoice_by_id(self, shop_id: int, page: int = 0, size: int = 20) -> Optional[Dict]:
+        """Do'kon bo'yicha hisob-fakturalarni olish"""
+        try:
+            params = {'page': page, 'size': size}
+            response = await self._get(f"/v1/shop/{shop_id}/invoice", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon hisob-fakturasini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_invoice_products(self, shop_id: int, invoice_id: int) -> Optional[Dict]:
+        """Hisob-faktura mahsulotlarini olish"""
+        try:
+            params = {'invoiceId': invoice_id}
+            response = await self._get(f"/v1/shop/{shop_id}/invoice/products", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Hisob-faktura mahsulotlarini olishda xatolik: {e}")
+            return None
+    
+    async def get_shop_returns(self, shop_id: int, page: int = 0, size: int = 20) -> Optional[Dict]:
+        """Do'kon qaytarishlarini olish"""
+        try:
+            params = {'page': page, 'size': size}
+            response = await self._get(f"/v1/shop/{shop_id}/return", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Do'kon qaytarishlarini olishda xatolik: {e}")
+            return None
+    
+    # Finance metodlari
+    async def get_finance_seller_payment_info(self) -> Optional[Dict]:
+        """Moliyaviy to'lov ma'lumotlarini olish"""
+        try:
+            response = await self._get("/v1/finance/seller-payment-info")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Moliyaviy to'lov ma'lumotlarini olishda xatolik: {e}")
+            return None
+    
+    async def get_finance_commission_info(self) -> Optional[Dict]:
+        """Komissiya ma'lumotlarini olish"""
+        try:
+            response = await self._get("/v1/finance/commission-info")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"Komissiya ma'lumotlarini olishda xatolik: {e}")
+            return None
+    
+    # FBS qo'shimcha metodlari
+    async def get_fbs_orders_v2(self, page: int = 0, size: int = 20, status: str = "CREATED", 
+                          shop_ids: List[int] = None, date_from: int = None, date_to: int = None) -> Optional[Dict]:
+        """FBS buyurtmalarini olish (v2) - OpenAPI spetsifikatsiyasiga asoslanib"""
+        try:
+            params = {
+                'page': page, 
+                'size': size,
+                'status': status
+            }
+            
+            if shop_ids:
+                params['shopIds'] = shop_ids
+            if date_from:
+                params['dateFrom'] = date_from
+            if date_to:
+                params['dateTo'] = date_to
+            
+            response = await self._get("/v2/fbs/orders", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS buyurtmalarini olishda xatolik: {e}")
+            return None
+    
+    async def get_fbs_order_by_id(self, order_id: str) -> Optional[Dict]:
+        """FBS buyurtma tafsilotlarini olish"""
+        try:
+            response = await self._get(f"/v1/fbs/order/{order_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS buyurtma tafsilotlarini olishda xatolik: {e}")
+            return None
+    
+    async def confirm_fbs_order_v2(self, order_id: str) -> bool:
+        """FBS buyurtmani tasdiqlash"""
+        try:
+            response = await self._post(f"/v1/fbs/order/{order_id}/confirm")
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS buyurtmani tasdiqlashda xatolik: {e}")
+            return False
+    
+    async def cancel_fbs_order_v2(self, order_id: str, reason_id: int) -> bool:
+        """FBS buyurtmani bekor qilish"""
+        try:
+            data = {"reasonId": reason_id}
+            response = await self._post(f"/v1/fbs/order/{order_id}/cancel", json=data)
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS buyurtmani bekor qilishda xatolik: {e}")
+            return False
+    
+    async def get_fbs_return_reasons(self) -> Optional[Dict]:
+        """FBS qaytarish sabablarini olish"""
+        try:
+            response = await self._get("/v1/fbs/order/return-reasons")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS qaytarish sabablarini olishda xatolik: {e}")
+            return None
+    
+    async def get_fbs_sku_stocks_v2(self) -> Optional[Dict]:
+        """FBS SKU qoldiqlarini olish (v2)"""
+        try:
+            response = await self._get("/v2/fbs/sku/stocks")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception as e:
+            logger.error(f"FBS SKU qoldiqlarini olishda xatolik: {e}")
+            return None
+    
+    async def update_fbs_sku_stocks(self, stock_data: Dict) -> bool:
+        """FBS SKU qoldiqlarini yangilash"""
+        try:
+            response = await self._post("/v2/fbs/sku/stocks", json=stock_data)
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"FBS SKU qoldiqlarini yangilashda xatolik: {e}")
+            return False
+    
+    # Sahifalash iteratorlari
+    def iter_items(self, method_name: str, limit: Optional[int] = None, page_size: int = 50,
+                   **filters) -> AsyncIterator[Any]:
+        """Sahifalangan metod elementlarini birma-bir qaytarish (async for, limit ga yetganda to'xtaydi)"""
+        method = getattr(self, method_name)
+        size = page_size_for(method_name, min(page_size, limit) if limit else page_size)
+        return aiter_pages(
+            lambda page, size: method(page=page, size=size, **filters),
+            PAGED_ENDPOINTS[method_name],
+            size,
+            limit
+        )
+    
+    def iter_fbs_orders_v2(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """FBS buyurtmalari (v2) - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_fbs_orders_v2", limit, page_size, **filters)
+    
+    def iter_finance_expenses(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Moliyaviy xarajatlar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_finance_expenses", limit, page_size, **filters)
+    
+    def iter_finance_orders(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Moliyaviy buyurtmalar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_finance_orders", limit, page_size, **filters)
+    
+    def iter_invoices(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Hisob-fakturalar - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_invoices", limit, page_size, **filters)
+    
+    def iter_invoice_returns(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Hisob-faktura qaytarishlari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_invoice_returns", limit, page_size, **filters)
+    
+    def iter_shop_invoices(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Do'kon hisob-fakturalari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_shop_invoice_by_id", limit, page_size, **filters)
+    
+    def iter_shop_returns(self, limit: Optional[int] = None, page_size: int = 50, **filters) -> AsyncIterator[Any]:
+        """Do'kon qaytarishlari - barcha sahifalar bo'yicha"""
+        return self.iter_items("get_shop_returns", limit, page_size, **filters)
+
+
+# API kalit bo'yicha mijozlar keshi
+_clients = TTLCache(
+    max_size=HTTP_CONFIG["client_cache_size"],
+    ttl=HTTP_CONFIG["client_cache_ttl"]
+)
+
+def get_async_api_client(api_key: str) -> AsyncMarketplaceAPIClient:
+    """API kalit uchun keshlangan asinxron mijozni olish"""
+    client = _clients.get(api_key)
+    if client is MISSING:
+        client = AsyncMarketplaceAPIClient(api_key)
+        _clients.set(api_key, client)
+    return client
@@ -3,24 +3,37 @@ Telegram bot handlerlari
 Barcha bot funksionalligini boshqarish
 """
 
+import asyncio
 import logging
-from telebot import TeleBot
+import tempfile
+import contextvars
+from telebot.async_telebot import AsyncTeleBot
 from telebot.types import Message, CallbackQuery
-from database import save_user_api_key, get_user_api_key, delete_user_api_key, update_user_activity
-from api_client import MarketplaceAPIClient
+from database import save_user_api_key, get_user_api_key, delete_user_api_key, update_user_activity, is_api_key_in_use
+from async_api_client import get_async_api_client
+from http_transport import with_latency_budget, budget_expired, current_budget
+from concurrency import limit_concurrency
+from shop_cache import invalidate_shops
+from response_cache import invalidate_responses
+from missing_goods import start_missing_scan, invalidate_missing_scan
+from state_store import state_store
+from callback_router import callback_router
+from prefetch import prefetcher
+from order_sync import is_synced, start_order_sync, get_local_orders, get_local_counts, delete_local_orders
+from stock_watch import get_thresholds, set_thresholds, delete_stock_watch
+from order_notifier import delete_notify_state
+from stock_upload import run_stock_upload, format_upload_report
+from shop_cache import api_key_hash
 from keyboards import *
 from utils import *
-from config import MESSAGES
+from config import MESSAGES, MISSING_SCAN_CONFIG, STOCK_UPLOAD_CONFIG
 
 logger = logging.getLogger(__name__)
 
-# Foydalanuvchilar holati
-user_states = {}
-
 # Bot obyektini global o'zgaruvchi sifatida saqlash
 bot = None
 
-def check_user_blocked(user_id: int) -> bool:
+async def check_user_blocked(user_id: int) -> bool:
     """Foydalanuvchi bloklangan ekanligini tekshirish va maxsus xabar yuborish"""
     from database import is_user_blocked
     if is_user_blocked(user_id):
@@ -42,7 +55,7 @@ def check_user_blocked(user_id: int) -> bool:
             )
         )
         
-        bot.send_message(
+        await bot.send_message(
             user_id,
             "❌ <b>Sizning botdan foydalanish huquqingiz cheklangan!</b>\n\n"
             "💳 <b>To'lovni amalga oshirish uchun iltimos adminga murojaat qiling!</b>\n\n"
@@ -54,13 +67,15 @@ def check_user_blocked(user_id: int) -> bool:
         return True
     return False
 
-def register_handlers(telegram_bot: TeleBot):
+def register_handlers(telegram_bot: AsyncTeleBot):
     global bot
     bot = telegram_bot
     """Barcha handlerlarni ro'yxatdan o'tkazish"""
     
     @bot.message_handler(commands=['start'])
-    def handle_start(message: Message):
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_start(message: Message):
         """Start buyrug'ini bajarish"""
         try:
             user_id = message.from_user.id
@@ -69,7 +84,7 @@ def register_handlers(telegram_bot: TeleBot):
             last_name = message.from_user.last_name
             
             # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            if await check_user_blocked(user_id):
                 return
             
             # Foydalanuvchi faolligini yangilash
@@ -80,28 +95,28 @@ def register_handlers(telegram_bot: TeleBot):
             
             if api_key:
                 # API ulanishini tekshirish
-                api_client = MarketplaceAPIClient(api_key)
-                if api_client.test_connection():
+                api_client = get_async_api_client(api_key)
+                if await api_client.test_connection():
                     # Admin ekanligini tekshirish
-                    from admin_panel import AdminPanel
-                    admin_panel = AdminPanel(bot)
+                    from admin_panel import get_admin_panel
+                    admin_panel = get_admin_panel(bot)
                     is_admin = admin_panel.is_admin(user_id)
                     
-                    bot.send_message(
+                    await bot.send_message(
                         message.chat.id,
                         MESSAGES["welcome"] + "\n\n" + MESSAGES["api_status_connected"],
                         parse_mode="HTML",
                         reply_markup=get_main_menu_keyboard(is_admin=is_admin)
                     )
                 else:
-                    bot.send_message(
+                    await bot.send_message(
                         message.chat.id,
                         MESSAGES["api_invalid"],
                         parse_mode="HTML",
                         reply_markup=get_api_management_keyboard()
                     )
             else:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     MESSAGES["welcome_no_api"],
                     parse_mode="HTML",
@@ -109,61 +124,64 @@ def register_handlers(telegram_bot: TeleBot):
                 )
         except Exception as e:
             logger.error(f"Start handlerida xatolik: {e}")
-            bot.send_message(message.chat.id, MESSAGES["error"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["error"], parse_mode="HTML")
     
     @bot.message_handler(commands=['help'])
-    def handle_help(message: Message):
+    @limit_concurrency
+    async def handle_help(message: Message):
         """Yordam buyrug'ini bajarish"""
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             MESSAGES["help"],
             parse_mode="HTML"
         )
     
     @bot.message_handler(commands=['api'])
-    def handle_api_command(message: Message):
+    @limit_concurrency
+    async def handle_api_command(message: Message):
         """API buyrug'ini bajarish"""
         try:
             # Avval rasmni yuborish
             with open('uzum_kirish.png', 'rb') as photo:
-                bot.send_photo(
+                await bot.send_photo(
                     message.chat.id,
                     photo,
                     caption="🔑 API kalitingizni yuboring:\n\nAPI kalitni olish yuqoridagi rasmda ketma ket ko'rsatilgan shunday holatda yuboring iltimos e'tiborli bo'ling!"
                 )
         except FileNotFoundError:
             # Agar rasm topilmasa, oddiy xabar yuborish
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 MESSAGES["api_prompt"],
                 parse_mode="HTML"
             )
         
         # API boshqarish klaviaturasini yuborish
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Kerakli amalni tanlang:",
             reply_markup=get_api_management_keyboard()
         )
     
     @bot.message_handler(commands=['menu'])
-    def handle_menu_command(message: Message):
+    @limit_concurrency
+    async def handle_menu_command(message: Message):
         """Menyu buyrug'ini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         # Admin ekanligini tekshirish
-        from admin_panel import AdminPanel
-        admin_panel = AdminPanel(bot)
+        from admin_panel import get_admin_panel
+        admin_panel = get_admin_panel(bot)
         is_admin = admin_panel.is_admin(user_id)
         
         if not api_key:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 MESSAGES["no_api"],
                 parse_mode="HTML",
@@ -171,7 +189,7 @@ def register_handlers(telegram_bot: TeleBot):
             )
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             MESSAGES["main_menu"],
             parse_mode="HTML",
@@ -179,18 +197,20 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(commands=['status'])
-    def handle_status_command(message: Message):
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_status_command(message: Message):
         """API holati buyrug'ini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 MESSAGES["api_status_disconnected"],
                 parse_mode="HTML"
@@ -198,60 +218,65 @@ def register_handlers(telegram_bot: TeleBot):
             return
         
         # API ulanishini tekshirish
-        bot.send_message(message.chat.id, MESSAGES["api_testing"], parse_mode="HTML")
+        await bot.send_message(message.chat.id, MESSAGES["api_testing"], parse_mode="HTML")
         
-        api_client = MarketplaceAPIClient(api_key)
-        if api_client.test_connection():
-            bot.send_message(
+        api_client = get_async_api_client(api_key)
+        if await api_client.test_connection():
+            await bot.send_message(
                 message.chat.id,
                 MESSAGES["api_status_connected"],
                 parse_mode="HTML"
             )
         else:
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 MESSAGES["api_status_disconnected"],
                 parse_mode="HTML"
             )
     
     @bot.message_handler(func=lambda message: message.text == "📦 FBS Buyurtmalar")
-    def handle_fbs_orders_button(message: Message):
+    @limit_concurrency
+    async def handle_fbs_orders_button(message: Message):
         """FBS buyurtmalar tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "📦 <b>FBS Buyurtmalar bo'limi</b>\n\nKerakli amalni tanlang:",
             parse_mode="HTML",
             reply_markup=get_fbs_menu_keyboard()
         )
+        
+        # Keyingi tugma ma'lumotlari fonda keshga yuklanadi
+        prefetcher.schedule("fbs_menu", user_id, api_key)
     
     @bot.message_handler(func=lambda message: message.text == "📊 FBS Statistika")
-    def handle_fbs_statistics_button(message: Message):
+    @limit_concurrency
+    async def handle_fbs_statistics_button(message: Message):
         """FBS statistika tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "📊 <b>FBS Statistika bo'limi</b>\n\nKerakli ma'lumotni tanlang:",
             parse_mode="HTML",
@@ -259,42 +284,47 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(func=lambda message: message.text == "💰 Moliyaviy hisobot")
-    def handle_finance_button(message: Message):
+    @limit_concurrency
+    async def handle_finance_button(message: Message):
         """Moliyaviy hisobot tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "💰 <b>Moliyaviy hisobot bo'limi</b>\n\nKerakli ma'lumotni tanlang:",
             parse_mode="HTML",
             reply_markup=get_finance_menu_keyboard()
         )
+        
+        # Keyingi tugma ma'lumotlari fonda keshga yuklanadi
+        prefetcher.schedule("finance_menu", user_id, api_key)
     
     @bot.message_handler(func=lambda message: message.text == "🔐 Admin Panel")
-    def handle_admin_panel_button(message: Message):
+    @limit_concurrency
+    async def handle_admin_panel_button(message: Message):
         """Admin panel tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
         
         # Admin ekanligini tekshirish
-        from admin_panel import AdminPanel
-        admin_panel = AdminPanel(bot)
+        from admin_panel import get_admin_panel
+        admin_panel = get_admin_panel(bot)
         
         if not admin_panel.is_admin(user_id):
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 "❌ Sizda admin huquqi yo'q!",
                 parse_mode="HTML"
@@ -304,7 +334,7 @@ def register_handlers(telegram_bot: TeleBot):
         # Admin panel ochish
         admin_text = "🔐 <b>Admin Panel</b>\n\nKerakli amalni tanlang:"
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             admin_text,
             parse_mode="HTML",
@@ -313,81 +343,83 @@ def register_handlers(telegram_bot: TeleBot):
     
     # Admin callback handlerlari
     @bot.callback_query_handler(func=lambda call: call.data.startswith('admin_'))
-    def admin_callback_handler(call: CallbackQuery):
+    @limit_concurrency
+    async def admin_callback_handler(call: CallbackQuery):
         """Admin callback handlerlari"""
         try:
             user_id = call.from_user.id
             
             # Admin ekanligini tekshirish
-            from admin_panel import AdminPanel
-            admin_panel = AdminPanel(bot)
+            from admin_panel import get_admin_panel
+            admin_panel = get_admin_panel(bot)
             
             if not admin_panel.is_admin(user_id):
-                bot.answer_callback_query(call.id, "❌ Sizda admin huquqi yo'q!")
+                await bot.answer_callback_query(call.id, "❌ Sizda admin huquqi yo'q!")
                 return
             
             data = call.data
             logger.info(f"Admin callback: {data} from user {user_id}")
             
             # Callback javobini darhol yuborish
-            bot.answer_callback_query(call.id, f"✅ {data} bajarilmoqda...")
+            await bot.answer_callback_query(call.id, f"✅ {data} bajarilmoqda...")
             
             if data == "admin_stats":
-                admin_panel.handle_admin_stats(call)
+                await admin_panel.handle_admin_stats(call)
             elif data == "admin_users":
-                admin_panel.handle_admin_users(call)
+                await admin_panel.handle_admin_users(call)
             elif data == "admin_broadcast":
-                admin_panel.handle_admin_broadcast(call)
+                await admin_panel.handle_admin_broadcast(call)
             elif data == "admin_block":
-                admin_panel.handle_admin_block(call)
+                await admin_panel.handle_admin_block(call)
             elif data == "admin_unblock":
-                admin_panel.handle_admin_unblock(call)
+                await admin_panel.handle_admin_unblock(call)
             elif data == "admin_add_admin":
-                admin_panel.handle_admin_add_admin(call)
+                await admin_panel.handle_admin_add_admin(call)
             elif data == "admin_api_keys":
-                admin_panel.handle_admin_api_keys(call)
+                await admin_panel.handle_admin_api_keys(call)
             elif data == "admin_all_api_keys":
-                admin_panel.handle_admin_all_api_keys(call)
+                await admin_panel.handle_admin_all_api_keys(call)
             elif data == "admin_activity":
-                admin_panel.handle_admin_activity(call)
+                await admin_panel.handle_admin_activity(call)
             elif data == "admin_user_management":
-                admin_panel.handle_admin_user_management(call)
+                await admin_panel.handle_admin_user_management(call)
             elif data == "admin_main_menu":
-                admin_panel.handle_admin_main_menu(call)
+                await admin_panel.handle_admin_main_menu(call)
             elif data == "admin_back":
-                admin_panel.handle_admin_back(call)
+                await admin_panel.handle_admin_back(call)
             else:
                 logger.warning(f"Noma'lum admin callback: {data}")
-                bot.answer_callback_query(call.id, f"❌ Noma'lum buyruq: {data}")
-                
+                await bot.answer_callback_query(call.id, f"❌ Noma'lum buyruq: {data}")
+        
         except Exception as e:
             logger.error(f"Admin callback handlerda xatolik: {e}")
             try:
-                bot.answer_callback_query(call.id, "❌ Xatolik yuz berdi!")
+                await bot.answer_callback_query(call.id, "❌ Xatolik yuz berdi!")
             except:
                 pass
     
     # Admin bloklash va blokni olib tashlash xabarlarini qayta ishlash
     @bot.message_handler(func=lambda message: message.text and message.text.isdigit())
-    def handle_admin_user_id_input(message: Message):
+    @limit_concurrency
+    async def handle_admin_user_id_input(message: Message):
         """Admin foydalanuvchi ID ni qabul qilish"""
         try:
             user_id = message.from_user.id
             
             # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            if await check_user_blocked(user_id):
                 return
             
             # Admin ekanligini tekshirish
-            from admin_panel import AdminPanel
-            admin_panel = AdminPanel(bot)
+            from admin_panel import get_admin_panel
+            admin_panel = get_admin_panel(bot)
             
             if not admin_panel.is_admin(user_id):
                 return
             
             # Foydalanuvchi holatini tekshirish
             from telebot.handler_backends import State, StatesGroup
-            current_state = bot.get_state(user_id, message.chat.id)
+            current_state = await bot.get_state(user_id, message.chat.id)
             
             if current_state == "waiting_for_block_user_id":
                 # Foydalanuvchini bloklash
@@ -412,7 +444,7 @@ def register_handlers(telegram_bot: TeleBot):
                             )
                         )
                         
-                        bot.send_message(
+                        await bot.send_message(
                             target_user_id,
                             "❌ <b>Sizning botdan foydalanish huquqingiz cheklangan!</b>\n\n"
                             "💳 <b>To'lovni amalga oshirish uchun iltimos adminga murojaat qiling!</b>\n\n"
@@ -425,7 +457,7 @@ def register_handlers(telegram_bot: TeleBot):
                         pass
                     
                     # Admin ga natija xabarini yuborish
-                    bot.reply_to(
+                    await bot.reply_to(
                         message,
                         f"✅ <b>Foydalanuvchi bloklandi!</b>\n\n"
                         f"🆔 ID: {target_user_id}\n"
@@ -435,17 +467,17 @@ def register_handlers(telegram_bot: TeleBot):
                     )
                     
                     # Holatni tozalash
-                    bot.delete_state(user_id, message.chat.id)
+                    await bot.delete_state(user_id, message.chat.id)
                 else:
-                    bot.reply_to(message, "❌ Foydalanuvchini bloklashda xatolik yuz berdi!")
-                    
+                    await bot.reply_to(message, "❌ Foydalanuvchini bloklashda xatolik yuz berdi!")
+            
             elif current_state == "waiting_for_unblock_user_id":
                 # Foydalanuvchining blokini olib tashlash
                 target_user_id = int(message.text)
                 if admin_panel.unblock_user(target_user_id):
                     # Blokdan chiqarilgan foydalanuvchiga xabar yuborish
                     try:
-                        bot.send_message(
+                        await bot.send_message(
                             target_user_id,
                             "✅ <b>Sizning botdan foydalanish huquqingiz tiklandi!</b>\n\n"
                             "🎉 Tabriklaymiz! Admin tomonidan blokdan chiqarildingiz.\n\n"
@@ -457,7 +489,7 @@ def register_handlers(telegram_bot: TeleBot):
                         pass
                     
                     # Admin ga natija xabarini yuborish
-                    bot.reply_to(
+                    await bot.reply_to(
                         message,
                         f"✅ <b>Foydalanuvchi blokdan chiqarildi!</b>\n\n"
                         f"🆔 ID: {target_user_id}\n"
@@ -467,30 +499,31 @@ def register_handlers(telegram_bot: TeleBot):
                     )
                     
                     # Holatni tozalash
-                    bot.delete_state(user_id, message.chat.id)
+                    await bot.delete_state(user_id, message.chat.id)
                 else:
-                    bot.reply_to(message, "❌ Foydalanuvchining blokini olib tashlashda xatolik yuz berdi!")
-                    
+                    await bot.reply_to(message, "❌ Foydalanuvchining blokini olib tashlashda xatolik yuz berdi!")
+        
         except Exception as e:
             logger.error(f"Admin foydalanuvchi ID ni qayta ishlashda xatolik: {e}")
-            bot.reply_to(message, "❌ Xatolik yuz berdi!")
+            await bot.reply_to(message, "❌ Xatolik yuz berdi!")
     
     @bot.message_handler(func=lambda message: message.text == "💳 Hisob-fakturalar")
-    def handle_invoices_button(message: Message):
+    @limit_concurrency
+    async def handle_invoices_button(message: Message):
         """Hisob-fakturalar tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "💳 <b>Hisob-fakturalar bo'limi</b>\n\nKerakli ma'lumotni tanlang:",
             parse_mode="HTML",
@@ -498,21 +531,22 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(func=lambda message: message.text == "🛍 Mahsulotlar")
-    def handle_products_button(message: Message):
+    @limit_concurrency
+    async def handle_products_button(message: Message):
         """Mahsulotlar tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "🛍 <b>Mahsulotlar bo'limi</b>\n\nKerakli amalni tanlang:",
             parse_mode="HTML",
@@ -520,21 +554,22 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(func=lambda message: message.text == "🏪 Do'konlarim")
-    def handle_shops_button(message: Message):
+    @limit_concurrency
+    async def handle_shops_button(message: Message):
         """Do'konlarim tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         api_key = get_user_api_key(user_id)
         
         if not api_key:
-            bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
             return
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "🏪 <b>Do'konlarim bo'limi</b>\n\nKerakli ma'lumotni tanlang:",
             parse_mode="HTML",
@@ -542,15 +577,16 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(func=lambda message: message.text == "⚙️ Sozlamalar")
-    def handle_settings_button(message: Message):
+    @limit_concurrency
+    async def handle_settings_button(message: Message):
         """Sozlamalar tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
-        bot.send_message(
+        
+        await bot.send_message(
             message.chat.id,
             "⚙️ <b>Sozlamalar</b>\n\nKerakli amalni tanlang:",
             parse_mode="HTML",
@@ -558,14 +594,15 @@ def register_handlers(telegram_bot: TeleBot):
         )
     
     @bot.message_handler(func=lambda message: message.text == "📞 Yordam")
-    def handle_help_button(message: Message):
+    @limit_concurrency
+    async def handle_help_button(message: Message):
         """Yordam tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         help_text = """📞 <b>Yordam va qo'llab-quvvatlash</b>
 
 🔧 <b>Texnik yordam:</b>
@@ -588,21 +625,22 @@ def register_handlers(telegram_bot: TeleBot):
 👥 <b>Qo'llab-quvvatlash:</b>
 Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             help_text,
             parse_mode="HTML"
         )
     
     @bot.message_handler(func=lambda message: message.text == "👥 Qo'llab quvvatlash guruhi")
-    def handle_support_group_button(message: Message):
+    @limit_concurrency
+    async def handle_support_group_button(message: Message):
         """Qo'llab-quvvatlash guruhi tugmasini bajarish"""
         user_id = message.from_user.id
         
         # Foydalanuvchi bloklangan ekanligini tekshirish
-        if check_user_blocked(user_id):
+        if await check_user_blocked(user_id):
             return
-            
+        
         support_text = (
             "👥 <b>Qo'llab quvvatlash guruhi</b>\n\n"
             "Texnik yordam va savol-javoblar uchun qo'llab-quvvatlash guruhimizga qo'shiling:\n\n"
@@ -620,29 +658,31 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
             InlineKeyboardButton("Guruhga o'tish", url="https://t.me/unb_uz")
         )
         
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             support_text,
             parse_mode="HTML",
             reply_markup=keyboard
         )
     
-    @bot.message_handler(func=lambda message: message.from_user and isinstance(user_states.get(message.from_user.id), dict) and user_states.get(message.from_user.id, {}).get("state") == "waiting_product_search")
-    def handle_product_search_input(message: Message):
+    @bot.message_handler(func=state_store.in_state("waiting_product_search"))
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_product_search_input(message: Message):
         """Mahsulot qidirish so'rovini qayta ishlash"""
         try:
             user_id = message.from_user.id
             
             # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            if await check_user_blocked(user_id):
                 return
-                
+            
             search_query = message.text.strip()
-            user_state = user_states.get(user_id, {})
+            user_state = state_store.for_message(message) or {}
             shop_id = user_state.get("shop_id", 1)
             
             if not search_query:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     "❌ Qidirish so'rovi bo'sh bo'lishi mumkin emas!",
                     parse_mode="HTML"
@@ -652,7 +692,7 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
             # API kalitni olish
             api_key = get_user_api_key(user_id)
             if not api_key:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     MESSAGES["no_api"],
                     parse_mode="HTML"
@@ -660,15 +700,15 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 return
             
             # Qidirish jarayonini boshlash
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"🔍 <b>Qidiruv:</b> '{search_query}'\n\n⏳ Ma'lumotlar yuklanmoqda...",
                 parse_mode="HTML"
             )
             
             # API orqali mahsulotlarni qidirish - OpenAPI spetsifikatsiyasiga asoslanib
-            api_client = MarketplaceAPIClient(api_key)
-            results = api_client.search_products(
+            api_client = get_async_api_client(api_key)
+            results = await api_client.search_products(
                 shop_id=shop_id, 
                 search_query=search_query, 
                 page=0, 
@@ -707,7 +747,7 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 text += "• SKU raqamini tekshiring\n"
                 text += "• Imlo xatolarini to'g'rilang"
             
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 text,
                 parse_mode="HTML",
@@ -715,35 +755,37 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
             )
             
             # User state ni tozalash
-            user_states[user_id] = None
-            
+            state_store.clear(user_id)
+        
         except Exception as e:
             logger.error(f"Mahsulot qidirishda xatolik: {e}")
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 "❌ Qidiruvda xatolik yuz berdi. Qaytadan urinib ko'ring.",
                 parse_mode="HTML",
                 reply_markup=get_main_menu_keyboard()
             )
-            user_states[user_id] = None
+            state_store.clear(user_id)
     
-    @bot.message_handler(func=lambda message: message.from_user and isinstance(user_states.get(message.from_user.id), dict) and user_states.get(message.from_user.id, {}).get("state") == "waiting_price_update")
-    def handle_price_update_input(message: Message):
+    @bot.message_handler(func=state_store.in_state("waiting_price_update"))
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_price_update_input(message: Message):
         """Narx yangilash so'rovini qayta ishlash"""
         try:
             user_id = message.from_user.id
             
             # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            if await check_user_blocked(user_id):
                 return
-                
+            
             price_input = message.text.strip()
-            user_state = user_states.get(user_id, {})
+            user_state = state_store.for_message(message) or {}
             shop_id = user_state.get("shop_id", 1)
             
             # Format tekshirish: SKU:PRICE
             if ':' not in price_input:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     "❌ Noto'g'ri format!\n\nTo'g'ri format: <code>SKU:NARX</code>\nMisol: <code>ABC123:150000</code>",
                     parse_mode="HTML"
@@ -757,9 +799,9 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 
                 if not sku or price <= 0:
                     raise ValueError("Invalid SKU or price")
-                    
+            
             except ValueError:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     "❌ Noto'g'ri format!\n\nSKU va narx to'g'ri kiritilganini tekshiring.\nMisol: <code>ABC123:150000</code>",
                     parse_mode="HTML"
@@ -769,7 +811,7 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
             # API kalitni olish
             api_key = get_user_api_key(user_id)
             if not api_key:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     MESSAGES["no_api"],
                     parse_mode="HTML"
@@ -777,17 +819,17 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 return
             
             # Narx yangilash jarayonini boshlash
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 f"💰 <b>Narx yangilanmoqda...</b>\n\n🏷 SKU: <code>{sku}</code>\n💵 Yangi narx: {format_currency(price)}",
                 parse_mode="HTML"
             )
             
             # API orqali narx yangilash - OpenAPI spetsifikatsiyasiga asoslanib
-            api_client = MarketplaceAPIClient(api_key)
+            api_client = get_async_api_client(api_key)
             
             # Avval mahsulotni topamiz
-            product_results = api_client.search_products(
+            product_results = await api_client.search_products(
                 shop_id=shop_id,
                 search_query=sku,
                 page=0,
@@ -812,7 +854,7 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                         ]
                     }
                     
-                    success = api_client.update_product_price(shop_id, price_data)
+                    success = await api_client.update_product_price(shop_id, price_data)
                 else:
                     success = False
             else:
@@ -831,7 +873,7 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 text += f"• Mahsulot mavjudmi\n"
                 text += f"• Narx munosib miqdordami"
             
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 text,
                 parse_mode="HTML",
@@ -839,32 +881,148 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
             )
             
             # User state ni tozalash
-            user_states[user_id] = None
-            
+            state_store.clear(user_id)
+        
         except Exception as e:
             logger.error(f"Narx yangilashda xatolik: {e}")
-            bot.send_message(
+            await bot.send_message(
                 message.chat.id,
                 "❌ Narx yangilashda xatolik yuz berdi. Qaytadan urinib ko'ring.",
                 parse_mode="HTML",
                 reply_markup=get_main_menu_keyboard()
             )
-            user_states[user_id] = None
+            state_store.clear(user_id)
+    
+    @bot.message_handler(func=state_store.in_state("waiting_stock_threshold"))
+    @limit_concurrency
+    async def handle_stock_threshold_input(message: Message):
+        """Qoldiq chegaralarini qayta ishlash: har bir qatorda "SKU_ID SON" yoki "SKU_ID -" """
+        user_id = message.from_user.id
+        try:
+            # Foydalanuvchi bloklangan ekanligini tekshirish
+            if await check_user_blocked(user_id):
+                return
+            
+            api_key = get_user_api_key(user_id)
+            if not api_key:
+                await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+                state_store.clear(user_id)
+                return
+            
+            thresholds = {}
+            invalid = []
+            for line in (message.text or "").splitlines():
+                parts = line.split()
+                if not parts:
+                    continue
+                if len(parts) == 2 and parts[0].isdigit() and (parts[1].isdigit() or parts[1] == "-"):
+                    thresholds[int(parts[0])] = None if parts[1] == "-" else int(parts[1])
+                else:
+                    invalid.append(line.strip())
+            
+            if not thresholds:
+                await bot.send_message(
+                    message.chat.id,
+                    "❌ Format noto'g'ri. Har bir qatorga <code>SKU_ID SON</code> yozing, "
+                    "o'chirish uchun <code>SKU_ID -</code>.\n\n"
+                    "Qayta urinish uchun ⚠️ Qoldiq ogohlantirishlari tugmasini bosing.",
+                    parse_mode="HTML",
+                    reply_markup=get_main_menu_keyboard()
+                )
+                state_store.clear(user_id)
+                return
+            
+            if not set_thresholds(api_key, thresholds):
+                raise RuntimeError("chegaralar saqlanmadi")
+            
+            saved = sum(1 for value in thresholds.values() if value is not None)
+            text = "✅ <b>Qoldiq chegaralari saqlandi</b>\n\n"
+            text += f"📌 Belgilangan: {saved} ta\n"
+            text += f"🗑 O'chirilgan: {len(thresholds) - saved} ta\n"
+            if invalid:
+                text += f"⚠️ Tushunilmagan qatorlar: {len(invalid)} ta\n"
+            text += "\nMavjud qoldiq chegaraga tushganda xabar beriladi."
+            
+            await bot.send_message(
+                message.chat.id,
+                text,
+                parse_mode="HTML",
+                reply_markup=get_main_menu_keyboard()
+            )
+            state_store.clear(user_id)
+        
+        except Exception as e:
+            logger.error(f"Qoldiq chegaralarini saqlashda xatolik: {e}")
+            await bot.send_message(
+                message.chat.id,
+                MESSAGES["error"],
+                parse_mode="HTML",
+                reply_markup=get_main_menu_keyboard()
+            )
+            state_store.clear(user_id)
+    
+    @bot.message_handler(content_types=['document'], func=state_store.in_state("waiting_stock_file"))
+    @limit_concurrency
+    async def handle_stock_file_input(message: Message):
+        """Qoldiqlar faylini qabul qilish - qayta ishlash fonda davom etadi"""
+        user_id = message.from_user.id
+        try:
+            # Foydalanuvchi bloklangan ekanligini tekshirish
+            if await check_user_blocked(user_id):
+                return
+            
+            api_key = get_user_api_key(user_id)
+            if not api_key:
+                await bot.send_message(message.chat.id, MESSAGES["no_api"], parse_mode="HTML")
+                state_store.clear(user_id)
+                return
+            
+            document = message.document
+            file_name = document.file_name or ""
+            if not file_name.lower().endswith(('.csv', '.xlsx')):
+                await bot.send_message(message.chat.id, "❌ Faqat CSV yoki XLSX fayl qabul qilinadi.")
+                return
+            
+            if (document.file_size or 0) > STOCK_UPLOAD_CONFIG["max_file_mb"] * 1024 * 1024:
+                await bot.send_message(
+                    message.chat.id,
+                    f"❌ Fayl hajmi {STOCK_UPLOAD_CONFIG['max_file_mb']} MB dan oshmasligi kerak."
+                )
+                return
+            
+            if api_key_hash(api_key) in _stock_uploads:
+                await bot.send_message(message.chat.id, "⏳ Oldingi fayl hali qayta ishlanmoqda.")
+                return
+            
+            state_store.clear(user_id)
+            status = await bot.send_message(
+                message.chat.id,
+                "📥 <b>Fayl qabul qilindi, qayta ishlanmoqda...</b>",
+                parse_mode="HTML"
+            )
+            start_stock_upload(status.chat.id, status.message_id, api_key, document.file_id, file_name)
+        
+        except Exception as e:
+            logger.error(f"Qoldiqlar faylini qabul qilishda xatolik: {e}")
+            await bot.send_message(message.chat.id, MESSAGES["error"], parse_mode="HTML")
+            state_store.clear(user_id)
     
-    @bot.message_handler(func=lambda message: message.from_user and user_states.get(message.from_user.id) == "waiting_api_key")
-    def handle_api_key_input(message: Message):
+    @bot.message_handler(func=state_store.in_state("waiting_api_key"))
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_api_key_input(message: Message):
         """API kalit kiritishni qayta ishlash"""
         try:
             user_id = message.from_user.id
             
             # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            if await check_user_blocked(user_id):
                 return
-                
+            
             api_key = message.text.strip()
             
             if not api_key or len(api_key.strip()) < 10:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     "❌ <b>Noto'g'ri API kalit formati!</b>\n\nIltimos, to'g'ri API kalitni kiriting.",
                     parse_mode="HTML"
@@ -872,10 +1030,10 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                 return
             
             # API kalitni tekshirish
-            bot.send_message(message.chat.id, MESSAGES["api_testing"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["api_testing"], parse_mode="HTML")
             
-            api_client = MarketplaceAPIClient(api_key)
-            if api_client.test_connection():
+            api_client = get_async_api_client(api_key)
+            if await api_client.test_connection():
                 # API kalitni saqlash
                 if save_user_api_key(
                     user_id, api_key, 
@@ -883,315 +1041,279 @@ Savollaringiz bo'lsa, "👥 Qo'llab quvvatlash guruhi" tugmasini bosing!"""
                     message.from_user.first_name,
                     message.from_user.last_name
                 ):
-                    user_states[user_id] = None
-                    bot.send_message(
+                    state_store.clear(user_id)
+                    await bot.send_message(
                         message.chat.id,
                         MESSAGES["api_saved"],
                         parse_mode="HTML",
                         reply_markup=get_main_menu_keyboard()
                     )
                 else:
-                    bot.send_message(
+                    await bot.send_message(
                         message.chat.id,
                         "❌ <b>API kalitni saqlashda xatolik!</b>\n\nQaytadan urinib ko'ring.",
                         parse_mode="HTML"
                     )
             else:
-                bot.send_message(
+                await bot.send_message(
                     message.chat.id,
                     MESSAGES["api_invalid"],
                     parse_mode="HTML"
                 )
-                
+        
         except Exception as e:
             logger.error(f"API kalit kiritishda xatolik: {e}")
-            bot.send_message(message.chat.id, MESSAGES["error"], parse_mode="HTML")
+            await bot.send_message(message.chat.id, MESSAGES["error"], parse_mode="HTML")
     
     @bot.callback_query_handler(func=lambda call: True)
-    def handle_callback_query(call: CallbackQuery):
+    @limit_concurrency
+    @with_latency_budget
+    async def handle_callback_query(call: CallbackQuery):
         """Callback querylarni qayta ishlash"""
         try:
             user_id = call.from_user.id
             
-            # Foydalanuvchi bloklangan ekanligini tekshirish
-            if check_user_blocked(user_id):
+            resolved = callback_router.resolve(call.data)
+            if resolved is None:
+                await bot.answer_callback_query(call.id)
                 return
-                
-            data = call.data
-            
-            # API kalitini olish
-            api_key = get_user_api_key(user_id)
-            
-            if data == "main_menu":
-                bot.delete_message(call.message.chat.id, call.message.message_id)
-                bot.send_message(
-                    call.message.chat.id,
-                    MESSAGES["main_menu"],
-                    parse_mode="HTML",
-                    reply_markup=get_main_menu_keyboard()
-                )
+            route, argument = resolved
             
-            elif data == "add_api":
-                user_states[user_id] = "waiting_api_key"
-                try:
-                    # Avval rasmni yuborish
-                    with open('uzum_kirish.png', 'rb') as photo:
-                        bot.send_photo(
-                            call.message.chat.id,
-                            photo,
-                            caption="🔑 API kalitingizni yuboring:\n\nAPI kalitni olish yuqoridagi rasmda ketma ket ko'rsatilgan shunday holatda yuboring iltimos e'tiborli bo'ling!"
-                        )
-                except FileNotFoundError:
-                    # Agar rasm topilmasa, oddiy xabar yuborish
-                    bot.edit_message_text(
-                        MESSAGES["api_prompt"],
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML"
-                    )
-            
-            elif data == "change_api":
-                user_states[user_id] = "waiting_api_key"
-                try:
-                    # Avval rasmni yuborish
-                    with open('uzum_kirish.png', 'rb') as photo:
-                        bot.send_photo(
-                            call.message.chat.id,
-                            photo,
-                            caption="🔄 API kalitingizni yuboring:\n\nAPI kalitni olish yuqoridagi rasmda ketma ket ko'rsatilgan shunday holatda yuboring iltimos e'tiborli bo'ling!"
-                        )
-                except FileNotFoundError:
-                    # Agar rasm topilmasa, oddiy xabar yuborish
-                    bot.edit_message_text(
-                        "🔄 <b>Yangi API kalitni kiriting:</b>",
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML"
-                    )
-            
-            elif data == "delete_api":
-                bot.edit_message_text(
-                    "🗑 <b>API kalitni o'chirishni xohlaysizmi?</b>\n\n<i>Bu amalni qaytarib bo'lmaydi!</i>",
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode="HTML",
-                    reply_markup=get_confirmation_keyboard("delete_api")
-                )
-            
-            elif data == "confirm_delete_api":
-                if delete_user_api_key(user_id):
-                    bot.edit_message_text(
-                        MESSAGES["api_deleted"],
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML",
-                        reply_markup=get_api_management_keyboard()
-                    )
-                else:
-                    bot.edit_message_text(
-                        "❌ <b>API kalitni o'chirishda xatolik!</b>",
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML"
-                    )
-            
-            elif data == "check_api_status":
-                if not api_key:
-                    bot.edit_message_text(
-                        MESSAGES["api_status_disconnected"],
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML",
-                        reply_markup=get_api_management_keyboard()
-                    )
-                    return
-                
-                api_client = MarketplaceAPIClient(api_key)
-                if api_client.test_connection():
-                    bot.edit_message_text(
-                        MESSAGES["api_status_connected"],
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML",
-                        reply_markup=get_back_to_main_keyboard()
-                    )
-                else:
-                    bot.edit_message_text(
-                        MESSAGES["api_status_disconnected"],
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode="HTML",
-                        reply_markup=get_settings_keyboard()
-                    )
-            
-            # FBS handlerlari
-            elif data == "fbs_orders":
-                if api_key:
-                    handle_fbs_orders_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_orders_count":
-                if api_key:
-                    handle_fbs_orders_count_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_stocks":
-                if api_key:
-                    handle_fbs_stocks_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_return_reasons":
-                if api_key:
-                    handle_fbs_return_reasons_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_update_stocks":
-                if api_key:
-                    handle_fbs_update_stocks_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_order_details":
-                if api_key:
-                    handle_fbs_order_details_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_shop_statistics":
-                if api_key:
-                    handle_fbs_shop_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_date_statistics":
-                if api_key:
-                    handle_fbs_date_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_status_statistics":
-                if api_key:
-                    handle_fbs_status_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_stock_statistics":
-                if api_key:
-                    handle_fbs_stock_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_finance_statistics":
-                if api_key:
-                    handle_fbs_finance_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_missing_items":
-                if api_key:
-                    handle_fbs_missing_items_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "fbs_missing_statistics":
-                if api_key:
-                    handle_fbs_missing_statistics_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            # Finance handlerlari
-            elif data == "finance_expenses":
-                if api_key:
-                    handle_finance_expenses_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "finance_orders":
-                if api_key:
-                    handle_finance_orders_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "finance_payment_info":
-                if api_key:
-                    handle_finance_payment_info_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "finance_commission":
-                if api_key:
-                    handle_finance_commission_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            # Invoice handlerlari
-            elif data == "invoices":
-                if api_key:
-                    handle_invoices_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "invoice_returns":
-                if api_key:
-                    handle_invoice_returns_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "invoice_products":
-                if api_key:
-                    handle_invoice_products_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "shop_invoices":
-                if api_key:
-                    handle_shop_invoices_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            # Product handlerlari
-            elif data == "product_search":
-                if api_key:
-                    handle_product_search_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
+            # Foydalanuvchi bloklangan ekanligini tekshirish
+            if route.check_blocked and await check_user_blocked(user_id):
+                return
             
-            elif data == "product_update_price":
-                if api_key:
-                    handle_product_price_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
+            # API kalit faqat marshrutga kerak bo'lsa olinadi
+            api_key = get_user_api_key(user_id) if route.loads_api_key else None
             
-            # Shop handlerlari
-            elif data == "shops_list":
-                if api_key:
-                    handle_shops_list_callback(call, api_key)
-                else:
-                    bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
-            
-            elif data == "cancel_action":
-                bot.edit_message_text(
-                    "❌ <b>Amal bekor qilindi</b>",
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode="HTML",
-                    reply_markup=get_back_to_main_keyboard()
-                )
-            
-            bot.answer_callback_query(call.id)
+            if route.needs_api_key and not api_key:
+                await bot.edit_message_text(MESSAGES["no_api"], call.message.chat.id, call.message.message_id, parse_mode="HTML")
+            elif route.is_prefix:
+                await route.handler(call, api_key, argument)
+            else:
+                await route.handler(call, api_key)
             
+            await bot.answer_callback_query(call.id)
+        
         except Exception as e:
             logger.error(f"Callback queryni qayta ishlashda xatolik: {e}")
-            bot.answer_callback_query(call.id, "Xatolik yuz berdi!")
+            await bot.answer_callback_query(call.id, "Xatolik yuz berdi!")
+
+@callback_router.route("main_menu")
+async def handle_main_menu_callback(call: CallbackQuery, api_key: str):
+    """Asosiy menyuga qaytish"""
+    await bot.delete_message(call.message.chat.id, call.message.message_id)
+    await bot.send_message(
+        call.message.chat.id,
+        MESSAGES["main_menu"],
+        parse_mode="HTML",
+        reply_markup=get_main_menu_keyboard()
+    )
+
+@callback_router.route("add_api")
+async def handle_add_api_callback(call: CallbackQuery, api_key: str):
+    """API kalit qo'shish"""
+    state_store.set(call.from_user.id, "waiting_api_key")
+    try:
+        # Avval rasmni yuborish
+        with open('uzum_kirish.png', 'rb') as photo:
+            await bot.send_photo(
+                call.message.chat.id,
+                photo,
+                caption="🔑 API kalitingizni yuboring:\n\nAPI kalitni olish yuqoridagi rasmda ketma ket ko'rsatilgan shunday holatda yuboring iltimos e'tiborli bo'ling!"
+            )
+    except FileNotFoundError:
+        # Agar rasm topilmasa, oddiy xabar yuborish
+        await bot.edit_message_text(
+            MESSAGES["api_prompt"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.route("change_api")
+async def handle_change_api_callback(call: CallbackQuery, api_key: str):
+    """API kalitni almashtirish"""
+    state_store.set(call.from_user.id, "waiting_api_key")
+    try:
+        # Avval rasmni yuborish
+        with open('uzum_kirish.png', 'rb') as photo:
+            await bot.send_photo(
+                call.message.chat.id,
+                photo,
+                caption="🔄 API kalitingizni yuboring:\n\nAPI kalitni olish yuqoridagi rasmda ketma ket ko'rsatilgan shunday holatda yuboring iltimos e'tiborli bo'ling!"
+            )
+    except FileNotFoundError:
+        # Agar rasm topilmasa, oddiy xabar yuborish
+        await bot.edit_message_text(
+            "🔄 <b>Yangi API kalitni kiriting:</b>",
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.route("delete_api")
+async def handle_delete_api_callback(call: CallbackQuery, api_key: str):
+    """API kalitni o'chirishni so'rash"""
+    await bot.edit_message_text(
+        "🗑 <b>API kalitni o'chirishni xohlaysizmi?</b>\n\n<i>Bu amalni qaytarib bo'lmaydi!</i>",
+        call.message.chat.id,
+        call.message.message_id,
+        parse_mode="HTML",
+        reply_markup=get_confirmation_keyboard("delete_api")
+    )
+
+def delete_shared_key_data(api_key: str):
+    """Kalit bo'yicha saqlangan ma'lumotlarni o'chirish - kalit boshqa foydalanuvchida qolgan bo'lsa tegilmaydi"""
+    if is_api_key_in_use(api_key):
+        return
+    delete_local_orders(api_key)
+    delete_stock_watch(api_key)
+    delete_notify_state(api_key)
+
+@callback_router.route("confirm_delete_api", loads_api_key=True)
+async def handle_confirm_delete_api_callback(call: CallbackQuery, api_key: str):
+    """API kalitni o'chirish"""
+    if delete_user_api_key(call.from_user.id):
+        if api_key:
+            invalidate_shops(api_key)
+            invalidate_missing_scan(api_key)
+            invalidate_responses(api_key)
+            await asyncio.to_thread(delete_shared_key_data, api_key)
+        await bot.edit_message_text(
+            MESSAGES["api_deleted"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_api_management_keyboard()
+        )
+    else:
+        await bot.edit_message_text(
+            "❌ <b>API kalitni o'chirishda xatolik!</b>",
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.route("check_api_status", loads_api_key=True)
+async def handle_check_api_status_callback(call: CallbackQuery, api_key: str):
+    """API ulanish holatini tekshirish"""
+    if not api_key:
+        await bot.edit_message_text(
+            MESSAGES["api_status_disconnected"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_api_management_keyboard()
+        )
+        return
+    
+    api_client = get_async_api_client(api_key)
+    if await api_client.test_connection():
+        await bot.edit_message_text(
+            MESSAGES["api_status_connected"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_back_to_main_keyboard()
+        )
+    else:
+        await bot.edit_message_text(
+            MESSAGES["api_status_disconnected"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_settings_keyboard()
+        )
+
+@callback_router.route("cancel_action")
+async def handle_cancel_action_callback(call: CallbackQuery, api_key: str):
+    """Amalni bekor qilish"""
+    await bot.edit_message_text(
+        "❌ <b>Amal bekor qilindi</b>",
+        call.message.chat.id,
+        call.message.message_id,
+        parse_mode="HTML",
+        reply_markup=get_back_to_main_keyboard()
+    )
+
+# Buyurtmalar ro'yxatining bitta sahifasidagi buyurtmalar soni
+ORDERS_PER_PAGE = 10
+
+@prefetcher.menu("fbs_menu")
+async def load_fbs_orders(api_client) -> list:
+    """Yangi FBS buyurtmalar (birinchi 10 ta)"""
+    # Mahalliy nusxa yangi bo'lsa API ga murojaat qilinmaydi
+    if is_synced(api_client.api_key):
+        return get_local_orders(api_client.api_key, "CREATED", limit=ORDERS_PER_PAGE)
+    start_order_sync(api_client)
+    
+    # Avval do'konlar ro'yxatini olamiz
+    shop_ids = await api_client.get_shop_ids()
+    
+    # Yangi OpenAPI spetsifikatsiyasiga asoslanib FBS buyurtmalarni olamiz
+    return [
+        order async for order in api_client.iter_fbs_orders_v2(
+            limit=ORDERS_PER_PAGE,  # Faqat birinchi sahifa
+            status="CREATED",
+            shop_ids=shop_ids if shop_ids else None
+        )
+    ]
 
-def handle_fbs_orders_callback(call: CallbackQuery, api_key: str):
+@prefetcher.menu("fbs_menu")
+async def load_fbs_orders_count(api_client) -> tuple:
+    """Yangi FBS buyurtmalar soni va do'konlar ro'yxati"""
+    shop_ids = await api_client.get_shop_ids()
+    if is_synced(api_client.api_key):
+        return {'payload': get_local_counts(api_client.api_key).get("CREATED", 0)}, shop_ids
+    start_order_sync(api_client)
+    
+    count_data = await api_client.get_fbs_orders_count(
+        shop_ids=shop_ids if shop_ids else None,
+        status="CREATED"
+    )
+    return count_data, shop_ids
+
+async def load_fbs_orders_page(api_client, page: int) -> list:
+    """Yangi FBS buyurtmalarning berilgan sahifasi (1 dan boshlab)"""
+    if is_synced(api_client.api_key):
+        return get_local_orders(
+            api_client.api_key, "CREATED", limit=ORDERS_PER_PAGE, offset=(page - 1) * ORDERS_PER_PAGE
+        )
+    start_order_sync(api_client)
+    
+    shop_ids = await api_client.get_shop_ids()
+    data = await api_client.get_fbs_orders_v2(
+        page=page - 1,
+        size=ORDERS_PER_PAGE,
+        status="CREATED",
+        shop_ids=shop_ids if shop_ids else None
+    )
+    return ((data or {}).get('payload') or {}).get('orders') or []
+
+def orders_total_pages(count_data) -> int:
+    """Buyurtmalar sonidan sahifalar soni"""
+    count = count_data.get('payload') if isinstance(count_data, dict) else None
+    if not isinstance(count, int) or count <= 0:
+        return 1
+    return -(-count // ORDERS_PER_PAGE)
+
+@prefetcher.menu("finance_menu")
+async def load_finance_expenses(api_client) -> list:
+    """Moliyaviy xarajatlar (birinchi 10 ta)"""
+    shop_ids = await api_client.get_shop_ids()
+    return [
+        payment async for payment in api_client.iter_finance_expenses(
+            limit=10,
+            shop_ids=shop_ids if shop_ids else None
+        )
+    ]
+
+@callback_router.route("fbs_orders", needs_api_key=True)
+async def handle_fbs_orders_callback(call: CallbackQuery, api_key: str):
     """FBS buyurtmalarni ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["no_api"],
             call.message.chat.id,
             call.message.message_id,
@@ -1200,78 +1322,191 @@ def handle_fbs_orders_callback(call: CallbackQuery, api_key: str):
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        # Menyu ochilganda oldindan yuklangan (yoki yuklanayotgan) bo'lsa tarmoq kutilmaydi
+        orders_list, (count_data, _) = await asyncio.gather(
+            prefetcher.load(load_fbs_orders, api_key),
+            prefetcher.load(load_fbs_orders_count, api_key)
+        )
         
-        # Avval do'konlar ro'yxatini olamiz
-        shops = api_client.get_shops()
-        shop_ids = []
-        if shops and isinstance(shops, list):
-            shop_ids = [shop.get('id') for shop in shops if shop.get('id')]
+        if orders_list:
+            text = format_list_message(orders_list, format_order_info_v2, "FBS Buyurtmalar (Yangi)")
+            keyboard = get_orders_list_keyboard(orders_list, 1, orders_total_pages(count_data))
+        else:
+            text = MESSAGES["no_data"]
+            keyboard = get_back_to_main_keyboard()
         
-        # Yangi OpenAPI spetsifikatsiyasiga asoslanib FBS buyurtmalarni olamiz
-        orders = api_client.get_fbs_orders_v2(
-            page=0, 
-            size=10, 
-            status="CREATED",
-            shop_ids=shop_ids if shop_ids else None
+        await bot.edit_message_text(
+            text,
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+    
+    except Exception as e:
+        logger.error(f"FBS buyurtmalarni olishda xatolik: {e}")
+        await bot.edit_message_text(
+            MESSAGES["error"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
         )
+
+@callback_router.prefix("fbs_orders_page_", needs_api_key=True)
+async def handle_fbs_orders_page_callback(call: CallbackQuery, api_key: str, page: str):
+    """FBS buyurtmalar ro'yxatining keyingi/oldingi sahifasi"""
+    if not page.isdigit() or int(page) < 1:
+        return
+    page = int(page)
+    
+    try:
+        api_client = get_async_api_client(api_key)
+        orders_list, (count_data, _) = await asyncio.gather(
+            load_fbs_orders_page(api_client, page),
+            prefetcher.load(load_fbs_orders_count, api_key)
+        )
+        total_pages = max(page, orders_total_pages(count_data))
         
-        if orders and orders.get('payload', {}).get('orders'):
-            orders_list = orders['payload']['orders'][:10]  # Faqat birinchi 10 ta
-            text = format_list_message(orders_list, format_order_info_v2, "FBS Buyurtmalar (Yangi)")
+        if orders_list:
+            text = format_list_message(orders_list, format_order_info_v2, f"FBS Buyurtmalar (Yangi) - {page}-sahifa")
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
-            reply_markup=get_back_to_main_keyboard()
+            reply_markup=get_orders_list_keyboard(orders_list, page, total_pages)
+        )
+    
+    except Exception as e:
+        logger.error(f"FBS buyurtmalar sahifasini olishda xatolik: {e}")
+        await bot.edit_message_text(
+            MESSAGES["error"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
         )
+
+@callback_router.prefix("order_details_", needs_api_key=True)
+async def handle_order_details_callback(call: CallbackQuery, api_key: str, order_id: str):
+    """Bitta buyurtma tafsilotlari va amallari"""
+    if not order_id.isdigit():
+        return
+    
+    try:
+        data = await get_async_api_client(api_key).get_fbs_order_by_id(order_id)
+        order = data.get('payload', data) if isinstance(data, dict) else None
         
+        if not order:
+            await bot.edit_message_text(
+                MESSAGES["no_data"],
+                call.message.chat.id,
+                call.message.message_id,
+                parse_mode="HTML",
+                reply_markup=get_back_to_main_keyboard()
+            )
+            return
+        
+        await bot.edit_message_text(
+            format_order_info_v2(order),
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_order_action_keyboard(order_id)
+        )
+    
     except Exception as e:
-        logger.error(f"FBS buyurtmalarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        logger.error(f"Buyurtma tafsilotlarini olishda xatolik: {e}")
+        await bot.edit_message_text(
+            MESSAGES["error"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.prefix("confirm_order_", needs_api_key=True)
+async def handle_confirm_order_callback(call: CallbackQuery, api_key: str, order_id: str):
+    """Buyurtmani tasdiqlash"""
+    if not order_id.isdigit():
+        return
+    
+    try:
+        if await get_async_api_client(api_key).confirm_fbs_order_v2(order_id):
+            text = f"✅ <b>Buyurtma #{order_id} tasdiqlandi</b>"
+        else:
+            text = f"❌ <b>Buyurtma #{order_id} ni tasdiqlab bo'lmadi</b>"
+        
+        await bot.edit_message_text(
+            text,
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_new_orders_keyboard()
+        )
+    
+    except Exception as e:
+        logger.error(f"Buyurtmani tasdiqlashda xatolik: {e}")
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_orders_count_callback(call: CallbackQuery, api_key: str):
+@callback_router.prefix("cancel_order_", needs_api_key=True)
+async def handle_cancel_order_callback(call: CallbackQuery, api_key: str, order_id: str):
+    """Buyurtmani bekor qilish"""
+    if not order_id.isdigit():
+        return
+    
+    try:
+        if await get_async_api_client(api_key).cancel_fbs_order(order_id):
+            text = f"❌ <b>Buyurtma #{order_id} bekor qilindi</b>"
+        else:
+            text = f"⚠️ <b>Buyurtma #{order_id} ni bekor qilib bo'lmadi</b>"
+        
+        await bot.edit_message_text(
+            text,
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_new_orders_keyboard()
+        )
+    
+    except Exception as e:
+        logger.error(f"Buyurtmani bekor qilishda xatolik: {e}")
+        await bot.edit_message_text(
+            MESSAGES["error"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.route("fbs_orders_count", needs_api_key=True)
+async def handle_fbs_orders_count_callback(call: CallbackQuery, api_key: str):
     """FBS buyurtmalar sonini ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        
-        # Avval do'konlar ro'yxatini olamiz
-        shops = api_client.get_shops()
-        shop_ids = []
-        if shops and isinstance(shops, list):
-            shop_ids = [shop.get('id') for shop in shops if shop.get('id')]
-        
-        # Yangi OpenAPI spetsifikatsiyasiga asoslanib buyurtmalar sonini olamiz
-        count_data = api_client.get_fbs_orders_count(
-            shop_ids=shop_ids if shop_ids else None,
-            status="CREATED"
-        )
+        # Menyu ochilganda oldindan yuklangan (yoki yuklanayotgan) bo'lsa tarmoq kutilmaydi
+        count_data, shop_ids = await prefetcher.load(load_fbs_orders_count, api_key)
         
         if count_data and count_data.get('payload'):
             count = count_data['payload']
@@ -1281,76 +1516,78 @@ def handle_fbs_orders_count_callback(call: CallbackQuery, api_key: str):
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"FBS buyurtmalar sonini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_stocks_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_stocks", needs_api_key=True)
+async def handle_fbs_stocks_callback(call: CallbackQuery, api_key: str):
     """FBS qoldiqlarni ko'rsatish"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        stocks = api_client.get_fbs_stocks()
+        api_client = get_async_api_client(api_key)
+        stocks = await api_client.get_fbs_stocks()
         
         if stocks:
             text = format_list_message(stocks[:10], format_product_info, "FBS Qoldiqlar")
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"FBS qoldiqlarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_return_reasons_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_return_reasons", needs_api_key=True)
+async def handle_fbs_return_reasons_callback(call: CallbackQuery, api_key: str):
     """FBS qaytarish sabablarini ko'rsatish"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        reasons = api_client.get_fbs_return_reasons()
+        api_client = get_async_api_client(api_key)
+        reasons = await api_client.get_fbs_return_reasons()
         
         if reasons:
             text = "🔄 <b>Qaytarish sabablari</b>\n\n"
@@ -1360,147 +1597,134 @@ def handle_fbs_return_reasons_callback(call: CallbackQuery, api_key: str):
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Qaytarish sabablarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_finance_expenses_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("finance_expenses", needs_api_key=True)
+async def handle_finance_expenses_callback(call: CallbackQuery, api_key: str):
     """Moliyaviy xarajatlarni ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        # Menyu ochilganda oldindan yuklangan (yoki yuklanayotgan) bo'lsa tarmoq kutilmaydi
+        payments = await prefetcher.load(load_finance_expenses, api_key)
         
-        # Avval do'konlar ro'yxatini olamiz
-        shops = api_client.get_shops()
-        shop_ids = []
-        if shops and isinstance(shops, list):
-            shop_ids = [shop.get('id') for shop in shops if shop.get('id')]
-        
-        # Yangi OpenAPI spetsifikatsiyasiga asoslanib xarajatlarni olamiz
-        expenses = api_client.get_finance_expenses(
-            page=0,
-            size=10,
-            shop_ids=shop_ids if shop_ids else None
-        )
-        
-        if expenses and expenses.get('payload', {}).get('payments'):
-            payments = expenses['payload']['payments'][:10]
+        if payments:
             text = format_finance_expenses_v2(payments)
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Moliyaviy xarajatlarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_finance_orders_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("finance_orders", needs_api_key=True)
+async def handle_finance_orders_callback(call: CallbackQuery, api_key: str):
     """Moliyaviy buyurtmalarni ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        api_client = get_async_api_client(api_key)
         
         # Avval do'konlar ro'yxatini olamiz
-        shops = api_client.get_shops()
-        shop_ids = []
-        if shops and isinstance(shops, list):
-            shop_ids = [shop.get('id') for shop in shops if shop.get('id')]
+        shop_ids = await api_client.get_shop_ids()
         
         # Yangi OpenAPI spetsifikatsiyasiga asoslanib moliyaviy buyurtmalarni olamiz
-        orders = api_client.get_finance_orders(
-            page=0,
-            size=10,
-            group=False,
-            shop_ids=shop_ids if shop_ids else None
-        )
+        order_items = [
+            item async for item in api_client.iter_finance_orders(
+                limit=10,
+                group=False,
+                shop_ids=shop_ids if shop_ids else None
+            )
+        ]
         
-        if orders and orders.get('payload', {}).get('orderItems'):
-            order_items = orders['payload']['orderItems'][:10]
+        if order_items:
             text = format_finance_orders_v2(order_items)
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Moliyaviy buyurtmalarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_invoices_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("invoices", needs_api_key=True)
+async def handle_invoices_callback(call: CallbackQuery, api_key: str):
     """Hisob-fakturalarni ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        api_client = get_async_api_client(api_key)
         
         # Yangi OpenAPI spetsifikatsiyasiga asoslanib hisob-fakturalarni olamiz
-        invoices = api_client.get_invoices(size=10, page=0)
+        invoices = [invoice async for invoice in api_client.iter_invoices(limit=10)]
         
         if invoices:
             text = "💳 <b>Hisob-fakturalar</b>\n\n"
-            for i, invoice in enumerate(invoices[:10], 1):
+            for i, invoice in enumerate(invoices, 1):
                 invoice_id = invoice.get('id', 'N/A')
                 invoice_number = invoice.get('invoiceNumber', 'N/A')
                 full_price = invoice.get('fullPrice', 0)
@@ -1515,44 +1739,45 @@ def handle_invoices_callback(call: CallbackQuery, api_key: str):
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Hisob-fakturalarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_invoice_returns_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("invoice_returns", needs_api_key=True)
+async def handle_invoice_returns_callback(call: CallbackQuery, api_key: str):
     """Hisob-faktura qaytarishlarini ko'rsatish - OpenAPI spetsifikatsiyasiga asoslanib"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        api_client = get_async_api_client(api_key)
         
         # Yangi OpenAPI spetsifikatsiyasiga asoslanib qaytarishlarni olamiz
-        returns = api_client.get_invoice_returns(page=0, size=10)
+        returns = [item async for item in api_client.iter_invoice_returns(limit=10)]
         
         if returns:
             text = "↩️ <b>Hisob-faktura qaytarishlari</b>\n\n"
-            for i, return_item in enumerate(returns[:10], 1):
+            for i, return_item in enumerate(returns, 1):
                 return_id = return_item.get('id', 'N/A')
                 external_number = return_item.get('externalNumber', 'N/A')
                 status = return_item.get('status', 'unknown')
@@ -1567,32 +1792,33 @@ def handle_invoice_returns_callback(call: CallbackQuery, api_key: str):
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Hisob-faktura qaytarishlarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_product_search_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("product_search", needs_api_key=True)
+async def handle_product_search_callback(call: CallbackQuery, api_key: str):
     """Mahsulot qidirishni boshlash"""
     try:
         # Avval do'konlar ro'yxatini olamiz
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        shops = await api_client.get_shops_cached()
         
         if not shops:
-            bot.edit_message_text(
+            await bot.edit_message_text(
                 "❌ Do'konlar topilmadi yoki API xatoligi",
                 call.message.chat.id,
                 call.message.message_id,
@@ -1607,7 +1833,7 @@ def handle_product_search_callback(call: CallbackQuery, api_key: str):
         else:
             shop_id = 1  # Default shop ID
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "🔍 <b>Mahsulot qidirish</b>\n\n" +
             "Mahsulot nomini yoki artikulini yozing:",
             call.message.chat.id,
@@ -1617,29 +1843,27 @@ def handle_product_search_callback(call: CallbackQuery, api_key: str):
         )
         
         # Keyingi xabar uchun user state ni saqlaymiz
-        user_states[call.from_user.id] = {
-            "state": "waiting_product_search",
-            "shop_id": shop_id
-        }
-        
+        state_store.set(call.from_user.id, "waiting_product_search", shop_id=shop_id)
+    
     except Exception as e:
         logger.error(f"Mahsulot qidirishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_product_price_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("product_update_price", needs_api_key=True)
+async def handle_product_price_callback(call: CallbackQuery, api_key: str):
     """Mahsulot narxini yangilash"""
     try:
         # Avval do'konlar ro'yxatini olamiz
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        shops = await api_client.get_shops_cached()
         
         if not shops:
-            bot.edit_message_text(
+            await bot.edit_message_text(
                 "❌ Do'konlar topilmadi yoki API xatoligi",
                 call.message.chat.id,
                 call.message.message_id,
@@ -1654,7 +1878,7 @@ def handle_product_price_callback(call: CallbackQuery, api_key: str):
         else:
             shop_id = 1
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "💰 <b>Narx yangilash</b>\n\n" +
             "Quyidagi formatda ma'lumot kiriting:\n" +
             "<code>SKU:YANGI_NARX</code>\n\n" +
@@ -1667,70 +1891,70 @@ def handle_product_price_callback(call: CallbackQuery, api_key: str):
         )
         
         # Keyingi xabar uchun user state ni saqlaymiz
-        user_states[call.from_user.id] = {
-            "state": "waiting_price_update",
-            "shop_id": shop_id
-        }
-        
+        state_store.set(call.from_user.id, "waiting_price_update", shop_id=shop_id)
+    
     except Exception as e:
         logger.error(f"Narx yangilashda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_shops_list_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("shops_list", needs_api_key=True)
+async def handle_shops_list_callback(call: CallbackQuery, api_key: str):
     """Do'konlar ro'yxatini ko'rsatish"""
     if not api_key:
         return
     
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        # Do'konlar ro'yxati ko'rilganda kesh ham yangilanadi
+        shops = await api_client.get_shops_cached(refresh=True)
         
         if shops:
             text = format_list_message(shops, format_shop_info, "Do'konlar")
         else:
             text = MESSAGES["no_data"]
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Do'konlar ro'yxatini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_update_stocks_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_update_stocks", needs_api_key=True)
+async def handle_fbs_update_stocks_callback(call: CallbackQuery, api_key: str):
     """FBS qoldiqlarni yangilash"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        stocks = api_client.get_fbs_sku_stocks_v2()
+        api_client = get_async_api_client(api_key)
+        stocks = await api_client.get_fbs_sku_stocks_v2()
         
         if stocks and 'data' in stocks:
             text = "📋 <b>FBS Qoldiqlar (yangilanadi)</b>\n\n"
@@ -1744,34 +1968,40 @@ def handle_fbs_update_stocks_callback(call: CallbackQuery, api_key: str):
                     text += f"{i}. 🏷 SKU: <code>{sku}</code>\n"
                     text += f"   📦 Mavjud: {available}\n"
                     text += f"   🔒 Band: {reserved}\n\n"
-                    
-                text += "💡 Qoldiqlarni yangilash uchun API so'rov yuborilishi mumkin."
+                
+                text += "📄 <b>Ko'p SKU ni yangilash:</b> CSV yoki XLSX fayl yuboring.\n"
+                text += "Ustunlar: <code>SKU_ID, SON</code> (sarlavha qatori bo'lishi mumkin).\n"
+                text += "Faqat qoldig'i o'zgargan SKU lar yuboriladi."
+                
+                # Keyingi xabar (fayl) uchun user state ni saqlaymiz
+                state_store.set(call.from_user.id, "waiting_stock_file")
             else:
                 text += "📭 Qoldiqlar topilmadi."
         else:
             text = "📋 <b>FBS Qoldiqlar</b>\n\n📭 Ma'lumotlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Qoldiqlarni yangilashda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_order_details_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_order_details", needs_api_key=True)
+async def handle_fbs_order_details_callback(call: CallbackQuery, api_key: str):
     """FBS buyurtma tafsilotlari"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "🆔 <b>Buyurtma tafsilotlari</b>\n\n" +
             "Bu funksiya hozircha ishlab chiqilmoqda.\n" +
             "Tez orada buyurtma ID orqali tafsilotli ma'lumot olish imkoniyati qo'shiladi!\n\n" +
@@ -1781,28 +2011,29 @@ def handle_fbs_order_details_callback(call: CallbackQuery, api_key: str):
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Buyurtma tafsilotlarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_finance_payment_info_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("finance_payment_info", needs_api_key=True)
+async def handle_finance_payment_info_callback(call: CallbackQuery, api_key: str):
     """Moliyaviy to'lov ma'lumotlari"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        payment_info = api_client.get_finance_seller_payment_info()
+        api_client = get_async_api_client(api_key)
+        payment_info = await api_client.get_finance_seller_payment_info()
         
         if payment_info and 'data' in payment_info:
             data = payment_info['data']
@@ -1822,35 +2053,36 @@ def handle_finance_payment_info_callback(call: CallbackQuery, api_key: str):
         else:
             text = "💳 <b>To'lov ma'lumotlari</b>\n\n📭 Ma'lumotlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"To'lov ma'lumotlarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_finance_commission_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("finance_commission", needs_api_key=True)
+async def handle_finance_commission_callback(call: CallbackQuery, api_key: str):
     """Moliyaviy komissiya ma'lumotlari"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        commission_info = api_client.get_finance_commission_info()
+        api_client = get_async_api_client(api_key)
+        commission_info = await api_client.get_finance_commission_info()
         
         if commission_info and 'data' in commission_info:
             data = commission_info['data']
@@ -1866,27 +2098,28 @@ def handle_finance_commission_callback(call: CallbackQuery, api_key: str):
         else:
             text = "💰 <b>Komissiya ma'lumotlari</b>\n\n📭 Ma'lumotlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Komissiya ma'lumotlarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_invoice_products_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("invoice_products", needs_api_key=True)
+async def handle_invoice_products_callback(call: CallbackQuery, api_key: str):
     """Hisob-faktura mahsulotlari"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "📋 <b>Hisob-faktura mahsulotlari</b>\n\n" +
             "Bu funksiya hozircha ishlab chiqilmoqda.\n" +
             "Tez orada faktura mahsulotlarini ko'rish imkoniyati qo'shiladi!\n\n" +
@@ -1896,20 +2129,21 @@ def handle_invoice_products_callback(call: CallbackQuery, api_key: str):
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Faktura mahsulotlarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("shop_invoices", needs_api_key=True)
+async def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
     """Do'kon fakturaları"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
@@ -1917,11 +2151,11 @@ def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
         )
         
         # Avval do'konlar ro'yxatini olamiz
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        shops = await api_client.get_shops_cached()
         
         if not shops:
-            bot.edit_message_text(
+            await bot.edit_message_text(
                 "❌ Do'konlar topilmadi yoki API xatoligi",
                 call.message.chat.id,
                 call.message.message_id,
@@ -1938,7 +2172,7 @@ def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
             shop_id = 1
             shop_name = "Do'kon #1"
         
-        invoices = api_client.get_shop_invoice_by_id(shop_id, page=0, size=10)
+        invoices = await api_client.get_shop_invoice_by_id(shop_id, page=0, size=10)
         
         if invoices:
             text = f"📄 <b>{escape_html(shop_name)} hisob-fakturaları</b>\n\n"
@@ -1957,17 +2191,17 @@ def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
         else:
             text = f"📄 <b>{escape_html(shop_name)} hisob-fakturaları</b>\n\n📭 Ma'lumotlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Do'kon fakturalarini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
@@ -1975,61 +2209,71 @@ def handle_shop_invoices_callback(call: CallbackQuery, api_key: str):
         )
 
 # Yangi FBS statistika handlerlari
-def handle_fbs_shop_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_shop_statistics", needs_api_key=True)
+async def handle_fbs_shop_statistics_callback(call: CallbackQuery, api_key: str):
     """Do'kon bo'yicha FBS statistika"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        shops = await api_client.get_shops_cached()
         
         if shops and isinstance(shops, list):
             text = "🏪 <b>Do'kon bo'yicha FBS statistika</b>\n\n"
             
-            for i, shop in enumerate(shops[:5], 1):
-                shop_id = shop.get('id', 'N/A')
-                shop_name = shop.get('name', 'Noma''lum do''kon')
-                
-                # Har bir do'kon uchun buyurtmalar sonini olamiz
-                orders_count = api_client.get_fbs_orders_count(
-                    shop_ids=[shop_id] if shop_id != 'N/A' else None,
+            # Har bir do'kon uchun buyurtmalar sonini bir vaqtda so'raymiz
+            top_shops = shops[:5]
+            counts = await api_client.fan_out(
+                api_client.get_fbs_orders_count(
+                    shop_ids=[shop.get('id')] if shop.get('id') else None,
                     status="CREATED"
                 )
+                for shop in top_shops
+            )
+            
+            for i, (shop, orders_count) in enumerate(zip(top_shops, counts), 1):
+                shop_id = shop.get('id', 'N/A')
+                shop_name = shop.get('name', 'Noma''lum do''kon')
                 
                 count = orders_count.get('payload', 0) if orders_count else 0
                 
                 text += f"{i}. <b>{escape_html(shop_name)}</b>\n"
                 text += f"   🆔 ID: {shop_id}\n"
                 text += f"   📦 Buyurtmalar: {count} ta\n\n"
+            
+            # Vaqt yetmagan so'rovlar bo'lsa ogohlantiramiz
+            if budget_expired():
+                text += MESSAGES["still_loading"] + "\n"
         else:
             text = "🏪 <b>Do'kon bo'yicha FBS statistika</b>\n\n📭 Do'konlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Do'kon bo'yicha FBS statistikani olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_date_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_date_statistics", needs_api_key=True)
+async def handle_fbs_date_statistics_callback(call: CallbackQuery, api_key: str):
     """Sana bo'yicha FBS statistika"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "📅 <b>Sana bo'yicha FBS statistika</b>\n\n" +
             "Bu funksiya hozircha ishlab chiqilmoqda.\n" +
             "Tez orada sana bo'yicha filtrlash imkoniyati qo'shiladi!\n\n" +
@@ -2039,77 +2283,89 @@ def handle_fbs_date_statistics_callback(call: CallbackQuery, api_key: str):
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Sana bo'yicha FBS statistikani olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_status_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_status_statistics", needs_api_key=True)
+async def handle_fbs_status_statistics_callback(call: CallbackQuery, api_key: str):
     """Status bo'yicha FBS statistika"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
-        shop_ids = []
-        if shops and isinstance(shops, list):
-            shop_ids = [shop.get('id') for shop in shops if shop.get('id')]
+        api_client = get_async_api_client(api_key)
+        shop_ids = await api_client.get_shop_ids()
         
         text = "🔄 <b>Status bo'yicha FBS statistika</b>\n\n"
         
         # Asosiy statuslar bo'yicha statistika
         statuses = ["CREATED", "PACKING", "DELIVERING", "COMPLETED", "CANCELED"]
         
-        for status in statuses:
-            count_data = api_client.get_fbs_orders_count(
-                shop_ids=shop_ids if shop_ids else None,
-                status=status
+        if is_synced(api_key):
+            # Mahalliy nusxadan bitta indeksli so'rov bilan
+            local_counts = get_local_counts(api_key)
+            counts = [{'payload': local_counts.get(status, 0)} for status in statuses]
+        else:
+            start_order_sync(api_client)
+            # Barcha statuslar bo'yicha so'rovlar bir vaqtda yuboriladi
+            counts = await api_client.fan_out(
+                api_client.get_fbs_orders_count(
+                    shop_ids=shop_ids if shop_ids else None,
+                    status=status
+                )
+                for status in statuses
             )
-            
+        
+        for status, count_data in zip(statuses, counts):
             count = count_data.get('payload', 0) if count_data else 0
             status_text = format_order_status_v2(status)
             
             text += f"{status_text}: {count} ta\n"
         
-        bot.edit_message_text(
+        if budget_expired():
+            text += "\n" + MESSAGES["still_loading"] + "\n"
+        
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Status bo'yicha FBS statistikani olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_stock_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_stock_statistics", needs_api_key=True)
+async def handle_fbs_stock_statistics_callback(call: CallbackQuery, api_key: str):
     """Qoldiq bo'yicha FBS statistika"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        stocks = api_client.get_fbs_sku_stocks_v2()
+        api_client = get_async_api_client(api_key)
+        stocks = await api_client.get_fbs_sku_stocks_v2()
         
         if stocks and 'data' in stocks:
             data = stocks['data']
@@ -2138,27 +2394,28 @@ def handle_fbs_stock_statistics_callback(call: CallbackQuery, api_key: str):
         else:
             text = "📦 <b>Qoldiq bo'yicha FBS statistika</b>\n\n📭 Ma'lumotlar topilmadi."
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Qoldiq bo'yicha FBS statistikani olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_finance_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_finance_statistics", needs_api_key=True)
+async def handle_fbs_finance_statistics_callback(call: CallbackQuery, api_key: str):
     """Moliyaviy FBS statistika"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             "💰 <b>Moliyaviy FBS statistika</b>\n\n" +
             "Bu funksiya hozircha ishlab chiqilmoqda.\n" +
             "Tez orada moliyaviy ma'lumotlar bilan statistika qo'shiladi!\n\n" +
@@ -2168,10 +2425,10 @@ def handle_fbs_finance_statistics_callback(call: CallbackQuery, api_key: str):
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Moliyaviy FBS statistikani olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
@@ -2179,22 +2436,55 @@ def handle_fbs_finance_statistics_callback(call: CallbackQuery, api_key: str):
         )
 
 # Yangi yo'qolgan tovarlar handlerlari
-def handle_fbs_missing_items_callback(call: CallbackQuery, api_key: str):
+async def wait_for_missing_scan(call: CallbackQuery, scan, title: str) -> bool:
+    """Skanerlash tugashini kutish, oraliq natijalarni ko'rsatib turish (handler vaqti ichida)"""
+    interval = MISSING_SCAN_CONFIG["progress_interval"]
+    
+    while not scan.finished.is_set():
+        budget = current_budget()
+        remaining = budget.remaining() if budget else interval
+        if remaining <= 0:
+            return False
+        
+        try:
+            await asyncio.wait_for(scan.finished.wait(), timeout=min(interval, remaining))
+        except asyncio.TimeoutError:
+            # Sahifalar kelishi bilan yig'indilar yangilanib boriladi
+            try:
+                await bot.edit_message_text(
+                    f"{title}\n\n"
+                    f"⏳ Skanerlanmoqda: {scan.pages_done}/{scan.pages_total} sahifa\n"
+                    f"📦 Mahsulotlar: {scan.total_products} ta\n"
+                    f"❌ Yo'qolgan: {scan.total_missing} dona",
+                    call.message.chat.id,
+                    call.message.message_id,
+                    parse_mode="HTML"
+                )
+            except Exception:
+                pass
+    
+    return True
+
+@callback_router.route("fbs_missing_items", needs_api_key=True)
+async def handle_fbs_missing_items_callback(call: CallbackQuery, api_key: str):
     """Yo'qolgan tovarlar ro'yxati"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
+        api_client = get_async_api_client(api_key)
+        title = "🔍 <b>Yo'qolgan tovarlar ro'yxati</b>"
         
-        # Avval do'konlar ro'yxatini olamiz
-        shops = api_client.get_shops()
-        if not shops or not isinstance(shops, list):
-            bot.edit_message_text(
+        # Barcha do'konlarning barcha sahifalari fon vazifasida skanerlanadi
+        scan = start_missing_scan(api_client)
+        finished = await wait_for_missing_scan(call, scan, title)
+        
+        if scan.error == "no_shops":
+            await bot.edit_message_text(
                 "❌ Do'konlar topilmadi yoki API xatoligi",
                 call.message.chat.id,
                 call.message.message_id,
@@ -2203,93 +2493,77 @@ def handle_fbs_missing_items_callback(call: CallbackQuery, api_key: str):
             )
             return
         
-        text = "🔍 <b>Yo'qolgan tovarlar ro'yxati</b>\n\n"
+        text = title + "\n\n"
         
-        # Har bir do'kon uchun yo'qolgan tovarlarni qidiramiz
-        for i, shop in enumerate(shops[:3], 1):  # Faqat birinchi 3 ta do'kon
-            shop_id = shop.get('id')
-            shop_name = shop.get('name', 'Noma''lum do''kon')
+        # Eng ko'p yetishmayotgan do'konlar birinchi
+        shops = sorted(scan.shops, key=lambda shop: shop.missing, reverse=True)
+        for shop in shops[:5]:
+            text += f"🏪 <b>{escape_html(shop.name)}</b>\n"
             
-            if not shop_id:
-                continue
+            if shop.missing_skus == 0:
+                text += "   ✅ Yo'qolgan tovarlar yo'q\n" if shop.products else "   📭 Mahsulotlar topilmadi\n"
+            else:
+                for sku_title, missing_qty in shop.top_skus():
+                    text += f"   ❌ {escape_html(sku_title)}: {missing_qty} dona yo'q\n"
+                if shop.missing_skus > len(shop.top_skus()):
+                    text += f"   ... va yana {shop.missing_skus - len(shop.top_skus())} ta\n"
             
-            text += f"🏪 <b>{escape_html(shop_name)}</b>\n"
-            
-            # Do'kon mahsulotlarini olamiz va yo'qolganlarni topamiz
-            try:
-                products = api_client.get_shop_products_by_shop_id(
-                    shop_id=shop_id,
-                    size=20,
-                    page=0,
-                    filter="WITHOUT_REQUIRED_FILTERS"  # Yo'qolgan tovarlar uchun
-                )
-                
-                if products and 'productList' in products:
-                    product_list = products['productList']
-                    missing_count = 0
-                    
-                    for product in product_list[:5]:  # Faqat birinchi 5 ta mahsulot
-                        sku_list = product.get('skuList', [])
-                        for sku in sku_list:
-                            if sku.get('quantityMissing', 0) > 0:
-                                missing_count += 1
-                                if missing_count <= 3:  # Har do'kon uchun max 3 ta
-                                    sku_title = sku.get('skuTitle', 'N/A')
-                                    missing_qty = sku.get('quantityMissing', 0)
-                                    text += f"   ❌ {sku_title}: {missing_qty} dona yo'q\n"
-                    
-                    if missing_count == 0:
-                        text += "   ✅ Yo'qolgan tovarlar yo'q\n"
-                    elif missing_count > 3:
-                        text += f"   ... va yana {missing_count - 3} ta\n"
-                else:
-                    text += "   📭 Mahsulotlar topilmadi\n"
-                
-            except Exception as e:
-                text += f"   ⚠️ Xatolik: {str(e)[:50]}...\n"
+            if shop.failed_pages:
+                text += f"   ⚠️ {shop.failed_pages} ta sahifa yuklanmadi\n"
+            if shop.truncated:
+                text += f"   ⚠️ Faqat birinchi {MISSING_SCAN_CONFIG['max_pages_per_shop']} ta sahifa o'qildi\n"
             
             text += "\n"
         
-        if len(shops) > 3:
-            text += f"📊 <i>Jami {len(shops)} ta do'kon mavjud. Faqat birinchi 3 tasi ko'rsatildi.</i>\n\n"
+        if len(shops) > 5:
+            text += f"📊 <i>Jami {len(shops)} ta do'kon mavjud. Eng ko'p yo'qolgan 5 tasi ko'rsatildi.</i>\n\n"
+        
+        if not finished:
+            text += MESSAGES["still_loading"] + "\n\n"
+        elif not scan.complete:
+            text += MESSAGES["partial_data"] + "\n\n"
         
         text += "💡 <b>Yo'qolgan tovarlar haqida:</b>\n"
         text += "• Bu tovarlar omborda yo'q yoki yetarli emas\n"
         text += "• Buyurtmalar bajarilmaydi\n"
         text += "• Tez orada to'ldirish kerak\n"
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Yo'qolgan tovarlarni olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
 
-def handle_fbs_missing_statistics_callback(call: CallbackQuery, api_key: str):
+@callback_router.route("fbs_missing_statistics", needs_api_key=True)
+async def handle_fbs_missing_statistics_callback(call: CallbackQuery, api_key: str):
     """Yo'qolgan tovarlar statistikasi"""
     try:
-        bot.edit_message_text(
+        await bot.edit_message_text(
             MESSAGES["data_loading"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
         
-        api_client = MarketplaceAPIClient(api_key)
-        shops = api_client.get_shops()
+        api_client = get_async_api_client(api_key)
+        title = "📊 <b>Yo'qolgan tovarlar statistikasi</b>"
         
-        if not shops or not isinstance(shops, list):
-            bot.edit_message_text(
+        scan = start_missing_scan(api_client)
+        finished = await wait_for_missing_scan(call, scan, title)
+        
+        if scan.error == "no_shops":
+            await bot.edit_message_text(
                 "❌ Do'konlar topilmadi yoki API xatoligi",
                 call.message.chat.id,
                 call.message.message_id,
@@ -2298,57 +2572,14 @@ def handle_fbs_missing_statistics_callback(call: CallbackQuery, api_key: str):
             )
             return
         
-        text = "📊 <b>Yo'qolgan tovarlar statistikasi</b>\n\n"
+        total_missing = scan.total_missing
+        total_products = scan.total_products
         
-        total_missing = 0
-        total_products = 0
-        shop_missing_data = []
-        
-        # Har bir do'kon uchun statistika
-        for shop in shops:
-            shop_id = shop.get('id')
-            shop_name = shop.get('name', 'Noma''lum do''kon')
-            
-            if not shop_id:
-                continue
-            
-            try:
-                products = api_client.get_shop_products_by_shop_id(
-                    shop_id=shop_id,
-                    size=50,
-                    page=0,
-                    filter="ALL"
-                )
-                
-                if products and 'productList' in products:
-                    product_list = products['productList']
-                    shop_missing = 0
-                    shop_total = len(product_list)
-                    
-                    for product in product_list:
-                        sku_list = product.get('skuList', [])
-                        for sku in sku_list:
-                            missing_qty = sku.get('quantityMissing', 0)
-                            if missing_qty > 0:
-                                shop_missing += missing_qty
-                    
-                    total_missing += shop_missing
-                    total_products += shop_total
-                    
-                    if shop_missing > 0:
-                        shop_missing_data.append({
-                            'name': shop_name,
-                            'missing': shop_missing,
-                            'total': shop_total
-                        })
-                
-            except Exception as e:
-                logger.error(f"Do'kon {shop_id} uchun ma'lumotlarni olishda xatolik: {e}")
-                continue
+        text = title + "\n\n"
         
         # Umumiy statistika
         text += f"📈 <b>Umumiy statistika:</b>\n"
-        text += f"🏪 Do'konlar soni: {len(shops)} ta\n"
+        text += f"🏪 Do'konlar soni: {len(scan.shops)} ta\n"
         text += f"📦 Jami mahsulotlar: {total_products} ta\n"
         text += f"❌ Yo'qolgan tovarlar: {total_missing} dona\n"
         
@@ -2359,41 +2590,144 @@ def handle_fbs_missing_statistics_callback(call: CallbackQuery, api_key: str):
         text += "\n🏪 <b>Do'kon bo'yicha:</b>\n"
         
         # Do'konlar bo'yicha saralangan statistika
-        shop_missing_data.sort(key=lambda x: x['missing'], reverse=True)
+        shop_missing_data = sorted(
+            (shop for shop in scan.shops if shop.missing > 0),
+            key=lambda shop: shop.missing,
+            reverse=True
+        )
         
-        for i, shop_data in enumerate(shop_missing_data[:5], 1):
-            shop_name = shop_data['name']
-            missing = shop_data['missing']
-            total = shop_data['total']
-            percentage = (missing / total * 100) if total > 0 else 0
+        for i, shop in enumerate(shop_missing_data[:5], 1):
+            percentage = (shop.missing / shop.products * 100) if shop.products > 0 else 0
             
-            text += f"{i}. <b>{escape_html(shop_name)}</b>\n"
-            text += f"   ❌ Yo'qolgan: {missing} dona\n"
-            text += f"   📦 Jami: {total} ta\n"
+            text += f"{i}. <b>{escape_html(shop.name)}</b>\n"
+            text += f"   ❌ Yo'qolgan: {shop.missing} dona\n"
+            text += f"   📦 Jami: {shop.products} ta\n"
             text += f"   📊 Foizi: {percentage:.1f}%\n\n"
         
         if len(shop_missing_data) > 5:
             text += f"📋 <i>Jami {len(shop_missing_data)} ta do'konda yo'qolgan tovarlar mavjud.</i>\n\n"
         
+        if not finished:
+            text += MESSAGES["still_loading"] + "\n\n"
+        elif not scan.complete:
+            text += MESSAGES["partial_data"] + "\n\n"
+        
         # Tavsiyalar
         text += "💡 <b>Tavsiyalar:</b>\n"
         text += "• Yo'qolgan tovarlarni tez orada to'ldiring\n"
         text += "• Ombordagi qoldiqlarni muntazam tekshiring\n"
         text += "• Buyurtmalar bajarilmasligini oldini oling\n"
         
-        bot.edit_message_text(
+        await bot.edit_message_text(
             text,
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML",
             reply_markup=get_back_to_main_keyboard()
         )
-        
+    
     except Exception as e:
         logger.error(f"Yo'qolgan tovarlar statistikasini olishda xatolik: {e}")
-        bot.edit_message_text(
+        await bot.edit_message_text(
+            MESSAGES["error"],
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML"
+        )
+
+@callback_router.route("stock_alerts", needs_api_key=True)
+async def handle_stock_alerts_callback(call: CallbackQuery, api_key: str):
+    """Qoldiq ogohlantirishlari chegaralarini ko'rsatish va yangilarini so'rash"""
+    try:
+        thresholds = get_thresholds(api_key)
+        
+        text = "⚠️ <b>Qoldiq ogohlantirishlari</b>\n\n"
+        if thresholds:
+            text += f"📌 Chegara belgilangan SKU lar: {len(thresholds)} ta\n"
+            for sku_id, threshold in sorted(thresholds.items())[:15]:
+                text += f"• <code>{sku_id}</code>: {threshold} dona\n"
+            if len(thresholds) > 15:
+                text += f"... va yana {len(thresholds) - 15} ta\n"
+            text += "\n"
+        else:
+            text += "📭 Hali chegara belgilanmagan.\n\n"
+        
+        text += "Har bir qatorga SKU ID va chegarani yuboring:\n"
+        text += "<code>123456 10</code> - 10 donadan tushganda xabar berish\n"
+        text += "<code>123456 -</code> - chegarani o'chirish\n\n"
+        text += "💡 Chegara belgilangan sotuvchilarda qoldiq tugaganda ham xabar beriladi."
+        
+        await bot.edit_message_text(
+            text,
+            call.message.chat.id,
+            call.message.message_id,
+            parse_mode="HTML",
+            reply_markup=get_back_to_main_keyboard()
+        )
+        
+        # Keyingi xabar uchun user state ni saqlaymiz
+        state_store.set(call.from_user.id, "waiting_stock_threshold")
+    
+    except Exception as e:
+        logger.error(f"Qoldiq ogohlantirishlarini ko'rsatishda xatolik: {e}")
+        await bot.edit_message_text(
             MESSAGES["error"],
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML"
         )
+
+
+# API kalit xeshi -> qayta ishlanayotgan qoldiqlar fayli
+_stock_uploads = {}
+
+def start_stock_upload(chat_id: int, message_id: int, api_key: str, file_id: str, file_name: str):
+    """Faylni fonda qayta ishlash (handler slotini va vaqt byudjetini band qilmaydi)"""
+    account = api_key_hash(api_key)
+    task = asyncio.get_running_loop().create_task(
+        process_stock_upload(chat_id, message_id, api_key, file_id, file_name),
+        context=contextvars.Context()
+    )
+    _stock_uploads[account] = task
+    task.add_done_callback(lambda _: _stock_uploads.pop(account, None))
+
+async def process_stock_upload(chat_id: int, message_id: int, api_key: str, file_id: str, file_name: str):
+    """Faylni yuklab olish, qoldiqlarni yangilash va hisobot yuborish"""
+    async def show_progress(report):
+        try:
+            await bot.edit_message_text(
+                format_upload_report(report, finished=False), chat_id, message_id, parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.warning(f"Holat xabarini yangilab bo'lmadi: {e}")
+    
+    try:
+        file_info = await bot.get_file(file_id)
+        content = await bot.download_file(file_info.file_path)
+        
+        # Fayl diskka yoziladi va u yerdan qatorma-qator o'qiladi
+        with tempfile.TemporaryFile() as file_obj:
+            file_obj.write(content)
+            del content
+            file_obj.seek(0)
+            report = await run_stock_upload(
+                get_async_api_client(api_key), file_obj, file_name, on_progress=show_progress
+            )
+        
+        if report is None:
+            text = "❌ <b>Qoldiqlar ro'yxatini olib bo'lmadi</b>\n\nIltimos, keyinroq qayta urinib ko'ring."
+        else:
+            text = format_upload_report(report)
+    
+    except ImportError:
+        text = "❌ XLSX fayllarni o'qib bo'lmadi. Iltimos, faylni CSV formatida yuboring."
+    except Exception as e:
+        logger.error(f"Qoldiqlarni fayldan yangilashda xatolik: {e}")
+        text = MESSAGES["error"]
+    
+    try:
+        await bot.edit_message_text(
+            text, chat_id, message_id, parse_mode="HTML", reply_markup=get_back_to_main_keyboard()
+        )
+    except Exception as e:
+        logger.error(f"Yangilash hisobotini yuborishda xatolik: {e}")
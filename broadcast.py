@@ -0,0 +1,251 @@
+"""
+Ommaviy xabar yuborish
+Ishchilar havzasi, umumiy token chelagi va Telegram retry_after ga rioya qilish
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from itertools import islice
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+from config import BROADCAST_CONFIG
+from database import mark_broadcast_recipients
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Umumiy tezlik cheklovchi - barcha ishchilar bitta chelakdan token oladi"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self):
+        """Token bo'shaguncha kutish"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """429 javobidan keyin hamma ishchilarni to'xtatib turish"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = now
+
+class BroadcastStats:
+    """Yuborish natijalari"""
+    
+    def __init__(self, total: int):
+        self.total = total
+        self.success = 0
+        self.failed = 0
+        self.blocked = 0  # botni bloklagan yoki o'chirilgan akkauntlar (403)
+        self.retries = 0
+        self.started = time.monotonic()
+    
+    @property
+    def done(self) -> int:
+        return self.success + self.failed
+    
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+    
+    def to_dict(self) -> dict:
+        return {
+            'success': self.success,
+            'failed': self.failed,
+            'blocked': self.blocked,
+            'total': self.total
+        }
+
+class RecipientRecorder:
+    """Har bir qabul qiluvchi natijasini yig'ib, bazaga guruhlab yozish (yozuv event loop dan tashqarida)"""
+    
+    def __init__(self, job_id: int, flush_size: int = BROADCAST_CONFIG["flush_size"]):
+        self.job_id = job_id
+        self.flush_size = flush_size
+        self._pending: List[Tuple[int, str]] = []
+        self._writes: Set[asyncio.Task] = set()
+    
+    def add(self, user_id: int, status: str):
+        self._pending.append((user_id, status))
+        if len(self._pending) >= self.flush_size:
+            task = asyncio.get_running_loop().create_task(self._write())
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+    
+    async def _write(self):
+        results, self._pending = self._pending, []
+        await asyncio.to_thread(mark_broadcast_recipients, self.job_id, results)
+    
+    async def flush(self):
+        """Qolganlarini yozish va fondagi yozuvlar tugashini kutish"""
+        await self._write()
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+class RecipientSource:
+    """Bazadan o'qiydigan iteratorni bo'laklab, event loop dan tashqarida olish"""
+    
+    def __init__(self, chat_ids: Iterable[int], batch_size: int = BROADCAST_CONFIG["claim_size"]):
+        self.batch_size = batch_size
+        self._iterator = iter(chat_ids)
+        # Bekor qilingan so'rov oqimi hali ishlayotgan bo'lsa close uni kutadi
+        self._lock = threading.Lock()
+    
+    def _take(self) -> List[int]:
+        with self._lock:
+            return list(islice(self._iterator, self.batch_size))
+    
+    def _close(self):
+        with self._lock:
+            if hasattr(self._iterator, 'close'):
+                self._iterator.close()
+    
+    async def take(self) -> List[int]:
+        """Navbatdagi bo'lak (tugaganda bo'sh ro'yxat)"""
+        return await asyncio.to_thread(self._take)
+    
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+def retry_after(error: ApiTelegramException) -> Optional[float]:
+    """429 javobidagi kutish vaqti"""
+    if error.error_code != 429:
+        return None
+    parameters = (error.result_json or {}).get('parameters') or {}
+    return float(parameters.get('retry_after', 1))
+
+async def _send_one(bot: AsyncTeleBot, bucket: TokenBucket, stats: BroadcastStats,
+                    chat_id: int, text: str) -> str:
+    """Bitta foydalanuvchiga yuborish (429 da kutib qayta urinish), holatni qaytarish"""
+    for attempt in range(BROADCAST_CONFIG["max_retries"] + 1):
+        await bucket.acquire()
+        try:
+            await bot.send_message(chat_id, text, parse_mode="HTML")
+            stats.success += 1
+            return 'sent'
+        
+        except ApiTelegramException as e:
+            delay = retry_after(e)
+            if delay is not None and attempt < BROADCAST_CONFIG["max_retries"]:
+                logger.warning(f"Telegram cheklovi, {delay} soniya kutiladi")
+                stats.retries += 1
+                bucket.pause(delay)
+                continue
+            
+            if e.error_code == 403:
+                stats.blocked += 1
+                stats.failed += 1
+                return 'blocked'
+            logger.error(f"Xabar yuborishda xatolik {chat_id}: {e}")
+            break
+        
+        except Exception as e:
+            logger.error(f"Xabar yuborishda xatolik {chat_id}: {e}")
+            break
+    
+    stats.failed += 1
+    return 'failed'
+
+async def run_broadcast(bot: AsyncTeleBot, chat_ids: Iterable[int], text: str, total: int,
+                        on_progress: Optional[Callable[[BroadcastStats], Awaitable]] = None,
+                        on_result: Optional[Callable[[int, str], None]] = None,
+                        stats: Optional[BroadcastStats] = None) -> BroadcastStats:
+    """Xabarni barcha chat_ids ga ishchilar havzasi orqali yuborish"""
+    stats = stats or BroadcastStats(total)
+    bucket = TokenBucket(BROADCAST_CONFIG["rate"], BROADCAST_CONFIG["burst"])
+    workers = max(1, BROADCAST_CONFIG["workers"])
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    
+    async def worker():
+        while True:
+            chat_id = await queue.get()
+            try:
+                if chat_id is None:
+                    return
+                status = await _send_one(bot, bucket, stats, chat_id, text)
+                if on_result:
+                    on_result(chat_id, status)
+            finally:
+                queue.task_done()
+    
+    async def reporter():
+        while True:
+            await asyncio.sleep(BROADCAST_CONFIG["progress_interval"])
+            try:
+                await on_progress(stats)
+            except Exception as e:
+                logger.error(f"Yuborish holatini yangilashda xatolik: {e}")
+    
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    progress_task = asyncio.create_task(reporter()) if on_progress else None
+    source = RecipientSource(chat_ids)
+    batch: List[int] = []
+    try:
+        # Navbat chegaralangan - ID lar ishchilar ulgurgan sari beriladi
+        while True:
+            batch = await source.take()
+            if not batch:
+                break
+            while batch:
+                await queue.put(batch[0])
+                batch.pop(0)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if progress_task:
+            progress_task.cancel()
+        
+        # To'xtatilganda navbatda va olingan bo'lakda qolib ketganlar yuborilmagan deb qaytariladi
+        while not queue.empty():
+            chat_id = queue.get_nowait()
+            if chat_id is not None and on_result:
+                on_result(chat_id, 'pending')
+        if on_result:
+            for chat_id in batch:
+                on_result(chat_id, 'pending')
+        await source.close()
+    
+    return stats
+
+def format_broadcast_progress(stats: BroadcastStats, finished: bool = False) -> str:
+    """Admin uchun holat matni"""
+    percent = stats.done * 100 // stats.total if stats.total else 100
+    
+    if finished:
+        text = "📢 <b>Xabar yuborish natijasi:</b>\n\n"
+    else:
+        text = f"📢 <b>Xabar yuborilmoqda...</b> {percent}%\n\n"
+    text += f"✅ Muvaffaqiyatli: {stats.success} ta\n"
+    text += f"❌ Xatolik: {stats.failed} ta\n"
+    if stats.blocked:
+        text += f"🚫 Botni bloklagan: {stats.blocked} ta\n"
+    text += f"📊 Jami: {stats.total} ta\n"
+    text += f"⏱ Vaqt: {int(stats.elapsed)} soniya"
+    return text
@@ -0,0 +1,60 @@
+"""
+Jarayon ichidagi kesh
+TTL (yashash muddati) va LRU (eng kam ishlatilgan) chiqarib yuborish bilan
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+# Keshda yo'qligini bildiruvchi belgi (None qiymatini ham keshlash mumkin)
+MISSING = object()
+
+class TTLCache:
+    """Oqimlar uchun xavfsiz TTL + LRU kesh"""
+    
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Qiymatni olish (muddati o'tgan bo'lsa default qaytariladi)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Qiymatni saqlash"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, key: Hashable):
+        """Bitta yozuvni o'chirish"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Butun keshni tozalash"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,64 @@
+"""
+Callback querylar marshrutizatori
+Aniq marshrutlar lug'atda, o'zgaruvchan qismli marshrutlar (masalan order_details_<id>) prefiks daraxtida
+"""
+
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+class Route(NamedTuple):
+    """Marshrut va uning talablari"""
+    handler: Callable[..., Awaitable]
+    needs_api_key: bool  # API kalit bo'lmasa handler chaqirilmaydi
+    loads_api_key: bool  # API kalit olinadi, lekin majburiy emas
+    check_blocked: bool  # bloklangan foydalanuvchi tekshiriladi
+    is_prefix: bool  # handler ga prefiksdan keyingi qism ham beriladi
+
+# Prefiks daraxti tugunidagi marshrut kaliti (belgilar bilan to'qnashmaydi)
+_ROUTE = None
+
+class CallbackRouter:
+    """callback_data bo'yicha marshrutni topish: aniq moslik O(1), prefiks - data uzunligi bo'yicha"""
+    
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._trie: Dict = {}
+    
+    def route(self, data: str, needs_api_key: bool = False, loads_api_key: bool = False,
+              check_blocked: bool = True):
+        """Aniq marshrut: handler(call, api_key)"""
+        def decorator(handler):
+            self._exact[data] = Route(handler, needs_api_key, loads_api_key or needs_api_key,
+                                      check_blocked, False)
+            return handler
+        return decorator
+    
+    def prefix(self, prefix: str, needs_api_key: bool = False, loads_api_key: bool = False,
+               check_blocked: bool = True):
+        """Prefiksli marshrut: handler(call, api_key, qolgan_qism)"""
+        def decorator(handler):
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[_ROUTE] = Route(handler, needs_api_key, loads_api_key or needs_api_key,
+                                 check_blocked, True)
+            return handler
+        return decorator
+    
+    def resolve(self, data: str) -> Optional[Tuple[Route, str]]:
+        """Marshrut va prefiksdan keyingi qismni topish (eng uzun prefiks ustun)"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, ""
+        
+        found = None
+        node = self._trie
+        for index, char in enumerate(data):
+            node = node.get(char)
+            if node is None:
+                break
+            if _ROUTE in node:
+                found = (node[_ROUTE], data[index + 1:])
+        return found
+
+# Umumiy marshrutizator (handlerlar bot_handlers.py da ro'yxatdan o'tkaziladi)
+callback_router = CallbackRouter()
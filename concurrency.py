@@ -0,0 +1,83 @@
+"""
+Handlerlar uchun parallellik cheklovlari
+Bitta foydalanuvchining sekin so'rovlari boshqalarni kutishga majburlamasligi uchun
+"""
+
+import asyncio
+import logging
+import functools
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from config import CONCURRENCY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class ConcurrencyLimiter:
+    """Foydalanuvchi bo'yicha va umumiy parallel handlerlar sonini cheklash"""
+    
+    def __init__(self, per_user: int = 2, global_limit: int = 200):
+        self.per_user = per_user
+        self.global_limit = global_limit
+        
+        self._global: Optional[asyncio.Semaphore] = None
+        self._users: Dict[int, asyncio.Semaphore] = {}
+        self._holders: Dict[int, int] = {}  # user_id -> kutayotgan/bajarilayotgan handlerlar soni
+    
+    def _user_semaphore(self, user_id: int) -> asyncio.Semaphore:
+        """Foydalanuvchi semaforini olish (kerak bo'lganda yaratiladi)"""
+        semaphore = self._users.get(user_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_user)
+            self._users[user_id] = semaphore
+        self._holders[user_id] = self._holders.get(user_id, 0) + 1
+        return semaphore
+    
+    def _release_user(self, user_id: int):
+        """Foydalanuvchi semaforini bo'shatish - hech kim ishlatmasa o'chiriladi"""
+        remaining = self._holders.get(user_id, 1) - 1
+        if remaining <= 0:
+            self._holders.pop(user_id, None)
+            self._users.pop(user_id, None)
+        else:
+            self._holders[user_id] = remaining
+    
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[int]):
+        """Avval foydalanuvchi, keyin umumiy slotni egallash"""
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        
+        if user_id is None:
+            async with self._global:
+                yield
+            return
+        
+        user_semaphore = self._user_semaphore(user_id)
+        try:
+            async with user_semaphore:
+                async with self._global:
+                    yield
+        finally:
+            self._release_user(user_id)
+    
+    def active_users(self) -> int:
+        """Hozir handleri bajarilayotgan yoki kutayotgan foydalanuvchilar soni"""
+        return len(self._holders)
+
+limiter = ConcurrencyLimiter(
+    per_user=CONCURRENCY_CONFIG["per_user"],
+    global_limit=CONCURRENCY_CONFIG["global"]
+)
+
+def _update_user_id(update) -> Optional[int]:
+    """Message yoki CallbackQuery dan foydalanuvchi ID sini olish"""
+    from_user = getattr(update, "from_user", None)
+    return from_user.id if from_user else None
+
+def limit_concurrency(func):
+    """Async handlerni limiter slotida bajarish uchun dekorator"""
+    @functools.wraps(func)
+    async def wrapper(update, *args, **kwargs):
+        async with limiter.slot(_update_user_id(update)):
+            return await func(update, *args, **kwargs)
+    return wrapper
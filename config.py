@@ -15,6 +15,33 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "7666059929:AAFCIWLUJFMFg6Terd0w7av7aNTgy6hAw
 # Ma'lumotlar bazasi fayli
 DATABASE_FILE = "users.db"
 
+# SQLite ulanish sozlamalari
+DB_CONFIG = {
+    "busy_timeout_ms": int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),  # WAL bilan NORMAL yetarli
+    "cache_size": int(os.getenv("DB_CACHE_SIZE", "-16000")),  # Manfiy qiymat - KiB da (~16 MB)
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+}
+
+# Foydalanuvchi ma'lumotlari keshi (api_key, is_blocked)
+USER_CACHE_CONFIG = {
+    "ttl": float(os.getenv("USER_CACHE_TTL", "300")),  # soniya
+    "max_size": int(os.getenv("USER_CACHE_MAX_SIZE", "50000"))
+}
+
+# Statistika sozlamalari
+STATS_CONFIG = {
+    # user_counters jadvalidan o'qish (triggerlar orqali yangilanadi)
+    "use_counters": os.getenv("STATS_USE_COUNTERS", "true").lower() in ("1", "true", "yes"),
+    "active_days": int(os.getenv("STATS_ACTIVE_DAYS", "7"))
+}
+
+# Foydalanuvchi faolligini yozish (last_activity)
+ACTIVITY_CONFIG = {
+    "flush_interval": float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5")),  # soniya
+    "max_pending": int(os.getenv("ACTIVITY_MAX_PENDING", "500"))  # shuncha foydalanuvchida darhol yoziladi
+}
+
 # API Base URL (rasmdan olingan URL asosida)
 API_BASE_URL = "https://api-seller.uzum.uz/api/seller-openapi"
 
@@ -24,6 +51,142 @@ API_HEADERS = {
     "Accept": "application/json"
 }
 
+# HTTP transport sozlamalari (barcha API mijozlari uchun umumiy)
+HTTP_CONFIG = {
+    "pool_connections": int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+    "pool_maxsize": int(os.getenv("HTTP_POOL_MAXSIZE", "100")),  # bir vaqtdagi ulanishlar soni
+    "max_retries": int(os.getenv("HTTP_MAX_RETRIES", "3")),
+    "backoff_factor": float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5")),
+    "connect_timeout": float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),  # soniya
+    "read_timeout": float(os.getenv("HTTP_READ_TIMEOUT", "15")),  # soniya
+    "handler_budget": float(os.getenv("HANDLER_LATENCY_BUDGET", "12")),  # bitta handler uchun jami vaqt
+    "fan_out_limit": int(os.getenv("HTTP_FAN_OUT_LIMIT", "8")),  # bitta handlerdagi parallel so'rovlar
+    "client_cache_size": int(os.getenv("API_CLIENT_CACHE_SIZE", "10000")),
+    "client_cache_ttl": float(os.getenv("API_CLIENT_CACHE_TTL", "3600"))  # soniya
+}
+
+# Do'konlar ro'yxati keshi (API kalit bo'yicha)
+SHOP_CACHE_CONFIG = {
+    "ttl": int(os.getenv("SHOP_CACHE_TTL", "1800")),  # soniya
+    "max_size": int(os.getenv("SHOP_CACHE_MAX_SIZE", "10000"))
+}
+
+# API javoblari keshi (stale-while-revalidate)
+RESPONSE_CACHE_CONFIG = {
+    "enabled": os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1",
+    "max_size": int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "5000")),
+    "stale_ttl": int(os.getenv("RESPONSE_CACHE_STALE_TTL", "600")),  # muddati o'tgandan keyin ham qaytariladi (soniya)
+    "refresh_workers": int(os.getenv("RESPONSE_CACHE_REFRESH_WORKERS", "4"))
+}
+
+# FBS buyurtmalarining mahalliy nusxasi (order_sync.py)
+ORDER_SYNC_CONFIG = {
+    "enabled": os.getenv("ORDER_SYNC_ENABLED", "1") == "1",
+    "max_age": int(os.getenv("ORDER_SYNC_MAX_AGE", "180")),  # shundan eski nusxa o'rniga API ishlatiladi (soniya)
+    "interval": int(os.getenv("ORDER_SYNC_INTERVAL", "90")),  # fon sinxronlash oralig'i (soniya)
+    "active_days": int(os.getenv("ORDER_SYNC_ACTIVE_DAYS", "1")),  # shu kunlar ichida faol sotuvchilar sinxronlanadi
+    "concurrency": int(os.getenv("ORDER_SYNC_CONCURRENCY", "4")),  # bir vaqtda sinxronlanadigan sotuvchilar
+    "page_size": int(os.getenv("ORDER_SYNC_PAGE_SIZE", "50")),
+    "max_pages": int(os.getenv("ORDER_SYNC_MAX_PAGES", "40")),  # bitta ishga tushirishda bitta status uchun
+    "batch_size": int(os.getenv("ORDER_SYNC_BATCH_SIZE", "200")),  # bitta tranzaksiyada yoziladigan buyurtmalar
+    "lookback_days": int(os.getenv("ORDER_SYNC_LOOKBACK_DAYS", "30"))  # yopilgan statuslar uchun qayta ko'riladigan davr
+}
+
+# Yangi buyurtmalar haqida xabar berish (order_notifier.py)
+NOTIFY_CONFIG = {
+    "enabled": os.getenv("ORDER_NOTIFY_ENABLED", "1") == "1",
+    "base_interval": int(os.getenv("ORDER_NOTIFY_INTERVAL", "180")),  # yangi sotuvchi uchun (soniya)
+    "min_interval": int(os.getenv("ORDER_NOTIFY_MIN_INTERVAL", "60")),  # buyurtmalar ko'p kelganda
+    "max_interval": int(os.getenv("ORDER_NOTIFY_MAX_INTERVAL", "900")),  # buyurtmalar kelmaganda yoki xatolikda
+    "jitter": float(os.getenv("ORDER_NOTIFY_JITTER", "0.2")),  # oraliqning ± ulushi
+    "concurrency": int(os.getenv("ORDER_NOTIFY_CONCURRENCY", "8")),  # bir vaqtdagi API so'rovlar
+    "send_rate": int(os.getenv("ORDER_NOTIFY_SEND_RATE", "10")),  # soniyasiga xabarlar
+    "page_size": int(os.getenv("ORDER_NOTIFY_PAGE_SIZE", "50")),  # har so'rovda ko'riladigan eng yangi buyurtmalar
+    "refresh_interval": int(os.getenv("ORDER_NOTIFY_REFRESH_INTERVAL", "300"))  # API kalitlar ro'yxatini yangilash
+}
+
+# Qoldiq ogohlantirishlari (stock_watch.py)
+STOCK_WATCH_CONFIG = {
+    "enabled": os.getenv("STOCK_WATCH_ENABLED", "1") == "1",
+    "interval": int(os.getenv("STOCK_WATCH_INTERVAL", "600")),  # tekshirish oralig'i (soniya)
+    "concurrency": int(os.getenv("STOCK_WATCH_CONCURRENCY", "4")),  # bir vaqtda tekshiriladigan sotuvchilar
+    "default_threshold": int(os.getenv("STOCK_WATCH_DEFAULT_THRESHOLD", "0")),  # chegara berilmagan SKU lar uchun
+    "alerts_per_message": 20
+}
+
+# Qoldiqlarni fayldan yangilash (stock_upload.py)
+STOCK_UPLOAD_CONFIG = {
+    "chunk_size": int(os.getenv("STOCK_UPLOAD_CHUNK_SIZE", "100")),  # bitta so'rovdagi SKU lar
+    "max_retries": int(os.getenv("STOCK_UPLOAD_MAX_RETRIES", "3")),  # bo'lak uchun qayta urinishlar
+    "max_rows": int(os.getenv("STOCK_UPLOAD_MAX_ROWS", "100000")),
+    "max_file_mb": int(os.getenv("STOCK_UPLOAD_MAX_FILE_MB", "20")),  # Telegram bot API chegarasi
+    "read_batch": 500,  # ishchi oqimdan bir martada beriladigan qatorlar
+    "read_queue": 4,  # o'qilib, navbatda kutishi mumkin bo'lgan bo'laklar
+    "progress_interval": 3,  # holat xabarini yangilash oralig'i (soniya)
+    "error_examples": 10  # hisobotda ko'rsatiladigan xatoliklar
+}
+
+# Submenu ochilganda oldindan yuklash
+PREFETCH_CONFIG = {
+    "enabled": os.getenv("PREFETCH_ENABLED", "1") == "1",
+    "per_user": int(os.getenv("PREFETCH_PER_USER_LIMIT", "2")),  # bitta foydalanuvchi uchun bir vaqtda
+    "global": int(os.getenv("PREFETCH_GLOBAL_LIMIT", "20"))  # barcha foydalanuvchilar uchun bir vaqtda
+}
+
+# Yo'qolgan tovarlarni skanerlash
+MISSING_SCAN_CONFIG = {
+    "page_size": int(os.getenv("MISSING_SCAN_PAGE_SIZE", "100")),
+    "workers": int(os.getenv("MISSING_SCAN_WORKERS", "8")),  # bir vaqtdagi sahifa so'rovlari
+    "max_pages_per_shop": int(os.getenv("MISSING_SCAN_MAX_PAGES", "200")),
+    "top_skus_per_shop": 5,
+    "ttl": int(os.getenv("MISSING_SCAN_TTL", "600")),  # tugagan natija keshi, soniya
+    "progress_interval": 1.5  # oraliq natijani ko'rsatish oralig'i, soniya
+}
+
+# Handlerlar parallelligi (async bot)
+CONCURRENCY_CONFIG = {
+    "per_user": int(os.getenv("HANDLER_PER_USER_LIMIT", "2")),  # bitta foydalanuvchi uchun bir vaqtda
+    "global": int(os.getenv("HANDLER_GLOBAL_LIMIT", "200"))  # barcha foydalanuvchilar uchun bir vaqtda
+}
+
+# Suhbat holatlari ombori (memory - faqat shu jarayonda, sqlite - qayta ishga tushishdan keyin ham)
+STATE_CONFIG = {
+    "backend": os.getenv("STATE_BACKEND", "sqlite"),
+    "ttl": int(os.getenv("STATE_TTL", "3600")),  # soniya
+    "max_size": int(os.getenv("STATE_MAX_SIZE", "10000")),  # xotiradagi yozuvlar chegarasi
+    # sqlite oldidagi kesh muddati - webhook rejimida bir nechta worker bo'lsa kichik qiymat (yoki 0) qo'ying
+    "cache_ttl": float(os.getenv("STATE_CACHE_TTL", "30")),  # soniya
+    "purge_interval": int(os.getenv("STATE_PURGE_INTERVAL", "300"))  # soniya
+}
+
+# Ommaviy xabar yuborish sozlamalari (Telegram ~30 xabar/soniya chegarasi)
+BROADCAST_CONFIG = {
+    "rate": float(os.getenv("BROADCAST_RATE", "25")),  # soniyasiga xabarlar
+    "burst": int(os.getenv("BROADCAST_BURST", "25")),  # bir zumda yuborish mumkin bo'lgan xabarlar
+    "workers": int(os.getenv("BROADCAST_WORKERS", "20")),
+    "max_retries": int(os.getenv("BROADCAST_MAX_RETRIES", "3")),
+    "claim_size": int(os.getenv("BROADCAST_CLAIM_SIZE", "100")),  # bir martada band qilinadigan qabul qiluvchilar
+    "flush_size": int(os.getenv("BROADCAST_FLUSH_SIZE", "200")),  # natijalar shuncha yig'ilganda yoziladi
+    "progress_interval": float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "3"))  # soniya
+}
+
+# Yangilanishlarni olish rejimi: polling yoki webhook
+WEBHOOK_CONFIG = {
+    "mode": os.getenv("BOT_MODE", "polling"),
+    "url": os.getenv("WEBHOOK_URL", ""),  # masalan https://example.up.railway.app
+    "secret": os.getenv("WEBHOOK_SECRET", ""),  # bo'sh bo'lsa BOT_TOKEN dan hosil qilinadi
+    "workers": int(os.getenv("WEBHOOK_WORKERS", "16")),
+    "max_pending": int(os.getenv("WEBHOOK_MAX_PENDING", "1000")),  # to'lsa 503 qaytariladi
+    "max_connections": int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+}
+
+# Yetakchi tanlash (bir nechta worker bo'lsa faqat bittasi polling qiladi)
+LEADER_CONFIG = {
+    "ttl": float(os.getenv("LEADER_LEASE_TTL", "30")),  # soniya
+    "renew_interval": float(os.getenv("LEADER_RENEW_INTERVAL", "10")),  # soniya
+    "autostart": os.getenv("BOT_AUTOSTART", "1") == "1"  # har bir worker ishga tushganda bot va ijara kutishni boshlash
+}
+
 # Bot sozlamalari
 BOT_CONFIG = {
     "parse_mode": "HTML",
@@ -82,7 +245,13 @@ Boshlash uchun 🔄 API kiritish ✅ tugmasini bosing!""",
     
     "data_loading": "📥 <b>Ma'lumotlar yuklanmoqda...</b>",
     
+    "still_loading": "⏳ <i>Ba'zi ma'lumotlar hali yuklanmoqda. Birozdan so'ng qayta urinib ko'ring.</i>",
+    
+    "partial_data": "⚠️ <i>Natija to'liq emas: ba'zi sahifalar o'qilmadi yoki sahifalar chegarasidan oshdi.</i>",
+    
     "no_data": "📭 <b>Ma'lumotlar topilmadi</b>",
     
-    "api_deleted": "🗑 <b>API kalit o'chirildi</b>\n\nYangi API kalit kiritish uchun /api buyrug'ini bosing."
+    "api_deleted": "🗑 <b>API kalit o'chirildi</b>\n\nYangi API kalit kiritish uchun /api buyrug'ini bosing.",
+    
+    "new_orders": "🆕 <b>Yangi buyurtma!</b>\n\n📦 {new} ta yangi FBS buyurtma keldi.\n📋 Jami yangi buyurtmalar: {total} ta"
 }
@@ -3,121 +3,80 @@ Ma'lumotlar bazasi bilan ishlash moduli
 SQLite3 yordamida foydalanuvchi ma'lumotlarini saqlash
 """
 
-import sqlite3
 import logging
 from typing import Optional, Union
-from config import DATABASE_FILE
-from datetime import datetime
+from datetime import datetime, timedelta
+from cache import TTLCache, MISSING
+from config import DATABASE_FILE, USER_CACHE_CONFIG, STATS_CONFIG
+from db_pool import transaction, read_cursor
+from activity_recorder import activity_recorder
+from migrations import apply_migrations
 
 logger = logging.getLogger(__name__)
 
+# Foydalanuvchi yozuvlari keshi: user_id -> {'api_key', 'is_blocked'} yoki None
+_user_cache = TTLCache(
+    max_size=USER_CACHE_CONFIG["max_size"],
+    ttl=USER_CACHE_CONFIG["ttl"]
+)
+
+def invalidate_user_cache(user_id: int):
+    """Foydalanuvchi yozuvini keshdan o'chirish (yozishdan keyin chaqiriladi)"""
+    _user_cache.invalidate(user_id)
+
+def _get_user_record(user_id: int) -> Optional[dict]:
+    """Foydalanuvchi yozuvini keshdan yoki bazadan olish"""
+    record = _user_cache.get(user_id)
+    if record is not MISSING:
+        return record
+    
+    with read_cursor() as cursor:
+        cursor.execute("SELECT api_key, is_blocked FROM users WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
+    
+    # Mavjud bo'lmagan foydalanuvchi ham keshlanadi (None)
+    record = {'api_key': result[0], 'is_blocked': bool(result[1])} if result else None
+    _user_cache.set(user_id, record)
+    return record
+
 def init_database():
-    """Ma'lumotlar bazasini yaratish va jadvallarni o'rnatish"""
+    """Ma'lumotlar bazasini yaratish va migratsiyalarni qo'llash"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Foydalanuvchilar jadvali
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                api_key TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_blocked INTEGER DEFAULT 0
-            )
-        """)
-        
-        # last_activity ustunini qo'shish (agar mavjud bo'lmasa)
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-        except:
-            pass  # Ustun allaqachon mavjud
-        
-        # is_blocked ustunini qo'shish (agar mavjud bo'lmasa)
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER DEFAULT 0")
-        except:
-            pass  # Ustun allaqachon mavjud
-        
-        # Admin foydalanuvchilar jadvali
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin_users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                full_name TEXT,
-                added_date TEXT,
-                permissions TEXT DEFAULT 'ALL'
-            )
-            """)
-        
-        # Xabar yuborish tarixi
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                admin_id INTEGER,
-                message_text TEXT,
-                sent_date TEXT,
-                success_count INTEGER,
-                failed_count INTEGER,
-                total_count INTEGER
-            )
-        """)
-        
-        # Foydalanuvchi harakatlari
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action_type TEXT,
-                action_data TEXT,
-                action_date TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-        logger.info("Ma'lumotlar bazasi muvaffaqiyatli yaratildi")
-        
+        version = apply_migrations()
+        logger.info(f"Ma'lumotlar bazasi muvaffaqiyatli yaratildi (sxema versiyasi: {version})")
+    
     except Exception as e:
         logger.error(f"Ma'lumotlar bazasini yaratishda xatolik: {e}")
         raise
 
-def save_user_api_key(user_id: int, api_key: str, username: Optional[str] = None, 
+def save_user_api_key(user_id: int, api_key: str, username: Optional[str] = None,
                      first_name: Optional[str] = None, last_name: Optional[str] = None):
     """Foydalanuvchi API kalitini saqlash"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Foydalanuvchi mavjudligini tekshirish
-        cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-        exists = cursor.fetchone()
-        
-        if exists:
-            # Mavjud foydalanuvchini yangilash
-            cursor.execute("""
-                UPDATE users 
-                SET api_key = ?, username = ?, first_name = ?, last_name = ?, 
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (api_key, username, first_name, last_name, user_id))
-        else:
-            # Yangi foydalanuvchi qo'shish
-            cursor.execute("""
-                INSERT INTO users (user_id, username, first_name, last_name, api_key)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, username, first_name, last_name, api_key))
-        
-        conn.commit()
-        conn.close()
+        with transaction() as cursor:
+            # Foydalanuvchi mavjudligini tekshirish
+            cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
+            exists = cursor.fetchone()
+            
+            if exists:
+                # Mavjud foydalanuvchini yangilash
+                cursor.execute("""
+                    UPDATE users
+                    SET api_key = ?, username = ?, first_name = ?, last_name = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = ?
+                """, (api_key, username, first_name, last_name, user_id))
+            else:
+                # Yangi foydalanuvchi qo'shish
+                cursor.execute("""
+                    INSERT INTO users (user_id, username, first_name, last_name, api_key)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (user_id, username, first_name, last_name, api_key))
+        
+        invalidate_user_cache(user_id)
         logger.info(f"Foydalanuvchi {user_id} uchun API kalit saqlandi")
         return True
-        
+    
     except Exception as e:
         logger.error(f"API kalitni saqlashda xatolik: {e}")
         return False
@@ -125,18 +84,12 @@ def save_user_api_key(user_id: int, api_key: str, username: Optional[str] = None
 def get_user_api_key(user_id: int) -> Optional[str]:
     """Foydalanuvchi API kalitini olish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT api_key FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        
-        conn.close()
+        record = _get_user_record(user_id)
         
-        if result:
-            return result[0]
+        if record:
+            return record['api_key']
         return None
-        
+    
     except Exception as e:
         logger.error(f"API kalitni olishda xatolik: {e}")
         return None
@@ -144,18 +97,12 @@ def get_user_api_key(user_id: int) -> Optional[str]:
 def is_user_blocked(user_id: int) -> bool:
     """Foydalanuvchi bloklangan ekanligini tekshirish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT is_blocked FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
+        record = _get_user_record(user_id)
         
-        conn.close()
-        
-        if result and result[0]:
+        if record and record['is_blocked']:
             return True
         return False
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchi bloklangan ekanligini tekshirishda xatolik: {e}")
         return False
@@ -163,102 +110,88 @@ def is_user_blocked(user_id: int) -> bool:
 def delete_user_api_key(user_id: int) -> bool:
     """Foydalanuvchi API kalitini o'chirish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        with transaction() as cursor:
+            cursor.execute("UPDATE users SET api_key = NULL WHERE user_id = ?", (user_id,))
         
-        cursor.execute("UPDATE users SET api_key = NULL WHERE user_id = ?", (user_id,))
-        
-        conn.commit()
-        conn.close()
+        invalidate_user_cache(user_id)
         logger.info(f"Foydalanuvchi {user_id} uchun API kalit o'chirildi")
         return True
-        
+    
     except Exception as e:
         logger.error(f"API kalitni o'chirishda xatolik: {e}")
         return False
 
+def is_api_key_in_use(api_key: str) -> bool:
+    """Kalit hali biror foydalanuvchida saqlanganmi (bir kalitni bir nechta foydalanuvchi ishlatishi mumkin)"""
+    try:
+        with read_cursor() as cursor:
+            cursor.execute("SELECT 1 FROM users WHERE api_key = ? LIMIT 1", (api_key,))
+            return cursor.fetchone() is not None
+    
+    except Exception as e:
+        logger.error(f"API kalit foydalanilishini tekshirishda xatolik: {e}")
+        # Aniq bo'lmasa umumiy ma'lumotlar o'chirilmaydi
+        return True
+
 def user_exists(user_id: int) -> bool:
     """Foydalanuvchi mavjudligini tekshirish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        with read_cursor() as cursor:
+            cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
+            result = cursor.fetchone()
         
-        cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        
-        conn.close()
         return result is not None
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchi mavjudligini tekshirishda xatolik: {e}")
         return False
 
 def update_user_activity(user_id: int):
-    """Foydalanuvchi faolligini yangilash"""
+    """Foydalanuvchi faolligini yangilash (fon oqimida to'plab yoziladi)"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # last_activity ustunini tekshirish
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'last_activity' not in columns:
-            # Ustun yo'q bo'lsa qo'shish
-            cursor.execute("ALTER TABLE users ADD COLUMN last_activity TEXT")
-            conn.commit()
-        
-        cursor.execute("""
-            UPDATE users 
-            SET last_activity = ? 
-            WHERE user_id = ?
-        """, (datetime.now().isoformat(), user_id))
-        
-        conn.commit()
-        conn.close()
+        activity_recorder.record(user_id)
         return True
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchi faolligini yangilashda xatolik: {e}")
         return False
 
-def get_user_stats():
+def get_user_stats(db_path: str = DATABASE_FILE):
     """Foydalanuvchilar statistikasini olish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        # Umumiy foydalanuvchilar soni
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        # Faol foydalanuvchilar (son 7 kunda)
-        try:
-            cursor.execute("""
-                SELECT COUNT(*) FROM users 
-                WHERE last_activity > datetime('now', '-7 days')
-            """)
-            active_users = cursor.fetchone()[0]
-        except:
-            active_users = 0  # last_activity ustuni yo'q bo'lsa
-        
-        # Bloklangan foydalanuvchilar
-        cursor.execute("SELECT COUNT(*) FROM users WHERE is_blocked = 1")
-        blocked_users = cursor.fetchone()[0]
-        
-        # API kalitlari soni
-        cursor.execute("SELECT COUNT(*) FROM users WHERE api_key IS NOT NULL AND api_key != ''")
-        api_users = cursor.fetchone()[0]
-        
-        conn.close()
+        active_since = (datetime.now() - timedelta(days=STATS_CONFIG["active_days"])).isoformat()
+        
+        with read_cursor(db_path) as cursor:
+            counters = None
+            if STATS_CONFIG["use_counters"]:
+                # Triggerlar orqali yangilanadigan hisoblagichlar - O(1)
+                cursor.execute("SELECT total_users, blocked_users, api_users FROM user_counters WHERE id = 1")
+                counters = cursor.fetchone()
+            
+            if counters:
+                total_users, blocked_users, api_users = counters
+                
+                # Faol foydalanuvchilar - idx_users_last_activity bo'yicha oraliq
+                cursor.execute("SELECT COUNT(*) FROM users WHERE last_activity > ?", (active_since,))
+                active_users = cursor.fetchone()[0]
+            else:
+                # Bitta o'tishda barcha hisoblar
+                cursor.execute("""
+                    SELECT COUNT(*),
+                           SUM(CASE WHEN last_activity > ? THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN is_blocked = 1 THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN api_key IS NOT NULL AND api_key != '' THEN 1 ELSE 0 END)
+                    FROM users
+                """, (active_since,))
+                total_users, active_users, blocked_users, api_users = cursor.fetchone()
         
         return {
-            'total_users': total_users,
-            'active_users': active_users,
-            'blocked_users': blocked_users,
-            'api_users': api_users
+            'total_users': total_users or 0,
+            'active_users': active_users or 0,
+            'blocked_users': blocked_users or 0,
+            'api_users': api_users or 0
         }
-        
+    
     except Exception as e:
         logger.error(f"Statistikani olishda xatolik: {e}")
         return {}
@@ -266,19 +199,18 @@ def get_user_stats():
 def get_all_users(limit: int = 100):
     """Barcha foydalanuvchilarni olish"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT user_id, username, first_name, last_name, api_key, is_blocked, 
-                   created_at
-            FROM users 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        """, (limit,))
+        with read_cursor() as cursor:
+            cursor.execute("""
+                SELECT user_id, username, first_name, last_name, api_key, is_blocked,
+                       created_at
+                FROM users
+                ORDER BY created_at DESC
+                LIMIT ?
+            """, (limit,))
+            rows = cursor.fetchall()
         
         users = []
-        for row in cursor.fetchall():
+        for row in rows:
             users.append({
                 'user_id': row[0],
                 'username': row[1],
@@ -290,25 +222,42 @@ def get_all_users(limit: int = 100):
                 'created_at': row[6] if len(row) > 6 else row[5]
             })
         
-        conn.close()
         return users
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchilarni olishda xatolik: {e}")
         return []
 
+def get_api_key_users(active_since: Optional[str] = None) -> list:
+    """API kalit saqlagan (bloklanmagan) foydalanuvchilar: [(user_id, api_key), ...]"""
+    try:
+        with read_cursor() as cursor:
+            if active_since:
+                # idx_users_last_activity bo'yicha oraliq
+                cursor.execute("""
+                    SELECT user_id, api_key FROM users
+                    WHERE last_activity > ? AND api_key IS NOT NULL AND api_key != '' AND is_blocked = 0
+                """, (active_since,))
+            else:
+                cursor.execute("""
+                    SELECT user_id, api_key FROM users
+                    WHERE api_key IS NOT NULL AND api_key != '' AND is_blocked = 0
+                """)
+            return cursor.fetchall()
+    
+    except Exception as e:
+        logger.error(f"API kalitli foydalanuvchilarni olishda xatolik: {e}")
+        return []
+
 def block_user(user_id: int) -> bool:
     """Foydalanuvchini bloklash"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("UPDATE users SET is_blocked = 1 WHERE user_id = ?", (user_id,))
+        with transaction() as cursor:
+            cursor.execute("UPDATE users SET is_blocked = 1 WHERE user_id = ?", (user_id,))
         
-        conn.commit()
-        conn.close()
+        invalidate_user_cache(user_id)
         return True
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchini bloklashda xatolik: {e}")
         return False
@@ -316,37 +265,195 @@ def block_user(user_id: int) -> bool:
 def unblock_user(user_id: int) -> bool:
     """Foydalanuvchining blokini olib tashlash"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute("UPDATE users SET is_blocked = 0 WHERE user_id = ?", (user_id,))
+        with transaction() as cursor:
+            cursor.execute("UPDATE users SET is_blocked = 0 WHERE user_id = ?", (user_id,))
         
-        conn.commit()
-        conn.close()
+        invalidate_user_cache(user_id)
         return True
-        
+    
     except Exception as e:
         logger.error(f"Foydalanuvchining blokini olib tashlashda xatolik: {e}")
         return False
 
-def save_broadcast_history(admin_id: int, message_text: str, success_count: int, 
+def save_broadcast_history(admin_id: int, message_text: str, success_count: int,
                           failed_count: int, total_count: int):
     """Xabar yuborish tarixini saqlash"""
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        with transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO broadcast_history
+                (admin_id, message_text, sent_date, success_count, failed_count, total_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (admin_id, message_text, datetime.now().isoformat(),
+                  success_count, failed_count, total_count))
+        
+        return True
+    
+    except Exception as e:
+        logger.error(f"Xabar yuborish tarixini saqlashda xatolik: {e}")
+        return False
+
+def create_broadcast_job(admin_id: int, message_text: str) -> Optional[int]:
+    """Yuborish vazifasini yaratish - qabul qiluvchilar ro'yxati shu paytdagi holatda yoziladi"""
+    try:
+        with transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO broadcast_jobs (admin_id, message_text, status, created_at)
+                VALUES (?, ?, 'pending', ?)
+            """, (admin_id, message_text, datetime.now().isoformat()))
+            job_id = cursor.lastrowid
+            
+            # Ro'yxat xotiraga yuklanmaydi - to'g'ridan-to'g'ri SQL ichida ko'chiriladi
+            cursor.execute("""
+                INSERT INTO broadcast_recipients (job_id, user_id, status)
+                SELECT ?, user_id, 'pending' FROM users WHERE is_blocked = 0
+            """, (job_id,))
+            cursor.execute(
+                "UPDATE broadcast_jobs SET total_count = ? WHERE id = ?",
+                (cursor.rowcount, job_id)
+            )
+        
+        return job_id
+    
+    except Exception as e:
+        logger.error(f"Yuborish vazifasini yaratishda xatolik: {e}")
+        return None
+
+def get_broadcast_job(job_id: int) -> Optional[dict]:
+    """Yuborish vazifasini olish"""
+    try:
+        with read_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, admin_id, message_text, status, total_count, status_message_id
+                FROM broadcast_jobs WHERE id = ?
+            """, (job_id,))
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            'id': row[0],
+            'admin_id': row[1],
+            'message_text': row[2],
+            'status': row[3],
+            'total_count': row[4],
+            'status_message_id': row[5]
+        }
+    
+    except Exception as e:
+        logger.error(f"Yuborish vazifasini olishda xatolik: {e}")
+        return None
+
+def get_unfinished_broadcast_jobs() -> list:
+    """Tugallanmagan vazifalar ID lari (qayta ishga tushirishdan keyin davom ettirish uchun)"""
+    try:
+        with read_cursor() as cursor:
+            cursor.execute("SELECT id FROM broadcast_jobs WHERE status != 'done' ORDER BY id")
+            return [row[0] for row in cursor.fetchall()]
+    
+    except Exception as e:
+        logger.error(f"Tugallanmagan vazifalarni olishda xatolik: {e}")
+        return []
+
+def start_broadcast_job(job_id: int, status_message_id: Optional[int] = None):
+    """Vazifani ishlayotgan deb belgilash"""
+    try:
+        with transaction() as cursor:
+            # Oldingi ishga tushirishda yuborilayotgan bo'lib qolganlar qayta yuborilmaydi
+            cursor.execute("""
+                UPDATE broadcast_recipients SET status = 'failed'
+                WHERE job_id = ? AND status = 'sending'
+            """, (job_id,))
+            cursor.execute("""
+                UPDATE broadcast_jobs
+                SET status = 'running', status_message_id = COALESCE(?, status_message_id)
+                WHERE id = ?
+            """, (status_message_id, job_id))
         
-        cursor.execute("""
-            INSERT INTO broadcast_history 
-            (admin_id, message_text, sent_date, success_count, failed_count, total_count)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (admin_id, message_text, datetime.now().isoformat(), 
-              success_count, failed_count, total_count))
+        return True
+    
+    except Exception as e:
+        logger.error(f"Vazifani boshlashda xatolik: {e}")
+        return False
+
+def claim_broadcast_recipients(job_id: int, chunk_size: int = 100):
+    """Kutilayotgan qabul qiluvchilarni bo'laklab olish (keyset) va 'sending' deb belgilash"""
+    last_id = -1
+    while True:
+        with transaction() as cursor:
+            cursor.execute("""
+                SELECT user_id FROM broadcast_recipients
+                WHERE job_id = ? AND status = 'pending' AND user_id > ?
+                ORDER BY user_id LIMIT ?
+            """, (job_id, last_id, chunk_size))
+            user_ids = [row[0] for row in cursor.fetchall()]
+            
+            if user_ids:
+                cursor.execute("""
+                    UPDATE broadcast_recipients SET status = 'sending'
+                    WHERE job_id = ? AND status = 'pending' AND user_id BETWEEN ? AND ?
+                """, (job_id, user_ids[0], user_ids[-1]))
+        
+        handed_out = 0
+        try:
+            for user_id in user_ids:
+                yield user_id
+                handed_out += 1
+        except GeneratorExit:
+            # Yuborish to'xtatildi - hali berilmaganlar navbatga qaytariladi
+            mark_broadcast_recipients(
+                job_id, [(user_id, 'pending') for user_id in user_ids[handed_out + 1:]]
+            )
+            raise
+        
+        if len(user_ids) < chunk_size:
+            return
+        last_id = user_ids[-1]
+
+def mark_broadcast_recipients(job_id: int, results: list):
+    """Yuborish natijalarini bitta tranzaksiyada yozish: [(user_id, status), ...]"""
+    if not results:
+        return True
+    
+    try:
+        with transaction() as cursor:
+            cursor.executemany(
+                "UPDATE broadcast_recipients SET status = ? WHERE job_id = ? AND user_id = ?",
+                [(status, job_id, user_id) for user_id, status in results]
+            )
         
-        conn.commit()
-        conn.close()
         return True
+    
+    except Exception as e:
+        logger.error(f"Yuborish natijalarini saqlashda xatolik: {e}")
+        return False
+
+def get_broadcast_job_counts(job_id: int) -> dict:
+    """Vazifa bo'yicha holatlar soni: {'sent': .., 'failed': .., ...}"""
+    try:
+        with read_cursor() as cursor:
+            cursor.execute("""
+                SELECT status, COUNT(*) FROM broadcast_recipients
+                WHERE job_id = ? GROUP BY status
+            """, (job_id,))
+            return dict(cursor.fetchall())
+    
+    except Exception as e:
+        logger.error(f"Vazifa natijalarini olishda xatolik: {e}")
+        return {}
+
+def finish_broadcast_job(job_id: int):
+    """Vazifani tugallangan deb belgilash"""
+    try:
+        with transaction() as cursor:
+            cursor.execute("""
+                UPDATE broadcast_jobs SET status = 'done', finished_at = ?
+                WHERE id = ?
+            """, (datetime.now().isoformat(), job_id))
         
+        return True
+    
     except Exception as e:
-        logger.error(f"Xabar yuborish tarixini saqlashda xatolik: {e}")
+        logger.error(f"Vazifani tugatishda xatolik: {e}")
         return False
@@ -0,0 +1,117 @@
+"""
+SQLite ulanishlar boshqaruvi
+Har bir oqim uchun uzoq yashaydigan ulanish, WAL rejimi va tranzaksiyalar
+"""
+
+import atexit
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from config import DATABASE_FILE, DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Har bir oqimning o'z ulanishlari (db_path -> ulanish)
+_local = threading.local()
+
+# Yopish uchun barcha ochilgan ulanishlar ro'yxati (egasi bo'lgan oqim bilan)
+_all_connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+_all_connections_lock = threading.Lock()
+
+# close_all_connections() dan keyin eski ulanishlarni tashlab yuborish uchun
+_generation = 0
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Ulanish uchun pragmalarni o'rnatish"""
+    synchronous = str(DB_CONFIG["synchronous"]).upper()
+    if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        synchronous = "NORMAL"
+    
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(DB_CONFIG['busy_timeout_ms'])}")
+    cursor.execute(f"PRAGMA cache_size={int(DB_CONFIG['cache_size'])}")
+    cursor.execute(f"PRAGMA mmap_size={int(DB_CONFIG['mmap_size'])}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def get_connection(db_path: str = DATABASE_FILE) -> sqlite3.Connection:
+    """Joriy oqim uchun ulanishni olish (kerak bo'lsa yaratish)"""
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None or getattr(_local, "generation", None) != _generation:
+        connections = {}
+        _local.connections = connections
+        _local.generation = _generation
+    
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            timeout=DB_CONFIG["busy_timeout_ms"] / 1000,
+            isolation_level=None,  # Tranzaksiyalarni transaction() boshqaradi
+            check_same_thread=False
+        )
+        _configure_connection(conn)
+        connections[db_path] = conn
+        _register_connection(conn)
+        logger.debug(f"Yangi SQLite ulanishi ochildi: {db_path} ({threading.current_thread().name})")
+    return conn
+
+def _register_connection(conn: sqlite3.Connection):
+    """Ulanishni ro'yxatga olish va tugagan oqimlarning ulanishlarini yopish"""
+    with _all_connections_lock:
+        dead = [c for thread, c in _all_connections if not thread.is_alive()]
+        _all_connections[:] = [(t, c) for t, c in _all_connections if t.is_alive()]
+        _all_connections.append((threading.current_thread(), conn))
+    
+    for c in dead:
+        try:
+            c.close()
+        except Exception as e:
+            logger.error(f"SQLite ulanishini yopishda xatolik: {e}")
+
+@contextmanager
+def transaction(db_path: str = DATABASE_FILE, immediate: bool = True):
+    """Yozish tranzaksiyasi: muvaffaqiyatda COMMIT, xatolikda ROLLBACK"""
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        # Ichma-ich chaqiruv - tashqi tranzaksiya davom etadi
+        yield conn.cursor()
+        return
+    
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn.cursor()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+@contextmanager
+def read_cursor(db_path: str = DATABASE_FILE):
+    """O'qish uchun kursor (autocommit rejimida)"""
+    cursor = get_connection(db_path).cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+def close_all_connections():
+    """Barcha oqimlardagi ulanishlarni yopish (to'xtash paytida)"""
+    global _generation
+    with _all_connections_lock:
+        connections = [conn for _, conn in _all_connections]
+        _all_connections.clear()
+        _generation += 1
+    
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.error(f"SQLite ulanishini yopishda xatolik: {e}")
+
+atexit.register(close_all_connections)
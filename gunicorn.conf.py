@@ -0,0 +1,10 @@
+"""
+Gunicorn sozlamalari
+Har bir worker ishga tushishi bilan bot va yetakchilik ijarasi uchun kurash boshlanadi -
+yetakchi worker o'lsa, tirik qolgan yoki qayta tug'ilgan worker uning o'rnini egallaydi
+"""
+
+def post_worker_init(worker):
+    """Ilova workerda yuklangandan keyin botni ishga tushirish"""
+    from main import autostart_bot
+    autostart_bot()
@@ -0,0 +1,235 @@
+"""
+Uzum API uchun umumiy HTTP transport
+Barcha MarketplaceAPIClient obyektlari bitta ulanishlar hovuzidan foydalanadi
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import functools
+import concurrent.futures
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import API_HEADERS, HTTP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[requests.Session] = None
+# Byudjetli so'rovlar uchun: qayta urinishlarni urllib3 emas, mijozning o'zi byudjetga qarab bajaradi
+_plain_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# Byudjetli sinxron so'rovlar shu yerda bajariladi, chaqiruvchi esa faqat qolgan vaqtcha kutadi
+_budget_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=HTTP_CONFIG["pool_maxsize"], thread_name_prefix="http-budget"
+)
+
+# aiohttp sessiyasi event loop ga bog'langan, shuning uchun loop bilan birga saqlanadi
+_async_session: Optional[aiohttp.ClientSession] = None
+_async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Qayta urinish qoidalari (sinxron Retry bilan bir xil)
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+RETRY_METHODS = frozenset(["GET", "HEAD"])
+
+class BudgetExhausted(Exception):
+    """Handler uchun ajratilgan vaqt tugadi - yangi so'rov yuborilmaydi"""
+
+class LatencyBudget:
+    """Bitta handler uchun umumiy vaqt chegarasi"""
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.exhausted = False  # Kamida bitta so'rov vaqt yetmagani uchun bajarilmadi
+    
+    def remaining(self) -> float:
+        """Qolgan vaqt (soniya)"""
+        return max(0.0, self.deadline - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        return self.exhausted or self.remaining() <= 0
+
+# Joriy handler byudjeti (oqim va asyncio vazifalari uchun alohida)
+_current_budget: ContextVar[Optional[LatencyBudget]] = ContextVar("latency_budget", default=None)
+
+@contextmanager
+def latency_budget(seconds: Optional[float] = None):
+    """Blok ichidagi barcha API so'rovlari uchun umumiy vaqt chegarasi"""
+    budget = LatencyBudget(HTTP_CONFIG["handler_budget"] if seconds is None else seconds)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+def with_latency_budget(func):
+    """Handler funksiyasini latency_budget() ichida bajarish uchun dekorator (sinxron va async)"""
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with latency_budget():
+                return await func(*args, **kwargs)
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with latency_budget():
+            return func(*args, **kwargs)
+    return wrapper
+
+def current_budget() -> Optional[LatencyBudget]:
+    """Joriy byudjetni olish (handler tashqarisida None)"""
+    return _current_budget.get()
+
+def budget_expired() -> bool:
+    """Joriy handler vaqti tugaganmi"""
+    budget = _current_budget.get()
+    return budget is not None and budget.expired
+
+def request_timeout() -> Tuple[float, float]:
+    """So'rov uchun (connect, read) timeout - joriy byudjetdan oshmaydi"""
+    connect_timeout = HTTP_CONFIG["connect_timeout"]
+    read_timeout = HTTP_CONFIG["read_timeout"]
+    
+    budget = _current_budget.get()
+    if budget is None:
+        return connect_timeout, read_timeout
+    
+    remaining = budget.remaining()
+    if remaining <= 0:
+        budget.exhausted = True
+        raise BudgetExhausted(f"Handler vaqti tugadi ({budget.seconds} s)")
+    return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+def retry_allowed(delay: float) -> bool:
+    """Qayta urinishdan oldingi kutish joriy byudjetga sig'adimi"""
+    budget = _current_budget.get()
+    return budget is None or delay < budget.remaining()
+
+def call_within_budget(func, budget: LatencyBudget):
+    """Sinxron so'rovni qolgan vaqt ichida kutish - sekin kelayotgan javob ham byudjetdan oshmaydi"""
+    future = _budget_executor.submit(func)
+    try:
+        return future.result(timeout=budget.remaining())
+    except concurrent.futures.TimeoutError:
+        budget.exhausted = True
+        raise requests.exceptions.Timeout(f"Handler vaqti tugadi ({budget.seconds} s)")
+
+def _build_retry() -> Retry:
+    """429/5xx javoblari uchun cheklangan qayta urinish (faqat xavfsiz GET so'rovlar)"""
+    return Retry(
+        total=HTTP_CONFIG["max_retries"],
+        connect=HTTP_CONFIG["max_retries"],
+        read=HTTP_CONFIG["max_retries"],
+        status=HTTP_CONFIG["max_retries"],
+        backoff_factor=HTTP_CONFIG["backoff_factor"],
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+def _build_session(retries: bool = True) -> requests.Session:
+    """Ulanishlar hovuzi bilan sessiya yaratish"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_CONFIG["pool_connections"],
+        pool_maxsize=HTTP_CONFIG["pool_maxsize"],
+        max_retries=_build_retry() if retries else 0,
+        pool_block=False
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    # Umumiy sarlavhalar; Authorization har bir so'rovda alohida beriladi
+    session.headers.update(API_HEADERS)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+def get_session(retries: bool = True) -> requests.Session:
+    """Jarayon bo'yicha yagona sessiyani olish (retries=False - urllib3 qayta urinishlarisiz)"""
+    global _session, _plain_session
+    if not retries:
+        if _plain_session is None:
+            with _session_lock:
+                if _plain_session is None:
+                    _plain_session = _build_session(retries=False)
+        return _plain_session
+    
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+                logger.info(
+                    f"HTTP transport yaratildi (pool_maxsize={HTTP_CONFIG['pool_maxsize']}, "
+                    f"max_retries={HTTP_CONFIG['max_retries']})"
+                )
+    return _session
+
+def close_session():
+    """Sessiyani yopish (to'xtash paytida)"""
+    global _session, _plain_session
+    with _session_lock:
+        for session in (_session, _plain_session):
+            if session is not None:
+                session.close()
+        _session = _plain_session = None
+
+def encode_params(params: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """So'rov parametrlarini requests kabi kodlash (ro'yxat - takrorlangan kalit, None - tashlab ketiladi)"""
+    encoded = []
+    for key, value in (params or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if item is not None:
+                encoded.append((key, str(item)))
+    return encoded
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Qayta urinishdan oldingi kutish vaqti (Retry-After yoki eksponensial backoff)"""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    
+    # urllib3 kabi: birinchi qayta urinish darhol, keyin backoff_factor * 2^(n-1)
+    if attempt <= 1:
+        return 0.0
+    return HTTP_CONFIG["backoff_factor"] * (2 ** (attempt - 1))
+
+async def get_async_session() -> aiohttp.ClientSession:
+    """Joriy event loop uchun yagona aiohttp sessiyasini olish"""
+    global _async_session, _async_session_loop
+    loop = asyncio.get_running_loop()
+    
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_CONFIG["pool_maxsize"],
+            limit_per_host=HTTP_CONFIG["pool_maxsize"],
+            keepalive_timeout=30
+        )
+        _async_session = aiohttp.ClientSession(connector=connector, headers=API_HEADERS)
+        _async_session_loop = loop
+        logger.info(f"Async HTTP transport yaratildi (limit={HTTP_CONFIG['pool_maxsize']})")
+    
+    return _async_session
+
+async def close_async_session():
+    """aiohttp sessiyasini yopish (to'xtash paytida)"""
+    global _async_session, _async_session_loop
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+    _async_session_loop = None
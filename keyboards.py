@@ -70,6 +70,10 @@ def get_fbs_menu_keyboard():
         InlineKeyboardButton("📊 Yo'qolgan tovarlar statistikasi", callback_data="fbs_missing_statistics")
     )
     
+    keyboard.add(
+        InlineKeyboardButton("⚠️ Qoldiq ogohlantirishlari", callback_data="stock_alerts")
+    )
+    
     keyboard.add(
         InlineKeyboardButton("🔙 Orqaga", callback_data="main_menu")
     )
@@ -232,6 +236,14 @@ def get_back_to_main_keyboard():
     )
     return keyboard
 
+def get_new_orders_keyboard():
+    """Yangi buyurtma xabari klaviaturasi"""
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(
+        InlineKeyboardButton("📋 Buyurtmalarni ko'rish", callback_data="fbs_orders")
+    )
+    return keyboard
+
 def get_pagination_keyboard(current_page: int, total_pages: int, prefix: str):
     """Sahifalash klaviaturasi"""
     keyboard = InlineKeyboardMarkup(row_width=3)
@@ -257,3 +269,19 @@ def get_pagination_keyboard(current_page: int, total_pages: int, prefix: str):
     )
     
     return keyboard
+
+def get_orders_list_keyboard(orders: list, current_page: int, total_pages: int):
+    """Buyurtmalar ro'yxati klaviaturasi - har bir buyurtma tafsilotlari va sahifalash"""
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    
+    buttons = [
+        InlineKeyboardButton(f"📋 #{order['id']}", callback_data=f"order_details_{order['id']}")
+        for order in orders if order.get('id')
+    ]
+    if buttons:
+        keyboard.add(*buttons)
+    
+    # Sahifalash va orqaga tugmalari
+    keyboard.keyboard.extend(get_pagination_keyboard(current_page, total_pages, "fbs_orders").keyboard)
+    
+    return keyboard
@@ -0,0 +1,96 @@
+"""
+Yetakchi tanlash
+Bir nechta gunicorn worker yoki nusxa orasida faqat bittasi polling va fon vazifalarini bajaradi
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from config import DATABASE_FILE, LEADER_CONFIG
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """SQLite dagi muddatli ijara - egasi uni muntazam yangilab turadi, to'xtasa boshqasi oladi"""
+    
+    def __init__(self, name: str, ttl: float = LEADER_CONFIG["ttl"], db_path: str = DATABASE_FILE):
+        self.name = name
+        self.ttl = ttl
+        self.db_path = db_path
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def try_acquire(self) -> bool:
+        """Ijarani olish yoki uzaytirish (bo'sh, muddati o'tgan yoki o'ziniki bo'lsa)"""
+        now = time.time()
+        try:
+            with transaction(self.db_path) as cursor:
+                cursor.execute("""
+                    INSERT INTO leader_leases (name, holder, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET
+                        holder = excluded.holder,
+                        expires_at = excluded.expires_at
+                    WHERE leader_leases.holder = excluded.holder OR leader_leases.expires_at < ?
+                """, (self.name, self.holder, now + self.ttl, now))
+                return cursor.rowcount > 0
+        
+        except Exception as e:
+            logger.error(f"Yetakchilik ijarasini olishda xatolik: {e}")
+            return False
+    
+    def release(self):
+        """Ijarani bo'shatish (faqat o'ziniki bo'lsa)"""
+        try:
+            with transaction(self.db_path) as cursor:
+                cursor.execute(
+                    "DELETE FROM leader_leases WHERE name = ? AND holder = ?",
+                    (self.name, self.holder)
+                )
+        
+        except Exception as e:
+            logger.error(f"Yetakchilik ijarasini bo'shatishda xatolik: {e}")
+    
+    def current_holder(self) -> Optional[str]:
+        """Hozirgi yetakchi (muddati o'tmagan bo'lsa)"""
+        with read_cursor(self.db_path) as cursor:
+            cursor.execute(
+                "SELECT holder FROM leader_leases WHERE name = ? AND expires_at >= ?",
+                (self.name, time.time())
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+async def run_as_leader(lease: LeaderLease, duty: Callable[[], Awaitable],
+                        renew_interval: float = LEADER_CONFIG["renew_interval"]):
+    """Ijara qo'lda bo'lgan vaqtda duty ni bajarish; yo'qotilsa to'xtatib, qayta kutish"""
+    # Ijara yozuvlari alohida oqimda - baza band bo'lganda event loop (va yetakchi vazifasi) to'xtab qolmaydi
+    while True:
+        if not await asyncio.to_thread(lease.try_acquire):
+            await asyncio.sleep(renew_interval)
+            continue
+        
+        logger.info(f"Yetakchi bo'ldik: {lease.name} ({lease.holder})")
+        task = asyncio.create_task(duty())
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=renew_interval)
+                if not task.done() and not await asyncio.to_thread(lease.try_acquire):
+                    logger.warning(f"Yetakchilik yo'qotildi: {lease.name}")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            # Boshqa nusxa kutmasdan egallashi uchun (faqat o'ziniki bo'lsa o'chiriladi)
+            await asyncio.to_thread(lease.release)
+        
+        if not task.cancelled() and task.exception():
+            logger.error(f"Yetakchi vazifasida xatolik: {task.exception()}")
+        await asyncio.sleep(renew_interval)
@@ -5,8 +5,10 @@ O'zbekiston bozori sotuvchilari uchun Telegram bot
 """
 
 import os
+import asyncio
 import logging
-from flask import Flask, jsonify
+import threading
+from flask import Flask, jsonify, request
 
 # Logging sozlamalari
 logging.basicConfig(
@@ -31,22 +33,26 @@ def test():
     """Oddiy test endpoint"""
     return jsonify({"status": "success", "message": "Test endpoint is working!"})
 
-@app.route('/start-bot')
-def start_bot():
-    """Botni ishga tushirish uchun endpoint"""
-    try:
-        logger.info("Start-bot endpoint chaqirildi")
+# Shu jarayonda ishga tushirilgan bot (bot, event loop, webhook dispatcher)
+_runtime = {}
+_runtime_lock = threading.Lock()
+
+def launch_bot():
+    """Botni yaratib, fon oqimida ishga tushirish - jarayon uchun bir marta"""
+    with _runtime_lock:
+        if _runtime:
+            return jsonify({"status": "success", "message": "Bot allaqachon ishga tushirilgan"})
         
         # Avval oddiy test - kutubxonalar ishlayotganini tekshirish
         try:
-            from config import BOT_TOKEN
+            from config import BOT_TOKEN, WEBHOOK_CONFIG
             logger.info("Config import muvaffaqiyatli")
         except Exception as e:
             logger.error(f"Config import xatosi: {e}")
             return jsonify({"status": "error", "message": f"Config xatosi: {str(e)}"}), 500
         
         try:
-            from telebot import TeleBot
+            from telebot.async_telebot import AsyncTeleBot
             from telebot.types import BotCommand
             logger.info("pyTelegramBotAPI import muvaffaqiyatli")
         except Exception as e:
@@ -66,7 +72,7 @@ def start_bot():
             from admin_panel import create_admin_panel
             
             # Bot obyektini yaratish
-            bot = TeleBot(BOT_TOKEN)
+            bot = AsyncTeleBot(BOT_TOKEN)
             logger.info("Bot muvaffaqiyatli yaratildi")
             
             # Bot buyruqlarini o'rnatish
@@ -77,7 +83,6 @@ def start_bot():
                 BotCommand("menu", "Asosiy menyu"),
                 BotCommand("status", "API holati")
             ]
-            bot.set_my_commands(commands)
             
             # Handlerlarni ro'yxatdan o'tkazish
             register_handlers(bot)
@@ -86,32 +91,136 @@ def start_bot():
             # Admin panelni yaratish
             admin_panel = create_admin_panel(bot)
             logger.info("Admin panel muvaffaqiyatli yaratildi")
-            
+        
         except Exception as e:
             logger.error(f"Bot yaratish xatosi: {e}")
             return jsonify({"status": "error", "message": f"Bot yaratish xatosi: {str(e)}"}), 500
         
         # Botni ishga tushirish
-        logger.info("Bot ishga tushmoqda...")
+        webhook_mode = WEBHOOK_CONFIG["mode"] == "webhook"
+        if webhook_mode and not WEBHOOK_CONFIG["url"]:
+            logger.error("Webhook rejimi uchun WEBHOOK_URL berilmagan")
+            return jsonify({"status": "error", "message": "WEBHOOK_URL berilmagan"}), 500
+        
+        logger.info(f"Bot ishga tushmoqda ({'webhook' if webhook_mode else 'polling'} rejimi)...")
+        
+        # Botni background da o'z event loop ida ishga tushirish
+        from http_transport import close_async_session
+        from webhook import UpdateDispatcher, webhook_secret, webhook_url
+        from leader import LeaderLease, run_as_leader
+        from order_sync import run_order_sync_worker
+        from order_notifier import run_order_notifier
+        from stock_watch import run_stock_watcher
+        
+        loop = asyncio.new_event_loop()
+        dispatcher = UpdateDispatcher(bot, loop) if webhook_mode else None
+        
+        async def leader_duties():
+            """Faqat yetakchi nusxa bajaradigan ishlar"""
+            await bot.set_my_commands(commands)
+            # Qayta ishga tushishdan oldin to'xtab qolgan xabar yuborishlar
+            admin_panel.resume_broadcasts()
+            
+            # Fon ishchilari yetakchilik tugaganda yangilanishlar bilan birga bekor qilinadi
+            await asyncio.gather(
+                serve_updates(),
+                run_order_sync_worker(),
+                run_order_notifier(bot),
+                run_stock_watcher(bot)
+            )
+        
+        async def serve_updates():
+            if webhook_mode:
+                await bot.set_webhook(
+                    url=webhook_url(),
+                    secret_token=webhook_secret(),
+                    max_connections=WEBHOOK_CONFIG["max_connections"]
+                )
+                # Ijarani ushlab turish uchun vazifa tugamaydi
+                await asyncio.Event().wait()
+            else:
+                # Webhook o'rnatilgan bo'lsa getUpdates ishlamaydi
+                await bot.remove_webhook()
+                await bot.infinity_polling(timeout=5, request_timeout=10)
+        
+        async def run_bot_loop():
+            try:
+                leadership = run_as_leader(LeaderLease("bot"), leader_duties)
+                if webhook_mode:
+                    # Webhook yangilanishlarini har bir worker qabul qiladi
+                    await asyncio.gather(dispatcher.run(), leadership)
+                else:
+                    # Yetakchi bo'lmagan workerlar faqat HTTP so'rovlarga xizmat qiladi
+                    await leadership
+            finally:
+                await close_async_session()
         
-        # Botni background da ishga tushirish
-        import threading
         def run_bot():
             try:
-                bot.infinity_polling(timeout=10, long_polling_timeout=5)
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(run_bot_loop())
             except Exception as e:
-                logger.error(f"Bot polling da xatolik: {e}")
+                logger.error(f"Bot ishlashida xatolik: {e}")
+            finally:
+                with _runtime_lock:
+                    _runtime.clear()
         
         bot_thread = threading.Thread(target=run_bot, daemon=True)
+        _runtime.update(bot=bot, loop=loop, dispatcher=dispatcher, thread=bot_thread)
         bot_thread.start()
         
         return jsonify({"status": "success", "message": "Bot muvaffaqiyatli ishga tushirildi"})
-        
+
+def autostart_bot():
+    """Worker ishga tushganda botni boshlash - har bir worker yetakchilik uchun darhol navbatga turadi"""
+    from config import LEADER_CONFIG
+    if not LEADER_CONFIG["autostart"]:
+        return
+    
+    # launch_bot Flask javobini qaytaradi - so'rovdan tashqarida ilova konteksti kerak
+    with app.app_context():
+        launch_bot()
+
+@app.route('/start-bot')
+def start_bot():
+    """Botni ishga tushirish uchun endpoint"""
+    try:
+        logger.info("Start-bot endpoint chaqirildi")
+        return launch_bot()
+    
     except Exception as e:
         logger.error(f"Umumiy xatolik: {e}")
         return jsonify({"status": "error", "message": f"Umumiy xatolik: {str(e)}"}), 500
 
+@app.route('/webhook/<secret>', methods=['POST'])
+def telegram_webhook(secret):
+    """Telegram yangilanishlarini qabul qilish - darhol javob qaytariladi"""
+    from config import WEBHOOK_CONFIG
+    from webhook import is_valid_secret
+    
+    if WEBHOOK_CONFIG["mode"] != "webhook":
+        return jsonify({"status": "error", "message": "Webhook rejimi yoqilmagan"}), 404
+    
+    if not is_valid_secret(secret, request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        return jsonify({"status": "error"}), 403
+    
+    # Har bir gunicorn worker o'z botini birinchi so'rovda ishga tushiradi
+    if not _runtime:
+        launch_bot()
+    dispatcher = _runtime.get('dispatcher')
+    
+    update_json = request.get_json(silent=True)
+    if not update_json:
+        return jsonify({"status": "error"}), 400
+    
+    # Navbat to'la bo'lsa Telegram yangilanishni keyinroq qayta yuboradi
+    if dispatcher is None or not dispatcher.submit(update_json):
+        return jsonify({"status": "busy"}), 503
+    
+    return '', 200
+
 if __name__ == "__main__":
     # Lokal da ishga tushirish uchun
     port = int(os.getenv('PORT', 8000))
+    autostart_bot()
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,318 @@
+"""
+Ma'lumotlar bazasi migratsiyalari
+Sxema versiyasi PRAGMA user_version da saqlanadi, har bir migratsiya bir marta bajariladi
+"""
+
+import logging
+from typing import Callable, List, Tuple
+from config import DATABASE_FILE
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+def _migration_001_base_tables(cursor):
+    """Asosiy jadvallar"""
+    # Foydalanuvchilar jadvali
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            api_key TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_blocked INTEGER DEFAULT 0
+        )
+    """)
+    
+    # Admin foydalanuvchilar jadvali
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS admin_users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            full_name TEXT,
+            added_date TEXT,
+            permissions TEXT DEFAULT 'ALL'
+        )
+    """)
+    
+    # Xabar yuborish tarixi
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER,
+            message_text TEXT,
+            sent_date TEXT,
+            success_count INTEGER,
+            failed_count INTEGER,
+            total_count INTEGER
+        )
+    """)
+    
+    # Foydalanuvchi harakatlari
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action_type TEXT,
+            action_data TEXT,
+            action_date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+
+def _migration_002_users_columns(cursor):
+    """users jadvaliga last_activity va is_blocked ustunlari (eski bazalar uchun)"""
+    cursor.execute("PRAGMA table_info(users)")
+    columns = {column[1] for column in cursor.fetchall()}
+    
+    if 'last_activity' not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN last_activity TEXT")
+    if 'is_blocked' not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER DEFAULT 0")
+
+def _migration_003_admin_permissions(cursor):
+    """admin_users.permissions bo'sh qolgan yozuvlarni to'ldirish"""
+    cursor.execute("UPDATE admin_users SET permissions = 'ALL' WHERE permissions IS NULL")
+
+def _migration_004_indexes(cursor):
+    """Tez-tez ishlatiladigan ustunlar uchun indekslar"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_is_blocked ON users (is_blocked)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_actions_user_date ON user_actions (user_id, action_date)")
+
+def _migration_005_user_counters(cursor):
+    """users jadvali uchun materiallashtirilgan hisoblagichlar va triggerlar"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_users INTEGER NOT NULL DEFAULT 0,
+            blocked_users INTEGER NOT NULL DEFAULT 0,
+            api_users INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Joriy qiymatlar bilan to'ldirish
+    cursor.execute("""
+        INSERT OR REPLACE INTO user_counters (id, total_users, blocked_users, api_users)
+        SELECT 1,
+               COUNT(*),
+               COALESCE(SUM(CASE WHEN is_blocked = 1 THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN api_key IS NOT NULL AND api_key != '' THEN 1 ELSE 0 END), 0)
+        FROM users
+    """)
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE user_counters SET
+                total_users = total_users + 1,
+                blocked_users = blocked_users + (NEW.is_blocked = 1),
+                api_users = api_users + (NEW.api_key IS NOT NULL AND NEW.api_key != '')
+            WHERE id = 1;
+        END
+    """)
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE user_counters SET
+                total_users = total_users - 1,
+                blocked_users = blocked_users - (OLD.is_blocked = 1),
+                api_users = api_users - (OLD.api_key IS NOT NULL AND OLD.api_key != '')
+            WHERE id = 1;
+        END
+    """)
+    
+    # last_activity yangilanishlari triggerni ishga tushirmaydi
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_update AFTER UPDATE OF is_blocked, api_key ON users
+        BEGIN
+            UPDATE user_counters SET
+                blocked_users = blocked_users + (NEW.is_blocked = 1) - (OLD.is_blocked = 1),
+                api_users = api_users
+                    + (NEW.api_key IS NOT NULL AND NEW.api_key != '')
+                    - (OLD.api_key IS NOT NULL AND OLD.api_key != '')
+            WHERE id = 1;
+        END
+    """)
+
+def _migration_006_broadcast_jobs(cursor):
+    """Ommaviy xabar yuborish vazifalari va har bir qabul qiluvchining holati"""
+    # status: pending -> running -> done
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER,
+            message_text TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            total_count INTEGER NOT NULL DEFAULT 0,
+            status_message_id INTEGER,
+            created_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    
+    # status: pending -> sending -> sent / failed / blocked
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            PRIMARY KEY (job_id, user_id)
+        ) WITHOUT ROWID
+    """)
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs (status)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status
+        ON broadcast_recipients (job_id, status, user_id)
+    """)
+
+def _migration_007_user_states(cursor):
+    """Suhbat holatlari (state_store.SQLiteStateStore)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_states (
+            user_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL,
+            data TEXT,
+            expires_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_states_expires_at ON user_states (expires_at)")
+
+def _migration_008_leader_leases(cursor):
+    """Yetakchilik ijaralari (leader.LeaderLease)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leader_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+def _migration_009_fbs_orders(cursor):
+    """FBS buyurtmalarining mahalliy nusxasi va sinxronlash holati (order_sync.py)"""
+    # account - API kalit xeshi, data - buyurtmaning to'liq JSON ko'rinishi
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fbs_orders (
+            account TEXT NOT NULL,
+            order_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            date_created INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY (account, order_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fbs_orders_status
+        ON fbs_orders (account, status, date_created DESC)
+    """)
+    
+    # watermark - shu statusda ko'rilgan eng yangi buyurtma sanasi (ms)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fbs_order_sync (
+            account TEXT NOT NULL,
+            status TEXT NOT NULL,
+            watermark INTEGER NOT NULL DEFAULT 0,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (account, status)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_010_stock_watch(cursor):
+    """Qoldiqlarning oxirgi holati va SKU chegaralari (stock_watch.py)"""
+    # Ustunlar - zlib bilan siqilgan massivlar (SKU ID bo'yicha tartiblangan)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            account TEXT PRIMARY KEY,
+            sku_ids BLOB NOT NULL,
+            available BLOB NOT NULL,
+            reserved BLOB NOT NULL,
+            taken_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_thresholds (
+            account TEXT NOT NULL,
+            sku_id INTEGER NOT NULL,
+            threshold INTEGER NOT NULL,
+            PRIMARY KEY (account, sku_id)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_011_order_sync_resume(cursor):
+    """Sahifalar chegarasida to'xtagan buyurtmalar sinxronlashini davom ettirish holati"""
+    # next_page - davom etiladigan sahifa (0 - yangi o'tish), pass_newest va pass_started - joriy o'tish holati
+    cursor.execute("ALTER TABLE fbs_order_sync ADD COLUMN next_page INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE fbs_order_sync ADD COLUMN pass_newest INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE fbs_order_sync ADD COLUMN pass_started REAL NOT NULL DEFAULT 0")
+
+def _migration_012_order_notify_state(cursor):
+    """Yangi buyurtmalar kuzatuvchisining oxirgi ko'rgan soni (order_notifier.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_notify_state (
+            account TEXT PRIMARY KEY,
+            last_count INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+def _migration_013_order_notify_watermark(cursor):
+    """Kuzatuvchi son o'rniga eng yangi ko'rilgan buyurtma vaqtini saqlaydi"""
+    # Eski son yangi usul uchun yaroqsiz - birinchi so'rov boshlang'ich qiymatni qayta oladi
+    cursor.execute("DROP TABLE IF EXISTS order_notify_state")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_notify_state (
+            account TEXT PRIMARY KEY,
+            last_created INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+# (versiya, funksiya) - yangi migratsiyalar faqat oxiriga qo'shiladi
+MIGRATIONS: List[Tuple[int, Callable]] = [
+    (1, _migration_001_base_tables),
+    (2, _migration_002_users_columns),
+    (3, _migration_003_admin_permissions),
+    (4, _migration_004_indexes),
+    (5, _migration_005_user_counters),
+    (6, _migration_006_broadcast_jobs),
+    (7, _migration_007_user_states),
+    (8, _migration_008_leader_leases),
+    (9, _migration_009_fbs_orders),
+    (10, _migration_010_stock_watch),
+    (11, _migration_011_order_sync_resume),
+    (12, _migration_012_order_notify_state),
+    (13, _migration_013_order_notify_watermark),
+]
+
+def get_schema_version(db_path: str = DATABASE_FILE) -> int:
+    """Joriy sxema versiyasini olish"""
+    with read_cursor(db_path) as cursor:
+        cursor.execute("PRAGMA user_version")
+        return cursor.fetchone()[0]
+
+def apply_migrations(db_path: str = DATABASE_FILE) -> int:
+    """Bajarilmagan migratsiyalarni tartib bilan qo'llash, yakuniy versiyani qaytarish"""
+    version = get_schema_version(db_path)
+    
+    for target_version, migration in MIGRATIONS:
+        if target_version <= version:
+            continue
+        
+        with transaction(db_path) as cursor:
+            # Boshqa jarayon allaqachon qo'llagan bo'lishi mumkin
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= target_version:
+                continue
+            
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(target_version)}")
+        
+        logger.info(f"Migratsiya {target_version} qo'llandi: {migration.__doc__}")
+    
+    return get_schema_version(db_path)
@@ -0,0 +1,206 @@
+"""
+Yo'qolgan tovarlarni skanerlash
+Barcha do'konlarning barcha mahsulot sahifalari parallel o'qiladi, natija keshlanadi
+"""
+
+import heapq
+import asyncio
+import logging
+import contextvars
+from typing import Dict, List, Optional, Tuple
+from cache import TTLCache, MISSING
+from config import MISSING_SCAN_CONFIG
+from shop_cache import api_key_hash
+
+logger = logging.getLogger(__name__)
+
+class ShopMissing:
+    """Bitta do'kon bo'yicha yig'ilgan natija"""
+    
+    def __init__(self, shop_id: int, name: str):
+        self.shop_id = shop_id
+        self.name = name
+        self.products = 0
+        self.missing = 0  # quantityMissing yig'indisi
+        self.missing_skus = 0  # quantityMissing > 0 bo'lgan SKU lar soni
+        self.failed_pages = 0
+        self.truncated = False  # max_pages_per_shop chegarasi tufayli oxirgi sahifalar o'qilmadi
+        self._top: List[Tuple[int, int, str]] = []  # (miqdor, tartib, sku) - eng kattalari
+    
+    def add_products(self, product_list: List[Dict]):
+        """Bir sahifadagi mahsulotlarni qo'shish"""
+        limit = MISSING_SCAN_CONFIG["top_skus_per_shop"]
+        self.products += len(product_list)
+        
+        for product in product_list:
+            for sku in product.get('skuList', []) or []:
+                missing_qty = sku.get('quantityMissing', 0) or 0
+                if missing_qty <= 0:
+                    continue
+                
+                self.missing += missing_qty
+                self.missing_skus += 1
+                
+                item = (missing_qty, -self.missing_skus, sku.get('skuTitle', 'N/A'))
+                if len(self._top) < limit:
+                    heapq.heappush(self._top, item)
+                else:
+                    heapq.heappushpop(self._top, item)
+    
+    def top_skus(self) -> List[Tuple[str, int]]:
+        """Eng ko'p yetishmayotgan SKU lar (nomi, miqdori)"""
+        return [(title, qty) for qty, _, title in sorted(self._top, reverse=True)]
+
+class MissingGoodsScan:
+    """Bitta API kalit bo'yicha skanerlash holati - natijalar sahifalar kelishi bilan yangilanadi"""
+    
+    def __init__(self):
+        self.shops: List[ShopMissing] = []
+        self.pages_total = 0
+        self.pages_done = 0
+        self.error: Optional[str] = None
+        self.finished = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+    
+    @property
+    def total_products(self) -> int:
+        return sum(shop.products for shop in self.shops)
+    
+    @property
+    def total_missing(self) -> int:
+        return sum(shop.missing for shop in self.shops)
+    
+    @property
+    def complete(self) -> bool:
+        """Barcha sahifalar xatosiz va to'liq o'qildimi"""
+        return self.finished.is_set() and self.error is None and not any(
+            shop.failed_pages or shop.truncated for shop in self.shops
+        )
+
+# Tugagan skanerlashlar keshi va hozir ishlayotganlari (API kalit xeshi bo'yicha)
+_scans = TTLCache(max_size=10000, ttl=MISSING_SCAN_CONFIG["ttl"])
+_running: Dict[str, MissingGoodsScan] = {}
+
+async def _fetch_page(api_client, shop_id: int, page: int,
+                      semaphore: asyncio.Semaphore) -> Optional[Dict]:
+    """Bitta sahifani umumiy ishchilar chegarasi ostida olish"""
+    async with semaphore:
+        return await api_client.get_shop_products_by_shop_id(
+            shop_id=shop_id,
+            page=page,
+            size=MISSING_SCAN_CONFIG["page_size"],
+            filter="ALL"
+        )
+
+def _page_items(payload: Optional[Dict]) -> Optional[List[Dict]]:
+    """Javobdan mahsulotlar ro'yxatini ajratish"""
+    if not payload or not isinstance(payload, dict):
+        return None
+    return payload.get('productList') or []
+
+async def _scan_shop(api_client, scan: MissingGoodsScan, shop: ShopMissing,
+                     semaphore: asyncio.Semaphore):
+    """Do'konning barcha sahifalarini o'qish"""
+    page_size = MISSING_SCAN_CONFIG["page_size"]
+    max_pages = MISSING_SCAN_CONFIG["max_pages_per_shop"]
+    
+    scan.pages_total += 1
+    first = await _fetch_page(api_client, shop.shop_id, 0, semaphore)
+    scan.pages_done += 1
+    
+    items = _page_items(first)
+    if items is None:
+        shop.failed_pages += 1
+        return
+    shop.add_products(items)
+    
+    total = first.get('totalProductsAmount')
+    if isinstance(total, int):
+        # Sahifalar soni ma'lum - qolganlari bir vaqtda so'raladi
+        pages = -(-total // page_size)
+        if pages > max_pages:
+            shop.truncated = True
+            pages = max_pages
+        if pages <= 1:
+            return
+        
+        scan.pages_total += pages - 1
+        tasks = [
+            asyncio.ensure_future(_fetch_page(api_client, shop.shop_id, page, semaphore))
+            for page in range(1, pages)
+        ]
+        for future in asyncio.as_completed(tasks):
+            items = _page_items(await future)
+            scan.pages_done += 1
+            if items is None:
+                shop.failed_pages += 1
+            else:
+                shop.add_products(items)
+        return
+    
+    # Jami soni berilmagan - qisqa sahifagacha ketma-ket o'qiymiz
+    page = 1
+    while len(items) >= page_size and page < max_pages:
+        scan.pages_total += 1
+        items = _page_items(await _fetch_page(api_client, shop.shop_id, page, semaphore))
+        scan.pages_done += 1
+        if items is None:
+            shop.failed_pages += 1
+            return
+        shop.add_products(items)
+        page += 1
+    
+    if len(items) >= page_size:
+        # Qisqa sahifaga yetmay chegara tugadi
+        shop.truncated = True
+
+async def _run_scan(api_client, scan: MissingGoodsScan, key: str):
+    """Barcha do'konlarni skanerlash va tugagan natijani keshlash"""
+    try:
+        shops = await api_client.get_shops_cached()
+        if not shops or not isinstance(shops, list):
+            scan.error = "no_shops"
+            return
+        
+        scan.shops = [
+            ShopMissing(shop.get('id'), shop.get('name', "Noma'lum do'kon"))
+            for shop in shops if shop.get('id')
+        ]
+        semaphore = asyncio.Semaphore(MISSING_SCAN_CONFIG["workers"])
+        await asyncio.gather(*(
+            _scan_shop(api_client, scan, shop, semaphore) for shop in scan.shops
+        ))
+    
+    except Exception as e:
+        logger.error(f"Yo'qolgan tovarlarni skanerlashda xatolik: {e}")
+        scan.error = str(e)
+    finally:
+        scan.finished.set()
+        _running.pop(key, None)
+        if scan.complete:
+            _scans.set(key, scan)
+
+def start_missing_scan(api_client) -> MissingGoodsScan:
+    """Keshlangan, davom etayotgan yoki yangi skanerlashni olish"""
+    key = api_key_hash(api_client.api_key)
+    
+    scan = _scans.get(key)
+    if scan is not MISSING:
+        return scan
+    
+    scan = _running.get(key)
+    if scan is not None:
+        return scan
+    
+    scan = MissingGoodsScan()
+    _running[key] = scan
+    # Handler vaqt byudjeti skanerlashga o'tmasligi uchun bo'sh kontekstda ishga tushiriladi
+    scan.task = asyncio.get_running_loop().create_task(
+        _run_scan(api_client, scan, key),
+        context=contextvars.Context()
+    )
+    return scan
+
+def invalidate_missing_scan(api_key: str):
+    """API kalit uchun keshlangan natijani o'chirish"""
+    _scans.invalidate(api_key_hash(api_key))
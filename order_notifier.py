@@ -0,0 +1,224 @@
+"""
+Yangi buyurtmalar haqida xabar berish
+API kalit saqlagan har bir sotuvchi uchun eng yangi (CREATED) FBS buyurtmalar muntazam tekshiriladi,
+oxirgi ko'rilganidan keyin yaratilganlari haqida sotuvchiga xabar yuboriladi. Eng yangi ko'rilgan buyurtma
+vaqti bazada saqlanadi - yetakchi almashganda yoki qayta ishga tushganda oradagi buyurtmalar ham xabar qilinadi
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+from async_api_client import get_async_api_client
+from order_sync import order_created_ms
+from broadcast import TokenBucket, retry_after
+from response_cache import cache_bypassed
+from shop_cache import api_key_hash
+from database import get_api_key_users
+from keyboards import get_new_orders_keyboard
+from config import DATABASE_FILE, MESSAGES, NOTIFY_CONFIG
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+class WatchedSeller:
+    """Kuzatilayotgan API kalit va uning so'rov jadvali"""
+    
+    def __init__(self, account: str, api_key: str, user_ids: Set[int], interval: float,
+                 last_created: Optional[int] = None):
+        self.account = account
+        self.api_key = api_key
+        self.user_ids = user_ids
+        self.interval = interval
+        # Eng yangi ko'rilgan buyurtma vaqti (ms); None - saqlanmagan, birinchi so'rov boshlang'ich qiymatni oladi
+        self.last_created = last_created
+
+def load_notify_watermarks() -> Dict[str, int]:
+    """API kalit xeshi -> eng yangi ko'rilgan buyurtma vaqti (ms)"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("SELECT account, last_created FROM order_notify_state")
+        return dict(cursor.fetchall())
+
+def save_notify_watermark(account: str, last_created: int):
+    with transaction(DATABASE_FILE) as cursor:
+        cursor.execute(
+            "INSERT OR REPLACE INTO order_notify_state (account, last_created, updated_at) VALUES (?, ?, ?)",
+            (account, last_created, time.time())
+        )
+
+def delete_notify_state(api_key: str):
+    """API kalit o'chirilganda saqlangan holatni o'chirish"""
+    try:
+        with transaction(DATABASE_FILE) as cursor:
+            cursor.execute("DELETE FROM order_notify_state WHERE account = ?", (api_key_hash(api_key),))
+    
+    except Exception as e:
+        logger.error(f"Buyurtmalar kuzatuvi holatini o'chirishda xatolik: {e}")
+
+class OrderNotifier:
+    """Jitter li, moslashuvchan oraliqli va parallellik cheklangan so'rovlar rejalashtiruvchisi"""
+    
+    def __init__(self, bot: AsyncTeleBot):
+        self.bot = bot
+        self._sellers: Dict[str, WatchedSeller] = {}  # API kalit xeshi -> sotuvchi
+        self._heap: List[Tuple[float, int, WatchedSeller]] = []  # (navbatdagi vaqt, tartib, sotuvchi)
+        self._seq = 0
+        self._semaphore = asyncio.Semaphore(NOTIFY_CONFIG["concurrency"])
+        self._bucket = TokenBucket(NOTIFY_CONFIG["send_rate"], NOTIFY_CONFIG["send_rate"])
+    
+    def _schedule(self, seller: WatchedSeller, delay: float):
+        """Sotuvchini navbatga qo'yish (delay ±jitter bilan)"""
+        jitter = NOTIFY_CONFIG["jitter"]
+        due = time.monotonic() + delay * random.uniform(1 - jitter, 1 + jitter)
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, seller))
+    
+    def refresh_sellers(self):
+        """API kalitlar ro'yxatini bazadan yangilash - yangilari tasodifiy vaqtga joylanadi"""
+        users: Dict[str, Tuple[str, Set[int]]] = {}
+        for user_id, api_key in get_api_key_users():
+            account = api_key_hash(api_key)
+            users.setdefault(account, (api_key, set()))[1].add(user_id)
+        
+        for account in list(self._sellers):
+            if account not in users:
+                # Navbatdagi yozuvi chiqarilganda tashlab ketiladi
+                del self._sellers[account]
+        
+        base = NOTIFY_CONFIG["base_interval"]
+        stored = load_notify_watermarks() if users.keys() - self._sellers.keys() else {}
+        for account, (api_key, user_ids) in users.items():
+            seller = self._sellers.get(account)
+            if seller is not None:
+                seller.user_ids = user_ids
+                continue
+            
+            # Saqlangan vaqt bilan to'xtab turgan vaqtdagi buyurtmalar ham birinchi so'rovda aniqlanadi
+            seller = WatchedSeller(account, api_key, user_ids, base, stored.get(account))
+            self._sellers[account] = seller
+            # Birinchi so'rovlar butun oraliq bo'ylab tarqatiladi
+            self._schedule(seller, random.uniform(0, base))
+    
+    def _next_interval(self, seller: WatchedSeller, changed: bool) -> float:
+        """Buyurtmalar ko'p kelsa tezroq, kam kelsa sekinroq tekshirish"""
+        if changed:
+            return max(NOTIFY_CONFIG["min_interval"], seller.interval / 2)
+        return min(NOTIFY_CONFIG["max_interval"], seller.interval * 1.5)
+    
+    async def _poll(self, seller: WatchedSeller):
+        """Bitta sotuvchini tekshirish va keyingi so'rovni rejalashtirish"""
+        # Son farqi emas, eng yangi buyurtmalar sahifasi ko'riladi - oraliqda PACKING ga o'tganlar
+        # sonni kamaytirib, yangi kelganlarini yashirib qo'ymaydi
+        created = None
+        new_orders = 0
+        total = None
+        try:
+            async with self._semaphore:
+                api_client = get_async_api_client(seller.api_key)
+                # Har doim API dan yangi qiymat olinadi
+                with cache_bypassed():
+                    shop_ids = await api_client.get_shop_ids()
+                    data = await api_client.get_fbs_orders_v2(
+                        size=NOTIFY_CONFIG["page_size"],
+                        status="CREATED",
+                        shop_ids=shop_ids if shop_ids else None
+                    )
+                    
+                    orders = ((data or {}).get('payload') or {}).get('orders')
+                    if isinstance(orders, list):
+                        created = [order_created_ms(order) for order in orders]
+                        if seller.last_created is not None:
+                            new_orders = sum(1 for value in created if value > seller.last_created)
+                        
+                        if new_orders:
+                            # Xabardagi jami son uchun
+                            count_data = await api_client.get_fbs_orders_count(
+                                shop_ids=shop_ids if shop_ids else None,
+                                status="CREATED"
+                            )
+                            payload = count_data.get('payload') if count_data else None
+                            total = payload if isinstance(payload, int) else len(orders)
+        
+        except Exception as e:
+            logger.error(f"Yangi buyurtmalarni tekshirishda xatolik: {e}")
+        
+        if created is None:
+            # Xatolik - kalit ishlamayotgan bo'lishi mumkin, kamroq so'raladi
+            seller.interval = NOTIFY_CONFIG["max_interval"]
+        else:
+            if new_orders > 0:
+                await self._notify(seller, new_orders, total)
+            seller.interval = self._next_interval(seller, new_orders > 0)
+            
+            newest = max(created, default=0)
+            if seller.last_created is None or newest > seller.last_created:
+                seller.last_created = max(newest, seller.last_created or 0)
+                try:
+                    await asyncio.to_thread(save_notify_watermark, seller.account, seller.last_created)
+                except Exception as e:
+                    logger.error(f"Buyurtmalar kuzatuvi holatini saqlashda xatolik: {e}")
+        
+        if self._sellers.get(seller.account) is seller:
+            self._schedule(seller, seller.interval)
+    
+    async def _notify(self, seller: WatchedSeller, new_orders: int, total: int):
+        """Sotuvchining barcha foydalanuvchilariga xabar yuborish"""
+        text = MESSAGES["new_orders"].format(new=new_orders, total=total)
+        for user_id in list(seller.user_ids):
+            for attempt in range(2):
+                await self._bucket.acquire()
+                try:
+                    await self.bot.send_message(
+                        user_id, text, parse_mode="HTML", reply_markup=get_new_orders_keyboard()
+                    )
+                    break
+                
+                except ApiTelegramException as e:
+                    delay = retry_after(e)
+                    if delay is not None and attempt == 0:
+                        self._bucket.pause(delay)
+                        continue
+                    logger.warning(f"Yangi buyurtma xabarini yuborib bo'lmadi {user_id}: {e}")
+                    break
+                
+                except Exception as e:
+                    logger.error(f"Yangi buyurtma xabarini yuborishda xatolik {user_id}: {e}")
+                    break
+    
+    async def run(self):
+        """Navbatdagi sotuvchilarni tekshirib turish (yetakchida ishlaydi)"""
+        tasks: Set[asyncio.Task] = set()
+        next_refresh = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_refresh:
+                    try:
+                        self.refresh_sellers()
+                    except Exception as e:
+                        logger.error(f"Sotuvchilar ro'yxatini yangilashda xatolik: {e}")
+                    next_refresh = now + NOTIFY_CONFIG["refresh_interval"]
+                
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, seller = heapq.heappop(self._heap)
+                    if self._sellers.get(seller.account) is not seller:
+                        continue
+                    task = asyncio.create_task(self._poll(seller))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                
+                wake_at = min(self._heap[0][0], next_refresh) if self._heap else next_refresh
+                await asyncio.sleep(max(0.05, wake_at - time.monotonic()))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+async def run_order_notifier(bot: AsyncTeleBot):
+    """Yangi buyurtmalar kuzatuvchisini ishga tushirish"""
+    if not NOTIFY_CONFIG["enabled"]:
+        return
+    await OrderNotifier(bot).run()
@@ -0,0 +1,275 @@
+"""
+FBS buyurtmalarining mahalliy nusxasi
+Sotuvchi buyurtmalari fbs_orders jadvaliga bosqichma-bosqich sinxronlanadi,
+ro'yxat va sonlar API o'rniga indeks bo'yicha bazadan o'qiladi
+"""
+
+import json
+import time
+import asyncio
+import logging
+import contextvars
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from async_api_client import AsyncMarketplaceAPIClient, get_async_api_client
+from pagination import PAGED_ENDPOINTS, extract_items
+from response_cache import cache_bypassed
+from shop_cache import api_key_hash
+from database import get_api_key_users
+from config import DATABASE_FILE, ORDER_SYNC_CONFIG
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+# Ochiq statuslar - API o'zgarganlarni bermaydi, shuning uchun har o'tishda to'liq olinadi
+# va ko'rinmay qolganlari o'chiriladi (sinxronlashning bu qismi bosqichli emas)
+OPEN_STATUSES = ("CREATED", "PACKING", "DELIVERING")
+# Yopilgan statuslar tarix - faqat watermark (lookback bilan) dan keyin yaratilganlari olinadi
+CLOSED_STATUSES = ("COMPLETED", "CANCELED")
+# Bitta ishga tushirishda har bir status uchun ko'pi bilan max_pages sahifa o'qiladi -
+# qolgani keyingi ishga tushirishda saqlangan sahifadan davom ettiriladi
+SYNC_STATUSES = OPEN_STATUSES + CLOSED_STATUSES
+
+# API kalit xeshi -> davom etayotgan sinxronlash
+_running: Dict[str, asyncio.Task] = {}
+
+def order_created_ms(order: Dict) -> int:
+    """Buyurtma yaratilgan vaqt (ms) - API son yoki ISO satr qaytarishi mumkin"""
+    value = order.get('dateCreated')
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value:
+        try:
+            return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+        except ValueError:
+            return 0
+    return 0
+
+def _upsert_orders(account: str, status: str, orders: List[Dict], seen_at: float):
+    """Buyurtmalarni bitta tranzaksiyada yozish"""
+    rows = [
+        (account, order['id'], order.get('status') or status, order_created_ms(order),
+         json.dumps(order, ensure_ascii=False), seen_at)
+        for order in orders if order.get('id') is not None
+    ]
+    if not rows:
+        return
+    
+    with transaction(DATABASE_FILE) as cursor:
+        cursor.executemany("""
+            INSERT INTO fbs_orders (account, order_id, status, date_created, data, seen_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (account, order_id) DO UPDATE SET
+                status = excluded.status,
+                date_created = excluded.date_created,
+                data = excluded.data,
+                seen_at = excluded.seen_at
+        """, rows)
+
+def _save_progress(account: str, status: str, watermark: int, next_page: int, newest: int, pass_started: float):
+    """Tugamagan o'tish holatini saqlash"""
+    with transaction(DATABASE_FILE) as cursor:
+        # Birinchi o'tish tugamaguncha synced_at 0 - nusxa sinxronlangan hisoblanmaydi
+        cursor.execute("""
+            INSERT INTO fbs_order_sync (account, status, watermark, synced_at, next_page, pass_newest, pass_started)
+            VALUES (?, ?, ?, 0, ?, ?, ?)
+            ON CONFLICT (account, status) DO UPDATE SET
+                next_page = excluded.next_page,
+                pass_newest = excluded.pass_newest,
+                pass_started = excluded.pass_started
+        """, (account, status, watermark, next_page, newest, pass_started))
+
+def _finish_pass(account: str, status: str, newest: int, pass_started: float, run: float):
+    """O'tish tugaganda: ko'rinmay qolgan ochiq buyurtmalarni o'chirish va watermark ni yangilash"""
+    with transaction(DATABASE_FILE) as cursor:
+        if status in OPEN_STATUSES:
+            # O'tish davomida ko'rinmaganlar boshqa statusga o'tgan
+            cursor.execute(
+                "DELETE FROM fbs_orders WHERE account = ? AND status = ? AND seen_at < ?",
+                (account, status, pass_started)
+            )
+        cursor.execute("""
+            INSERT OR REPLACE INTO fbs_order_sync
+                (account, status, watermark, synced_at, next_page, pass_newest, pass_started)
+            VALUES (?, ?, ?, ?, 0, 0, 0)
+        """, (account, status, newest, run))
+
+async def _sync_status(api_client: AsyncMarketplaceAPIClient, account: str, status: str,
+                       shop_ids: Optional[List[int]], state: Optional[Tuple], run: float) -> bool:
+    """Bitta status bo'yicha sahifalab olish va yozish (o'tish oxirigacha o'qilsa True)"""
+    # Barcha yozuvlar alohida oqimda - baza band bo'lsa ham event loop to'xtamaydi
+    # state - fbs_order_sync qatori: (watermark, next_page, pass_newest, pass_started)
+    watermark, next_page, pass_newest, pass_started = state or (0, 0, 0, 0.0)
+    if not next_page:
+        # Yangi o'tish
+        pass_newest, pass_started = watermark, run
+    
+    # date_from o'tish davomida o'zgarmaydi, aks holda sahifalar siljib ketadi
+    date_from = None
+    if status in CLOSED_STATUSES and watermark:
+        date_from = max(0, watermark - ORDER_SYNC_CONFIG["lookback_days"] * 86400 * 1000)
+    
+    page_size = ORDER_SYNC_CONFIG["page_size"]
+    newest = pass_newest
+    batch: List[Dict] = []
+    
+    for page in range(next_page, next_page + ORDER_SYNC_CONFIG["max_pages"]):
+        data = await api_client.get_fbs_orders_v2(
+            page=page,
+            size=page_size,
+            status=status,
+            shop_ids=shop_ids if shop_ids else None,
+            date_from=date_from
+        )
+        orders = extract_items(data, PAGED_ENDPOINTS['get_fbs_orders_v2'])
+        if orders is None:
+            # API xatoligi - bo'sh javob deb hisoblansa, ochiq buyurtmalar o'chib ketardi
+            return False
+        
+        batch.extend(orders)
+        for order in orders:
+            newest = max(newest, order_created_ms(order))
+        if len(batch) >= ORDER_SYNC_CONFIG["batch_size"]:
+            await asyncio.to_thread(_upsert_orders, account, status, batch, run)
+            batch = []
+        
+        if len(orders) < page_size:
+            break
+    else:
+        # Sahifalar chegarasi - keyingi ishga tushirish shu joydan davom etadi
+        logger.info(f"Buyurtmalar sinxronlash {status}: {page + 1}-sahifada to'xtatildi, keyingi safar davom etadi")
+        await asyncio.to_thread(_upsert_orders, account, status, batch, run)
+        await asyncio.to_thread(_save_progress, account, status, watermark, page + 1, newest, pass_started)
+        return False
+    
+    await asyncio.to_thread(_upsert_orders, account, status, batch, run)
+    
+    await asyncio.to_thread(_finish_pass, account, status, newest, pass_started, run)
+    return True
+
+async def sync_orders(api_client: AsyncMarketplaceAPIClient) -> bool:
+    """Sotuvchi buyurtmalarini sinxronlash (barcha statuslar muvaffaqiyatli bo'lsa True)"""
+    account = api_key_hash(api_client.api_key)
+    run = time.time()
+    
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("""
+            SELECT status, watermark, next_page, pass_newest, pass_started
+            FROM fbs_order_sync WHERE account = ?
+        """, (account,))
+        states = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+    
+    # Sinxronlash har doim API dan yangi javob oladi
+    with cache_bypassed():
+        shop_ids = await api_client.get_shop_ids()
+        complete = True
+        for status in SYNC_STATUSES:
+            try:
+                if not await _sync_status(api_client, account, status, shop_ids,
+                                          states.get(status), run):
+                    complete = False
+            except Exception as e:
+                logger.error(f"Buyurtmalarni sinxronlashda xatolik ({status}): {e}")
+                complete = False
+    return complete
+
+def start_order_sync(api_client: AsyncMarketplaceAPIClient) -> asyncio.Task:
+    """Sinxronlashni fonda boshlash (shu kalit uchun davom etayotgan bo'lsa o'sha vazifa)"""
+    account = api_key_hash(api_client.api_key)
+    task = _running.get(account)
+    if task is not None:
+        return task
+    
+    # Handler vaqt byudjeti sinxronlashga o'tmasligi uchun bo'sh kontekstda
+    task = asyncio.get_running_loop().create_task(
+        sync_orders(api_client),
+        context=contextvars.Context()
+    )
+    _running[account] = task
+    task.add_done_callback(lambda _: _running.pop(account, None))
+    return task
+
+def is_synced(api_key: str, max_age: Optional[float] = None) -> bool:
+    """Mahalliy nusxa barcha statuslar bo'yicha yetarlicha yangimi"""
+    if not ORDER_SYNC_CONFIG["enabled"]:
+        return False
+    
+    max_age = ORDER_SYNC_CONFIG["max_age"] if max_age is None else max_age
+    try:
+        with read_cursor(DATABASE_FILE) as cursor:
+            cursor.execute(
+                "SELECT COUNT(*), MIN(synced_at) FROM fbs_order_sync WHERE account = ?",
+                (api_key_hash(api_key),)
+            )
+            count, oldest = cursor.fetchone()
+        return count == len(SYNC_STATUSES) and oldest >= time.time() - max_age
+    
+    except Exception as e:
+        logger.error(f"Sinxronlash holatini olishda xatolik: {e}")
+        return False
+
+def get_local_orders(api_key: str, status: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    """Mahalliy nusxadan buyurtmalar (eng yangilari birinchi)"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("""
+            SELECT data FROM fbs_orders
+            WHERE account = ? AND status = ?
+            ORDER BY date_created DESC LIMIT ? OFFSET ?
+        """, (api_key_hash(api_key), status, limit, offset))
+        return [json.loads(row[0]) for row in cursor.fetchall()]
+
+def get_local_counts(api_key: str) -> Dict[str, int]:
+    """Mahalliy nusxadan status bo'yicha buyurtmalar soni"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("""
+            SELECT status, COUNT(*) FROM fbs_orders
+            WHERE account = ? GROUP BY status
+        """, (api_key_hash(api_key),))
+        return dict(cursor.fetchall())
+
+def delete_local_orders(api_key: str):
+    """API kalit o'chirilganda uning mahalliy nusxasini o'chirish"""
+    account = api_key_hash(api_key)
+    try:
+        with transaction(DATABASE_FILE) as cursor:
+            cursor.execute("DELETE FROM fbs_orders WHERE account = ?", (account,))
+            cursor.execute("DELETE FROM fbs_order_sync WHERE account = ?", (account,))
+    
+    except Exception as e:
+        logger.error(f"Mahalliy buyurtmalarni o'chirishda xatolik: {e}")
+
+def _fresh_accounts(max_age: float) -> set:
+    """Barcha statuslari yangi sinxronlangan kalit xeshlari"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("""
+            SELECT account FROM fbs_order_sync
+            GROUP BY account HAVING COUNT(*) = ? AND MIN(synced_at) >= ?
+        """, (len(SYNC_STATUSES), time.time() - max_age))
+        return {row[0] for row in cursor.fetchall()}
+
+async def run_order_sync_worker():
+    """Yaqinda faol bo'lgan sotuvchilar nusxasini muntazam yangilab turish (yetakchida ishlaydi)"""
+    if not ORDER_SYNC_CONFIG["enabled"]:
+        return
+    
+    interval = ORDER_SYNC_CONFIG["interval"]
+    semaphore = asyncio.Semaphore(ORDER_SYNC_CONFIG["concurrency"])
+    
+    async def sync_one(api_key: str):
+        async with semaphore:
+            await start_order_sync(get_async_api_client(api_key))
+    
+    while True:
+        try:
+            active_since = (datetime.now() - timedelta(days=ORDER_SYNC_CONFIG["active_days"])).isoformat()
+            fresh = _fresh_accounts(interval)
+            api_keys = {
+                api_key for _, api_key in get_api_key_users(active_since)
+                if api_key_hash(api_key) not in fresh
+            }
+            await asyncio.gather(*(sync_one(api_key) for api_key in api_keys))
+        
+        except Exception as e:
+            logger.error(f"Buyurtmalar sinxronlash ishchisida xatolik: {e}")
+        
+        await asyncio.sleep(interval)
@@ -0,0 +1,122 @@
+"""
+Sahifalangan Uzum endpointlari uchun iteratorlar
+Elementlar birma-bir qaytariladi, keyingi sahifa esa fonda oldindan yuklanadi
+"""
+
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Metod nomi -> javobdagi elementlar ro'yxatigacha bo'lgan yo'l (bo'sh - javobning o'zi ro'yxat)
+PAGED_ENDPOINTS = {
+    'get_fbs_orders_v2': ('payload', 'orders'),
+    'get_finance_expenses': ('payload', 'payments'),
+    'get_finance_orders': ('payload', 'orderItems'),
+    'get_invoices': (),
+    'get_invoice_returns': (),
+    'get_shop_invoice_by_id': (),
+    'get_shop_returns': (),
+}
+
+# API ruxsat beradigan eng katta sahifa hajmi
+MAX_PAGE_SIZE = {
+    'get_invoices': 50,
+    'get_invoice_returns': 50,
+}
+
+def extract_items(response: Any, path: Tuple[str, ...]) -> Optional[List]:
+    """Javobdan elementlar ro'yxatini olish (xatolik bo'lsa None)"""
+    if response is None:
+        return None
+    
+    data = response
+    for key in path:
+        if not isinstance(data, dict):
+            return []
+        data = data.get(key)
+    
+    # Ba'zi endpointlar ro'yxatni payload ichida qaytaradi
+    if isinstance(data, dict) and not path:
+        data = data.get('payload', [])
+    return data if isinstance(data, list) else []
+
+def _plan(limit: Optional[int], page_size: int, yielded: int, page_items: int) -> bool:
+    """Keyingi sahifa kerakmi (limitga yetilmagan va sahifa to'liq bo'lsa)"""
+    if page_items < page_size:
+        return False
+    return limit is None or yielded + page_items < limit
+
+def iter_pages(fetch_page: Callable[[int, int], Any], path: Tuple[str, ...], page_size: int,
+               limit: Optional[int] = None, start_page: int = 0) -> Iterator[Any]:
+    """Sahifalarni ketma-ket o'qib elementlarni qaytarish, keyingi sahifa fon oqimida yuklanadi"""
+    if limit is not None and limit <= 0:
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+    try:
+        page = start_page
+        items = extract_items(fetch_page(page, page_size), path)
+        yielded = 0
+        
+        while items:
+            # Joriy sahifa iste'mol qilinayotganda keyingisi yuklanadi
+            upcoming = None
+            if _plan(limit, page_size, yielded, len(items)):
+                upcoming = executor.submit(
+                    contextvars.copy_context().run, fetch_page, page + 1, page_size
+                )
+            
+            for item in items:
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            
+            if upcoming is None:
+                return
+            page += 1
+            items = extract_items(upcoming.result(), path)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def aiter_pages(fetch_page: Callable[[int, int], Awaitable], path: Tuple[str, ...],
+                      page_size: int, limit: Optional[int] = None,
+                      start_page: int = 0) -> AsyncIterator[Any]:
+    """iter_pages ning asinxron varianti - keyingi sahifa alohida vazifada yuklanadi"""
+    if limit is not None and limit <= 0:
+        return
+    
+    upcoming: Optional[asyncio.Future] = None
+    try:
+        page = start_page
+        items = extract_items(await fetch_page(page, page_size), path)
+        yielded = 0
+        
+        while items:
+            upcoming = None
+            if _plan(limit, page_size, yielded, len(items)):
+                upcoming = asyncio.ensure_future(fetch_page(page + 1, page_size))
+            
+            for item in items:
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            
+            if upcoming is None:
+                return
+            page += 1
+            items = extract_items(await upcoming, path)
+            upcoming = None
+    finally:
+        # Iste'molchi erta to'xtasa, keraksiz so'rov bekor qilinadi
+        if upcoming is not None and not upcoming.done():
+            upcoming.cancel()
+
+def page_size_for(method_name: str, page_size: int) -> int:
+    """Endpoint chegarasiga mos sahifa hajmi"""
+    return min(page_size, MAX_PAGE_SIZE.get(method_name, page_size))
@@ -0,0 +1,96 @@
+"""
+Oldindan yuklash
+Submenu ochilganda keyingi tugma uchun kerak bo'ladigan so'rovlar fonda bajarilib, javoblar response_cache ga tushadi
+"""
+
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from async_api_client import AsyncMarketplaceAPIClient, get_async_api_client
+from cache import MISSING
+from shop_cache import api_key_hash
+from config import PREFETCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[AsyncMarketplaceAPIClient], Awaitable]
+
+class PrefetchScheduler:
+    """Menyu bo'yicha yuklovchilarni fonda bajarish - chegaradan oshganlari kutmasdan tashlab yuboriladi"""
+    
+    def __init__(self, per_user: int = 2, global_limit: int = 20):
+        self.per_user = per_user
+        self.global_limit = global_limit
+        
+        self._loaders: Dict[str, List[Loader]] = {}
+        self._active = 0
+        self._users: Dict[int, int] = {}  # user_id -> bajarilayotgan yuklashlar soni
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}  # (API kalit xeshi, yuklovchi nomi) -> vazifa
+    
+    def menu(self, name: str):
+        """Yuklovchini menyuga bog'lash uchun dekorator: loader(api_client)"""
+        def decorator(loader: Loader):
+            self._loaders.setdefault(name, []).append(loader)
+            return loader
+        return decorator
+    
+    def schedule(self, menu: str, user_id: int, api_key: str) -> int:
+        """Menyu yuklovchilarini fonda ishga tushirish (ishga tushganlar soni)"""
+        if not PREFETCH_CONFIG["enabled"] or not api_key:
+            return 0
+        
+        key_hash = api_key_hash(api_key)
+        started = 0
+        for loader in self._loaders.get(menu, ()):
+            job = (key_hash, loader.__name__)
+            if job in self._inflight:
+                continue
+            if self._active >= self.global_limit or self._users.get(user_id, 0) >= self.per_user:
+                logger.debug(f"Oldindan yuklash o'tkazib yuborildi: {menu} ({user_id})")
+                break
+            
+            self._active += 1
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+            # Handler vaqt byudjeti fon so'rovlariga o'tmasligi uchun bo'sh kontekstda
+            self._inflight[job] = asyncio.get_running_loop().create_task(
+                self._run(loader, api_key, user_id, job),
+                context=contextvars.Context()
+            )
+            started += 1
+        return started
+    
+    async def load(self, loader: Loader, api_key: str) -> Any:
+        """Yuklovchini bajarish - shu ma'lumot hozir fonda yuklanayotgan bo'lsa o'sha natija kutiladi"""
+        task = self._inflight.get((api_key_hash(api_key), loader.__name__))
+        if task is not None:
+            # Handler bekor qilinsa ham fon yuklash davom etadi
+            result = await asyncio.shield(task)
+            if result is not MISSING:
+                return result
+        return await loader(get_async_api_client(api_key))
+    
+    async def _run(self, loader: Loader, api_key: str, user_id: int, job: Tuple[str, str]) -> Any:
+        try:
+            return await loader(get_async_api_client(api_key))
+        except Exception as e:
+            logger.error(f"Oldindan yuklashda xatolik ({job[1]}): {e}")
+            return MISSING
+        finally:
+            self._inflight.pop(job, None)
+            self._active -= 1
+            remaining = self._users.get(user_id, 1) - 1
+            if remaining <= 0:
+                self._users.pop(user_id, None)
+            else:
+                self._users[user_id] = remaining
+    
+    @property
+    def active(self) -> int:
+        return self._active
+
+# Umumiy rejalashtiruvchi (yuklovchilar bot_handlers.py da ro'yxatdan o'tkaziladi)
+prefetcher = PrefetchScheduler(
+    per_user=PREFETCH_CONFIG["per_user"],
+    global_limit=PREFETCH_CONFIG["global"]
+)
@@ -0,0 +1,166 @@
+"""
+API javoblari keshi
+Kam o'zgaradigan GET endpointlar javobi (API kalit xeshi, endpoint, parametrlar) bo'yicha saqlanadi.
+Muddati o'tgan javob yana biroz vaqt qaytariladi, shu orada fonda yangilanadi (stale-while-revalidate)
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+from config import RESPONSE_CACHE_CONFIG
+from http_transport import encode_params
+from shop_cache import api_key_hash
+
+# Endpoint -> yangi hisoblanadigan muddat (soniya). Faqat shu GET so'rovlar keshlanadi
+CACHED_ENDPOINTS = {
+    '/v2/fbs/sku/stocks': 60,
+    '/v1/finance/commission-info': 900,
+    '/v1/finance/seller-payment-info': 900,
+    '/v1/shops': 900,
+    '/v1/fbs/order/return-reasons': 3600,
+    # Submenu ochilganda oldindan yuklanadi (prefetch.py)
+    '/v2/fbs/orders': 30,
+    '/v2/fbs/orders/count': 30,
+    '/v1/finance/expenses': 120,
+}
+
+# Tez o'zgaradigan endpointlar uchun eskirgan javobni qaytarish chegarasi (soniya)
+MAX_STALE = {
+    '/v2/fbs/orders': 30,
+    '/v2/fbs/orders/count': 30,
+    '/v1/finance/expenses': 120,
+}
+
+# Yozish so'rovi -> eskiradigan endpointlar
+INVALIDATIONS = [
+    (re.compile(r'^/v2/fbs/sku/stocks$'), ('/v2/fbs/sku/stocks',)),
+    (re.compile(r'^/v1/fbs/order/[^/]+/(confirm|cancel)$'),
+     ('/v2/fbs/sku/stocks', '/v2/fbs/orders', '/v2/fbs/orders/count')),
+]
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+# Joriy vazifa keshni chetlab o'tadimi (masalan, sinxronlash har doim yangi javob oladi)
+_bypass: ContextVar[bool] = ContextVar("response_cache_bypass", default=False)
+
+@contextmanager
+def cache_bypassed():
+    """Blok ichidagi GET so'rovlar keshdan o'qimaydi va keshga yozmaydi"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+def cache_ttl(path: str) -> Optional[int]:
+    """Endpoint keshlanadimi (keshlansa - muddati)"""
+    if not RESPONSE_CACHE_CONFIG["enabled"] or _bypass.get():
+        return None
+    return CACHED_ENDPOINTS.get(path)
+
+def cache_key(api_key: str, path: str, params: Optional[Dict[str, Any]] = None) -> CacheKey:
+    """Kesh kaliti - API kalitning o'zi saqlanmaydi"""
+    return (api_key_hash(api_key), path, tuple(sorted(encode_params(params))))
+
+def invalidated_paths(path: str) -> Iterable[str]:
+    """Yozish so'rovidan keyin eskiradigan endpointlar"""
+    for pattern, paths in INVALIDATIONS:
+        if pattern.match(path):
+            yield from paths
+
+class ResponseCache:
+    """Oqimlar uchun xavfsiz LRU kesh: yangi, eskirgan (lekin qaytariladigan) va yaroqsiz yozuvlar"""
+    
+    def __init__(self, max_size: int, stale_ttl: float):
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[CacheKey, Tuple[float, float, Any]]" = OrderedDict()
+        self._refreshing: Set[Hashable] = set()
+        self._version = 0  # har bir o'chirishda oshadi
+        self._lock = threading.Lock()
+    
+    def lookup(self, key: CacheKey) -> Tuple[Any, bool]:
+        """(javob, eskirganmi) - javob yo'q yoki juda eski bo'lsa (None, False)"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None, False
+            
+            fresh_until, expires_at, response = item
+            if now >= expires_at:
+                del self._data[key]
+                return None, False
+            
+            self._data.move_to_end(key)
+            return response, now >= fresh_until
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def store(self, key: CacheKey, ttl: float, response: Any, version: Optional[int] = None):
+        """Javobni saqlash (so'rov davomida kesh o'chirilgan bo'lsa saqlanmaydi)"""
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            fresh_until = time.monotonic() + ttl
+            self._data[key] = (fresh_until, fresh_until + MAX_STALE.get(key[1], self.stale_ttl), response)
+            self._data.move_to_end(key)
+            
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def begin_refresh(self, key: CacheKey) -> bool:
+        """Fonda yangilashni boshlash huquqi (bir kalit uchun bitta yangilash)"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+    
+    def end_refresh(self, key: CacheKey):
+        with self._lock:
+            self._refreshing.discard(key)
+    
+    def invalidate(self, api_key: str, paths: Optional[Iterable[str]] = None):
+        """API kalit bo'yicha berilgan endpointlar (None - barchasi) yozuvlarini o'chirish"""
+        key_hash = api_key_hash(api_key)
+        paths = None if paths is None else set(paths)
+        with self._lock:
+            self._version += 1
+            stale = [
+                key for key in self._data
+                if key[0] == key_hash and (paths is None or key[1] in paths)
+            ]
+            for key in stale:
+                del self._data[key]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+# Umumiy kesh (sinxron va asinxron mijozlar uchun)
+response_cache = ResponseCache(
+    max_size=RESPONSE_CACHE_CONFIG["max_size"],
+    stale_ttl=RESPONSE_CACHE_CONFIG["stale_ttl"]
+)
+
+# Sinxron mijoz uchun fonda yangilash oqimlari
+refresh_executor = ThreadPoolExecutor(
+    max_workers=RESPONSE_CACHE_CONFIG["refresh_workers"],
+    thread_name_prefix="cache-refresh"
+)
+
+def invalidate_responses(api_key: str):
+    """API kalit uchun barcha keshlangan javoblarni o'chirish"""
+    response_cache.invalidate(api_key)
@@ -0,0 +1,42 @@
+"""
+Sotuvchi do'konlari keshi
+Do'konlar ro'yxati deyarli o'zgarmaydi, shuning uchun API kalit bo'yicha saqlanadi
+"""
+
+import hashlib
+from typing import Dict, List, NamedTuple, Optional
+from cache import TTLCache, MISSING
+from config import SHOP_CACHE_CONFIG
+
+class ShopsEntry(NamedTuple):
+    """Keshlangan do'konlar va ulardan bir marta olingan ID lar"""
+    shops: List[Dict]
+    shop_ids: List[int]
+
+# Kalit - API kalitning xeshi (kalitning o'zi xotirada saqlanmaydi)
+_shops = TTLCache(
+    max_size=SHOP_CACHE_CONFIG["max_size"],
+    ttl=SHOP_CACHE_CONFIG["ttl"]
+)
+
+def api_key_hash(api_key: str) -> str:
+    """API kalitning SHA-256 xeshi"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def get_shops_entry(api_key: str) -> Optional[ShopsEntry]:
+    """Keshdagi do'konlarni olish (yo'q yoki muddati o'tgan bo'lsa None)"""
+    entry = _shops.get(api_key_hash(api_key))
+    return None if entry is MISSING else entry
+
+def store_shops(api_key: str, shops: List[Dict]) -> ShopsEntry:
+    """Do'konlar ro'yxatini saqlash"""
+    entry = ShopsEntry(
+        shops=shops,
+        shop_ids=[shop.get('id') for shop in shops if shop.get('id')]
+    )
+    _shops.set(api_key_hash(api_key), entry)
+    return entry
+
+def invalidate_shops(api_key: str):
+    """API kalit uchun keshni o'chirish (kalit o'zgarganda yoki o'chirilganda)"""
+    _shops.invalidate(api_key_hash(api_key))
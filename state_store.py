@@ -0,0 +1,148 @@
+"""
+Suhbat holatlari ombori
+Foydalanuvchi keyingi xabarini qanday kutayotganini saqlaydi (masalan, API kalit yoki qidiruv so'rovi)
+"""
+
+import json
+import time
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from cache import TTLCache, MISSING
+from config import DATABASE_FILE, STATE_CONFIG
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+class StateStore(ABC):
+    """Holatlar ombori - yozuv ko'rinishi: {'state': ..., qo'shimcha maydonlar}"""
+    
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Foydalanuvchi holati (bo'lmasa None)"""
+    
+    @abstractmethod
+    def set(self, user_id: int, state: str, **data):
+        """Holatni saqlash"""
+    
+    @abstractmethod
+    def clear(self, user_id: int):
+        """Holatni o'chirish"""
+    
+    def state_of(self, user_id: int) -> Optional[str]:
+        """Faqat holat nomini olish"""
+        entry = self.get(user_id)
+        return entry.get('state') if entry else None
+    
+    def for_message(self, message) -> Optional[Dict[str, Any]]:
+        """Xabar uchun holat - bir xabar bo'yicha omborga faqat bir marta murojaat qilinadi"""
+        entry = getattr(message, '_conversation_state', MISSING)
+        if entry is MISSING:
+            entry = self.get(message.from_user.id) if message.from_user else None
+            setattr(message, '_conversation_state', entry)
+        return entry
+    
+    def in_state(self, state: str) -> Callable:
+        """message_handler uchun filtr"""
+        def check(message) -> bool:
+            entry = self.for_message(message)
+            return entry is not None and entry.get('state') == state
+        return check
+
+class MemoryStateStore(StateStore):
+    """Jarayon xotirasidagi ombor (TTL va LRU chegarasi bilan)"""
+    
+    def __init__(self, ttl: float = STATE_CONFIG["ttl"], max_size: int = STATE_CONFIG["max_size"]):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+    
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(user_id)
+        return None if entry is MISSING else entry
+    
+    def set(self, user_id: int, state: str, **data):
+        self._cache.set(user_id, {'state': state, **data})
+    
+    def clear(self, user_id: int):
+        self._cache.invalidate(user_id)
+
+class SQLiteStateStore(StateStore):
+    """Bazadagi ombor - qayta ishga tushishdan keyin ham saqlanadi va jarayonlar o'rtasida umumiy"""
+    
+    def __init__(self, db_path: str = DATABASE_FILE, ttl: float = STATE_CONFIG["ttl"],
+                 cache_ttl: float = STATE_CONFIG["cache_ttl"], max_size: int = STATE_CONFIG["max_size"]):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._last_purge = 0.0
+        # O'qishlar oldidagi cheklangan kesh (holat yo'qligi ham keshlanadi)
+        self._cache = TTLCache(max_size=max_size, ttl=min(cache_ttl, ttl))
+        # Yozuvlar event loop dan tashqarida, bitta oqimda - bir foydalanuvchi uchun set/clear tartibi saqlanadi
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+    
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(user_id)
+        if entry is not MISSING:
+            return entry
+        
+        entry = self._load(user_id)
+        self._cache.set(user_id, entry)
+        return entry
+    
+    def set(self, user_id: int, state: str, **data):
+        self._cache.set(user_id, {'state': state, **data})
+        self._writer.submit(self._write, user_id, state, data)
+    
+    def clear(self, user_id: int):
+        self._cache.set(user_id, None)
+        self._writer.submit(self._delete, user_id)
+    
+    def _load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            with read_cursor(self.db_path) as cursor:
+                cursor.execute(
+                    "SELECT state, data FROM user_states WHERE user_id = ? AND expires_at > ?",
+                    (user_id, time.time())
+                )
+                row = cursor.fetchone()
+            
+            if not row:
+                return None
+            return {'state': row[0], **(json.loads(row[1]) if row[1] else {})}
+        
+        except Exception as e:
+            logger.error(f"Foydalanuvchi holatini olishda xatolik: {e}")
+            return None
+    
+    def _write(self, user_id: int, state: str, data: Dict[str, Any]):
+        now = time.time()
+        try:
+            with transaction(self.db_path) as cursor:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO user_states (user_id, state, data, expires_at)
+                    VALUES (?, ?, ?, ?)
+                """, (user_id, state, json.dumps(data) if data else None, now + self.ttl))
+                
+                # Muddati o'tgan yozuvlar vaqti-vaqti bilan tozalanadi
+                if now - self._last_purge > STATE_CONFIG["purge_interval"]:
+                    cursor.execute("DELETE FROM user_states WHERE expires_at <= ?", (now,))
+                    self._last_purge = now
+        
+        except Exception as e:
+            logger.error(f"Foydalanuvchi holatini saqlashda xatolik: {e}")
+    
+    def _delete(self, user_id: int):
+        try:
+            with transaction(self.db_path) as cursor:
+                cursor.execute("DELETE FROM user_states WHERE user_id = ?", (user_id,))
+        
+        except Exception as e:
+            logger.error(f"Foydalanuvchi holatini o'chirishda xatolik: {e}")
+
+def create_state_store() -> StateStore:
+    """Sozlamalar bo'yicha omborni tanlash"""
+    if STATE_CONFIG["backend"] == "memory":
+        return MemoryStateStore()
+    return SQLiteStateStore()
+
+# Umumiy ombor
+state_store = create_state_store()
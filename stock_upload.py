@@ -0,0 +1,263 @@
+"""
+Qoldiqlarni fayldan ommaviy yangilash
+CSV/XLSX fayl qatorlari ishchi oqimda oqim sifatida o'qiladi, keshlangan qoldiqlar ro'yxati bilan tekshiriladi
+va faqat o'zgargan SKU lar bo'laklab yuboriladi
+"""
+
+import io
+import csv
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+from async_api_client import AsyncMarketplaceAPIClient
+from http_transport import retry_delay
+from stock_watch import StockSnapshot
+from config import STOCK_UPLOAD_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Sarlavha qatoridagi ustun nomlari
+SKU_COLUMNS = {'sku', 'skuid', 'sku_id', 'sku id', 'id'}
+AMOUNT_COLUMNS = {'amount', 'quantity', 'qty', 'stock', 'qoldiq', 'soni', 'son', 'miqdor'}
+
+Row = Tuple[int, object, object]  # (qator raqami, SKU, son)
+
+class UploadReport:
+    """Yangilash natijalari"""
+    
+    def __init__(self):
+        self.rows = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0  # yuborib bo'lmagan SKU lar
+        self.invalid = 0
+        self.unknown = 0
+        self.duplicates = 0
+        self.chunks = 0
+        self.retries = 0
+        self.errors: List[str] = []  # birinchi xatoliklar namunasi
+        self.started = time.monotonic()
+    
+    def error(self, message: str, line: Optional[int] = None):
+        if len(self.errors) < STOCK_UPLOAD_CONFIG["error_examples"]:
+            self.errors.append(f"{line}-qator: {message}" if line else message)
+
+def _open_rows(file_obj, file_name: str) -> Iterator[Tuple[int, list]]:
+    """Fayl qatorlarini birma-bir o'qish: (qator raqami, katakchalar)"""
+    if file_name.lower().endswith('.xlsx'):
+        # openpyxl faqat XLSX uchun kerak
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            for line, cells in enumerate(sheet.iter_rows(values_only=True), 1):
+                yield line, list(cells)
+        finally:
+            workbook.close()
+        return
+    
+    text = io.TextIOWrapper(file_obj, encoding='utf-8-sig', errors='replace', newline='')
+    # Excel ba'zi tillarda ; bilan saqlaydi
+    sample = text.read(4096)
+    text.seek(0)
+    delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    for line, cells in enumerate(csv.reader(text, delimiter=delimiter), 1):
+        yield line, cells
+
+def iter_stock_rows(file_obj, file_name: str) -> Iterator[Row]:
+    """SKU va son ustunlarini ajratish (sarlavha bo'lsa ustunlar nomi bo'yicha topiladi)"""
+    sku_index, amount_index = 0, 1
+    for line, cells in _open_rows(file_obj, file_name):
+        if not any(cell not in (None, '') for cell in cells):
+            continue
+        
+        if line == 1:
+            names = [str(cell or '').strip().lower() for cell in cells]
+            if not (names and names[0].isdigit()):
+                # Sarlavha qatori
+                sku_index = next((i for i, name in enumerate(names) if name in SKU_COLUMNS), 0)
+                amount_index = next((i for i, name in enumerate(names) if name in AMOUNT_COLUMNS), 1)
+                continue
+        
+        sku = cells[sku_index] if len(cells) > sku_index else None
+        amount = cells[amount_index] if len(cells) > amount_index else None
+        yield line, sku, amount
+
+def _produce_rows(file_obj, file_name: str, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue,
+                  slots: threading.Semaphore, stop: threading.Event):
+    """Ishchi oqim: qatorlarni o'qib, bo'laklab navbatga qo'yish (oxirida None yoki xatolik)"""
+    def put(batch: List[Row]) -> bool:
+        # Navbat to'la bo'lsa iste'molchi bo'shatguncha kutiladi
+        while not slots.acquire(timeout=0.5):
+            if stop.is_set():
+                return False
+        loop.call_soon_threadsafe(queue.put_nowait, batch)
+        return True
+    
+    rows = iter_stock_rows(file_obj, file_name)
+    batch: List[Row] = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= STOCK_UPLOAD_CONFIG["read_batch"]:
+                if stop.is_set() or not put(batch):
+                    return
+                batch = []
+        if batch and not put(batch):
+            return
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    except Exception as e:
+        loop.call_soon_threadsafe(queue.put_nowait, e)
+    finally:
+        rows.close()
+
+async def read_stock_rows(file_obj, file_name: str) -> AsyncIterator[List[Row]]:
+    """Faylni ishchi oqimda o'qish - event loop faqat tayyor bo'laklarni oladi"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(STOCK_UPLOAD_CONFIG["read_queue"])
+    stop = threading.Event()
+    loop.run_in_executor(None, _produce_rows, file_obj, file_name, loop, queue, slots, stop)
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        # To'xtatilganda ishchi oqim keyingi bo'lakdan oldin chiqadi
+        stop.set()
+
+def _to_int(value) -> Optional[int]:
+    """Katakchani butun songa aylantirish (XLSX da 12.0 ko'rinishida bo'lishi mumkin)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().replace(' ', '')
+    if text.endswith('.0'):
+        text = text[:-2]
+    return int(text) if text.isdigit() else None
+
+async def _send_chunk(api_client: AsyncMarketplaceAPIClient, chunk: List[Tuple[int, int]],
+                      report: UploadReport) -> bool:
+    """Bo'lakni yuborish (muvaffaqiyatsiz bo'lsa backoff bilan qayta urinish)"""
+    payload = {'skuAmountList': [{'skuId': sku_id, 'amount': amount} for sku_id, amount in chunk]}
+    for attempt in range(STOCK_UPLOAD_CONFIG["max_retries"] + 1):
+        if attempt:
+            report.retries += 1
+            await asyncio.sleep(retry_delay(attempt))
+        if await api_client.update_fbs_sku_stocks(payload):
+            return True
+    return False
+
+async def run_stock_upload(api_client: AsyncMarketplaceAPIClient, file_obj, file_name: str,
+                           on_progress: Optional[Callable[[UploadReport], Awaitable]] = None) -> Optional[UploadReport]:
+    """Faylni qayta ishlash - xotirada faqat qoldiqlar massivi va joriy bo'lak saqlanadi"""
+    stocks = await api_client.get_fbs_sku_stocks_v2()
+    data = stocks.get('data') if stocks else None
+    if not isinstance(data, list):
+        return None
+    
+    # Ixcham ro'yxat: SKU ID bo'yicha tartiblangan massivlar, API javobi keyin bo'shatiladi
+    snapshot = await asyncio.to_thread(StockSnapshot.from_stocks, data)
+    del stocks, data
+    seen = bytearray(len(snapshot))  # fayldagi takrorlanishlar uchun
+    
+    report = UploadReport()
+    chunk: List[Tuple[int, int]] = []
+    last_progress = time.monotonic()
+    
+    async def flush():
+        nonlocal chunk, last_progress
+        if not chunk:
+            return
+        report.chunks += 1
+        if await _send_chunk(api_client, chunk, report):
+            report.updated += len(chunk)
+        else:
+            report.failed += len(chunk)
+            report.error(f"{report.chunks}-bo'lak: {len(chunk)} ta SKU yuborilmadi")
+        chunk = []
+        
+        if on_progress and time.monotonic() - last_progress >= STOCK_UPLOAD_CONFIG["progress_interval"]:
+            last_progress = time.monotonic()
+            await on_progress(report)
+    
+    async with aclosing(read_stock_rows(file_obj, file_name)) as batches:
+        async for batch in batches:
+            remaining = STOCK_UPLOAD_CONFIG["max_rows"] - report.rows
+            over_limit = len(batch) > remaining
+            if over_limit:
+                report.error(f"qatorlar chegarasi ({STOCK_UPLOAD_CONFIG['max_rows']}) - qolgani o'qilmadi",
+                             batch[remaining][0])
+                batch = batch[:remaining]
+            
+            for line, raw_sku, raw_amount in batch:
+                report.rows += 1
+                
+                sku_id, amount = _to_int(raw_sku), _to_int(raw_amount)
+                if sku_id is None or amount is None or amount < 0:
+                    report.invalid += 1
+                    report.error("SKU yoki son noto'g'ri", line)
+                    continue
+                
+                index = bisect_left(snapshot.sku_ids, sku_id)
+                if index == len(snapshot) or snapshot.sku_ids[index] != sku_id:
+                    report.unknown += 1
+                    report.error(f"SKU {sku_id} topilmadi", line)
+                    continue
+                if seen[index]:
+                    report.duplicates += 1
+                    report.error(f"SKU {sku_id} takrorlangan", line)
+                    continue
+                seen[index] = 1
+                
+                if snapshot.available[index] == amount:
+                    report.unchanged += 1
+                    continue
+                
+                chunk.append((sku_id, amount))
+                if len(chunk) >= STOCK_UPLOAD_CONFIG["chunk_size"]:
+                    await flush()
+            
+            if over_limit:
+                break
+    
+    await flush()
+    return report
+
+def format_upload_report(report: UploadReport, finished: bool = True) -> str:
+    """Natijalar hisoboti"""
+    title = "✅ <b>Qoldiqlar yangilandi</b>" if finished else "⏳ <b>Qoldiqlar yangilanmoqda...</b>"
+    text = f"{title}\n\n"
+    text += f"📄 O'qilgan qatorlar: {report.rows} ta\n"
+    text += f"🔄 Yangilangan: {report.updated} ta\n"
+    text += f"➖ O'zgarmagan: {report.unchanged} ta\n"
+    if report.failed:
+        text += f"❌ Yuborilmagan: {report.failed} ta\n"
+    if report.unknown:
+        text += f"❓ Topilmagan SKU: {report.unknown} ta\n"
+    if report.invalid:
+        text += f"⚠️ Noto'g'ri qatorlar: {report.invalid} ta\n"
+    if report.duplicates:
+        text += f"♻️ Takrorlangan: {report.duplicates} ta\n"
+    
+    if finished:
+        text += f"\n📦 Bo'laklar: {report.chunks} ta"
+        if report.retries:
+            text += f" (qayta urinishlar: {report.retries})"
+        text += f"\n⏱ Vaqt: {time.monotonic() - report.started:.1f} soniya\n"
+        if report.errors:
+            text += "\n<b>Xatoliklar:</b>\n" + "\n".join(f"• {error}" for error in report.errors)
+    return text
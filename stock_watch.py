@@ -0,0 +1,254 @@
+"""
+Qoldiq ogohlantirishlari
+Sotuvchi qoldiqlarining oldingi holati ixcham massivlarda saqlanadi, har bir yangi ro'yxat bilan chiziqli solishtiriladi
+va mavjud qoldiq belgilangan chegaradan tushganda xabar yuboriladi
+"""
+
+import time
+import zlib
+import asyncio
+import logging
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from telebot.async_telebot import AsyncTeleBot
+from async_api_client import AsyncMarketplaceAPIClient, get_async_api_client
+from response_cache import cache_bypassed
+from shop_cache import api_key_hash
+from database import get_api_key_users
+from keyboards import get_back_to_main_keyboard
+from utils import escape_html
+from config import DATABASE_FILE, STOCK_WATCH_CONFIG
+from db_pool import transaction, read_cursor
+
+logger = logging.getLogger(__name__)
+
+class StockAlert(NamedTuple):
+    """Chegaradan tushgan SKU"""
+    sku_id: int
+    previous: int
+    available: int
+    threshold: int
+
+def _sku_id(stock: Dict) -> Optional[int]:
+    """SKU identifikatori (skuId, bo'lmasa raqamli sku)"""
+    for field in ('skuId', 'sku'):
+        try:
+            return int(stock[field])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+class StockSnapshot:
+    """SKU bo'yicha tartiblangan parallel massivlar: SKU ID -> mavjud / band qoldiq"""
+    
+    def __init__(self, sku_ids: array, available: array, reserved: array):
+        self.sku_ids = sku_ids
+        self.available = available
+        self.reserved = reserved
+    
+    @classmethod
+    def from_stocks(cls, stocks: Iterable[Dict]) -> "StockSnapshot":
+        """API ro'yxatidan (identifikatorsiz SKU lar tashlab ketiladi)"""
+        rows = []
+        for stock in stocks:
+            sku_id = _sku_id(stock)
+            if sku_id is not None:
+                rows.append((sku_id, int(stock.get('availableAmount') or 0), int(stock.get('reservedAmount') or 0)))
+        rows.sort()
+        return cls(
+            array('q', (row[0] for row in rows)),
+            array('i', (row[1] for row in rows)),
+            array('i', (row[2] for row in rows))
+        )
+    
+    @classmethod
+    def from_blobs(cls, sku_ids: bytes, available: bytes, reserved: bytes) -> "StockSnapshot":
+        snapshot = cls(array('q'), array('i'), array('i'))
+        snapshot.sku_ids.frombytes(zlib.decompress(sku_ids))
+        snapshot.available.frombytes(zlib.decompress(available))
+        snapshot.reserved.frombytes(zlib.decompress(reserved))
+        return snapshot
+    
+    def to_blobs(self) -> Tuple[bytes, bytes, bytes]:
+        return (
+            zlib.compress(self.sku_ids.tobytes()),
+            zlib.compress(self.available.tobytes()),
+            zlib.compress(self.reserved.tobytes())
+        )
+    
+    def __len__(self) -> int:
+        return len(self.sku_ids)
+
+def diff_snapshots(previous: StockSnapshot, current: StockSnapshot, thresholds: Dict[int, int],
+                   default_threshold: int = 0) -> List[StockAlert]:
+    """Mavjud qoldig'i chegaradan yuqoridan chegaraga yoki pastga tushgan SKU lar (tartiblangan massivlar bo'yicha bir o'tish)"""
+    alerts = []
+    prev_ids, prev_available = previous.sku_ids, previous.available
+    i, n = 0, len(prev_ids)
+    for j, sku_id in enumerate(current.sku_ids):
+        while i < n and prev_ids[i] < sku_id:
+            i += 1
+        if i == n or prev_ids[i] != sku_id:
+            # Yangi SKU - solishtiradigan holat yo'q
+            continue
+        
+        threshold = thresholds.get(sku_id, default_threshold)
+        before, after = prev_available[i], current.available[j]
+        if before > threshold >= after:
+            alerts.append(StockAlert(sku_id, before, after, threshold))
+    return alerts
+
+def load_snapshot(account: str) -> Optional[StockSnapshot]:
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute(
+            "SELECT sku_ids, available, reserved FROM stock_snapshots WHERE account = ?",
+            (account,)
+        )
+        row = cursor.fetchone()
+    return StockSnapshot.from_blobs(*row) if row else None
+
+def save_snapshot(account: str, snapshot: StockSnapshot):
+    with transaction(DATABASE_FILE) as cursor:
+        cursor.execute("""
+            INSERT OR REPLACE INTO stock_snapshots (account, sku_ids, available, reserved, taken_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (account, *snapshot.to_blobs(), time.time()))
+
+def get_thresholds(api_key: str) -> Dict[int, int]:
+    """SKU ID -> chegara"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute(
+            "SELECT sku_id, threshold FROM stock_thresholds WHERE account = ?",
+            (api_key_hash(api_key),)
+        )
+        return dict(cursor.fetchall())
+
+def set_thresholds(api_key: str, thresholds: Dict[int, Optional[int]]) -> bool:
+    """Chegaralarni saqlash (None - SKU chegarasini o'chirish)"""
+    account = api_key_hash(api_key)
+    try:
+        with transaction(DATABASE_FILE) as cursor:
+            cursor.executemany(
+                "DELETE FROM stock_thresholds WHERE account = ? AND sku_id = ?",
+                [(account, sku_id) for sku_id, value in thresholds.items() if value is None]
+            )
+            cursor.executemany(
+                "INSERT OR REPLACE INTO stock_thresholds (account, sku_id, threshold) VALUES (?, ?, ?)",
+                [(account, sku_id, value) for sku_id, value in thresholds.items() if value is not None]
+            )
+        return True
+    
+    except Exception as e:
+        logger.error(f"Qoldiq chegaralarini saqlashda xatolik: {e}")
+        return False
+
+def delete_stock_watch(api_key: str):
+    """API kalit o'chirilganda uning chegaralari va holatini o'chirish"""
+    account = api_key_hash(api_key)
+    try:
+        with transaction(DATABASE_FILE) as cursor:
+            cursor.execute("DELETE FROM stock_thresholds WHERE account = ?", (account,))
+            cursor.execute("DELETE FROM stock_snapshots WHERE account = ?", (account,))
+    
+    except Exception as e:
+        logger.error(f"Qoldiq kuzatuvini o'chirishda xatolik: {e}")
+
+def _watched_accounts() -> set:
+    """Kamida bitta chegara belgilagan kalit xeshlari"""
+    with read_cursor(DATABASE_FILE) as cursor:
+        cursor.execute("SELECT DISTINCT account FROM stock_thresholds")
+        return {row[0] for row in cursor.fetchall()}
+
+async def check_stocks(api_client: AsyncMarketplaceAPIClient) -> Tuple[List[StockAlert], Dict[int, str], Optional[StockSnapshot]]:
+    """Yangi ro'yxatni olish va oldingisi bilan solishtirish: (ogohlantirishlar, SKU nomlari, saqlanmagan holat)"""
+    # Ogohlantirish bo'lsa yangi holat saqlanmaydi - xabar yuborilgandan keyin saqlanadi,
+    # aks holda keyingi tekshiruv shu farqni yana topadi
+    # Kuzatuv har doim API dan yangi ro'yxat oladi
+    with cache_bypassed():
+        stocks = await api_client.get_fbs_sku_stocks_v2()
+    data = stocks.get('data') if stocks else None
+    if not isinstance(data, list):
+        return [], {}, None
+    
+    account = api_key_hash(api_client.api_key)
+    current = StockSnapshot.from_stocks(data)
+    # Baza va zlib ishi event loop ni band qilmasligi uchun alohida oqimda
+    previous = await asyncio.to_thread(load_snapshot, account)
+    alerts = []
+    if previous is not None:
+        alerts = diff_snapshots(
+            previous, current, get_thresholds(api_client.api_key), STOCK_WATCH_CONFIG["default_threshold"]
+        )
+    if not alerts:
+        await asyncio.to_thread(save_snapshot, account, current)
+        return [], {}, None
+    
+    # Nomlar faqat ogohlantirilgan SKU lar uchun olinadi
+    alerted = {alert.sku_id for alert in alerts}
+    titles = {}
+    for stock in data:
+        sku_id = _sku_id(stock)
+        if sku_id in alerted:
+            titles[sku_id] = stock.get('skuTitle') or stock.get('productTitle') or str(stock.get('sku', sku_id))
+    return alerts, titles, current
+
+def format_stock_alerts(alerts: List[StockAlert], titles: Dict[int, str]) -> str:
+    """Ogohlantirish xabari"""
+    limit = STOCK_WATCH_CONFIG["alerts_per_message"]
+    text = "⚠️ <b>Qoldiq ogohlantirishi</b>\n\n"
+    for alert in sorted(alerts, key=lambda alert: alert.available)[:limit]:
+        icon = "❌" if alert.available <= 0 else "📉"
+        title = escape_html(titles.get(alert.sku_id, alert.sku_id))
+        text += f"{icon} {title} (<code>{alert.sku_id}</code>): {alert.previous} → {alert.available} dona\n"
+    if len(alerts) > limit:
+        text += f"\n... va yana {len(alerts) - limit} ta SKU"
+    return text
+
+async def run_stock_watcher(bot: AsyncTeleBot):
+    """Chegara belgilagan sotuvchilar qoldiqlarini muntazam tekshirish (yetakchida ishlaydi)"""
+    if not STOCK_WATCH_CONFIG["enabled"]:
+        return
+    
+    semaphore = asyncio.Semaphore(STOCK_WATCH_CONFIG["concurrency"])
+    
+    async def watch_one(api_key: str, user_ids: List[int]):
+        async with semaphore:
+            try:
+                alerts, titles, current = await check_stocks(get_async_api_client(api_key))
+            except Exception as e:
+                logger.error(f"Qoldiqlarni tekshirishda xatolik: {e}")
+                return
+        
+        if not alerts:
+            return
+        text = format_stock_alerts(alerts, titles)
+        delivered = False
+        for user_id in user_ids:
+            try:
+                await bot.send_message(user_id, text, parse_mode="HTML", reply_markup=get_back_to_main_keyboard())
+                delivered = True
+            except Exception as e:
+                logger.warning(f"Qoldiq ogohlantirishini yuborib bo'lmadi {user_id}: {e}")
+        
+        # Hech kimga yetib bormagan bo'lsa eski holat qoladi va farq keyingi safar qayta topiladi
+        if delivered:
+            try:
+                await asyncio.to_thread(save_snapshot, api_key_hash(api_key), current)
+            except Exception as e:
+                logger.error(f"Qoldiqlar holatini saqlashda xatolik: {e}")
+    
+    while True:
+        try:
+            watched = _watched_accounts()
+            sellers: Dict[str, Tuple[str, List[int]]] = {}
+            for user_id, api_key in get_api_key_users():
+                account = api_key_hash(api_key)
+                if account in watched:
+                    sellers.setdefault(account, (api_key, []))[1].append(user_id)
+            
+            await asyncio.gather(*(watch_one(api_key, user_ids) for api_key, user_ids in sellers.values()))
+        
+        except Exception as e:
+            logger.error(f"Qoldiq kuzatuvchisida xatolik: {e}")
+        
+        await asyncio.sleep(STOCK_WATCH_CONFIG["interval"])
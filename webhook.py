@@ -0,0 +1,90 @@
+"""
+Webhook rejimi
+Flask qabul qilgan yangilanishlar bot event loop idagi cheklangan ishchilar havzasiga uzatiladi
+"""
+
+import hmac
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Optional
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+from config import BOT_TOKEN, WEBHOOK_CONFIG
+
+logger = logging.getLogger(__name__)
+
+def webhook_secret() -> str:
+    """Webhook manzilidagi maxfiy qism (berilmagan bo'lsa tokendan hosil qilinadi)"""
+    if WEBHOOK_CONFIG["secret"]:
+        return WEBHOOK_CONFIG["secret"]
+    return hashlib.sha256(f"webhook:{BOT_TOKEN}".encode()).hexdigest()[:32]
+
+def webhook_url() -> str:
+    """Telegram ga beriladigan to'liq manzil"""
+    return f"{WEBHOOK_CONFIG['url'].rstrip('/')}/webhook/{webhook_secret()}"
+
+def is_valid_secret(path_secret: str, header_secret: Optional[str]) -> bool:
+    """Manzil va X-Telegram-Bot-Api-Secret-Token sarlavhasini tekshirish"""
+    secret = webhook_secret()
+    if not hmac.compare_digest(path_secret, secret):
+        return False
+    return header_secret is None or hmac.compare_digest(header_secret, secret)
+
+class UpdateDispatcher:
+    """Yangilanishlar navbati - submit istalgan oqimdan, qayta ishlash bot event loop ida"""
+    
+    def __init__(self, bot: AsyncTeleBot, loop: asyncio.AbstractEventLoop,
+                 workers: int = WEBHOOK_CONFIG["workers"],
+                 max_pending: int = WEBHOOK_CONFIG["max_pending"]):
+        self.bot = bot
+        self.loop = loop
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    def submit(self, update_json: dict) -> bool:
+        """Yangilanishni navbatga qo'yish (navbat to'la bo'lsa False - Telegram qayta yuboradi)"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+        
+        try:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, update_json)
+        except RuntimeError:
+            # Event loop yopilgan
+            self._done()
+            return False
+        return True
+    
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+    
+    async def _worker(self):
+        while True:
+            update_json = await self._queue.get()
+            try:
+                update = Update.de_json(update_json)
+                await self.bot.process_new_updates([update])
+            except Exception as e:
+                logger.error(f"Webhook yangilanishini qayta ishlashda xatolik: {e}")
+            finally:
+                self._done()
+    
+    async def run(self):
+        """Ishchilarni ishga tushirish va to'xtatilguncha kutish"""
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()